@@ -0,0 +1,259 @@
+"""ASGI entry point with async handlers for the LLM-bound interview endpoints.
+
+Under gunicorn sync workers every in-flight interview pins a worker while it
+waits on Gemini. Served through this module instead, POST /start-interview and
+POST /submit, and their /stream variants used by the browser, run as coroutines
+on an event loop and await the LLM through the pooled async client
+(`LLMClient.agenerate` / `astream`), so one worker can keep hundreds of
+interviews waiting concurrently. Redis and database work, which is short, runs
+on threads. Every other route is passed through unchanged to the Flask app.
+
+Run with:
+    uvicorn --factory asgi:create_asgi_app --workers 2
+    # or: gunicorn 'asgi:create_asgi_app()' -k uvicorn.workers.UvicornWorker
+"""
+import json
+import asyncio
+from functools import partial
+
+from asgiref.wsgi import WsgiToAsgi
+
+import routes
+import submit_guard
+from interview_logic import SessionConflict
+from utilities.metrics import metrics
+
+
+async def start_interview(data):
+    """Async twin of routes.start_interview; returns (payload, status)."""
+    session, error = routes.new_session(data)
+    if error:
+        return error
+    question = await session.agenerate_initial_question()
+    return await asyncio.to_thread(routes.started, session, question)
+
+
+async def start_interview_stream(data):
+    """Async twin of routes.start_interview_stream; returns (payload, status) or SSE events."""
+    session, error = routes.new_session(data)
+    if error:
+        return error
+    return _stream_question_events(
+        session, session.agenerate_initial_question,
+        finish=partial(asyncio.to_thread, routes.started, session),
+    )
+
+
+async def submit(data, flask_app):
+    """Async twin of routes.submit; returns (payload, status)."""
+    current_session, answer, token, response = await asyncio.to_thread(routes.begin_submission, data)
+    if response:
+        return response
+
+    payload, status = None, 500
+    try:
+        payload, status = await _answer_submission(current_session, answer, flask_app)
+    finally:
+        await asyncio.to_thread(routes.end_submission, data, token, payload, status)
+    return payload, status
+
+
+async def _answer_submission(current_session, answer, flask_app):
+    """Async twin of routes.answer_submission."""
+    try:
+        if current_session.question_count >= 10:
+            return await _complete_interview(current_session, answer, flask_app), 200
+
+        answered_index = len(current_session.questions_and_answers) - 1
+        next_question = await current_session.agenerate_next_question(answer, scoring_mode=routes.SCORING_MODE)
+        return await asyncio.to_thread(routes.answered, current_session, answered_index, answer, next_question)
+    except SessionConflict:
+        return submit_guard.CONFLICT_RESPONSE
+
+
+async def _complete_interview(current_session, answer, flask_app):
+    def _complete():
+        with flask_app.app_context():
+            return routes.complete_interview(current_session, answer)
+    return await asyncio.to_thread(_complete)
+
+
+async def submit_stream(data, flask_app):
+    """Async twin of routes.submit_stream; returns (payload, status) or SSE events."""
+    current_session, answer, token, response = await asyncio.to_thread(routes.begin_submission, data)
+    if response:
+        return response
+    end = routes.ending_submission(data, token)
+
+    async def events():
+        outcome = []
+        try:
+            if current_session.question_count >= 10:
+                payload = await _complete_interview(current_session, answer, flask_app)
+                outcome.append((payload, 200))
+                yield routes._sse_event('done', payload)
+                return
+
+            answered_index = len(current_session.questions_and_answers) - 1
+            try:
+                async for event in _stream_question_events(
+                    current_session,
+                    lambda: current_session.agenerate_next_question(answer, scoring_mode=routes.SCORING_MODE),
+                    finish=partial(asyncio.to_thread, routes.answered, current_session, answered_index, answer),
+                    on_result=lambda payload, status: outcome.append((payload, status)),
+                ):
+                    yield event
+            except SessionConflict:
+                payload, status = submit_guard.CONFLICT_RESPONSE
+                outcome.append((payload, status))
+                yield routes._sse_event('error', payload)
+        finally:
+            await asyncio.to_thread(end, *(outcome[-1] if outcome else (None, 500)))
+
+    return EventStream(events(), on_close=end)
+
+
+async def _stream_question_events(session, produce, finish, on_result=None):
+    """Async twin of routes._stream_question_events; `finish` is a coroutine function."""
+    try:
+        async for kind, data in session.astream_question(produce):
+            if kind == 'done':
+                break
+            yield routes.progress_event(kind, data)
+    except Exception as e:
+        print(f"[Stream] Question generation failed for session {session.session_id}: {e}")
+        payload, status = routes.stream_failed_response()
+    else:
+        payload, status = await finish(data)
+    if on_result:
+        on_result(payload, status)
+    yield routes.result_event(payload, status)
+
+
+class EventStream:
+    """Server-sent events returned by a handler, with an optional `on_close`.
+
+    `on_close` runs (on a thread) once the response is over, however it ended;
+    unlike the events' own cleanup it also runs when the client disconnects
+    before the first event was produced.
+    """
+
+    def __init__(self, events, on_close=None):
+        self.events = events
+        self.on_close = on_close
+
+
+class InterviewASGI:
+    """Routes the async endpoints natively and everything else to Flask via WsgiToAsgi.
+
+    A handler returns (payload, status), sent as JSON, or an async iterator of
+    server-sent events (optionally wrapped in an EventStream). Responses carry
+    the CORS headers flask_cors would add.
+    """
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.handlers = {
+            '/start-interview': start_interview,
+            '/start-interview/stream': start_interview_stream,
+            '/submit': partial(submit, flask_app=flask_app),
+            '/submit/stream': partial(submit_stream, flask_app=flask_app),
+        }
+
+    async def __call__(self, scope, receive, send):
+        handler = self.handlers.get(scope.get('path')) if scope['type'] == 'http' else None
+        if handler is None or scope.get('method') != 'POST':
+            await self.wsgi(scope, receive, send)
+            return
+
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            result = {'error': 'Request body must be a JSON object.'}, 400
+        else:
+            result = await handler(data)
+        headers = self._cors_headers(scope)
+        if isinstance(result, tuple):
+            await self._send_json(send, *result, headers)
+        else:
+            stream = result if isinstance(result, EventStream) else EventStream(result)
+            try:
+                await self._send_events(send, receive, stream.events, headers)
+            finally:
+                if stream.on_close:
+                    await asyncio.to_thread(stream.on_close)
+        await asyncio.to_thread(metrics.push_if_due)
+
+    def _cors_headers(self, scope):
+        """The Access-Control-* headers the Flask app (flask_cors) adds for this request."""
+        request_headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope.get('headers', [])}
+        with self.flask_app.test_request_context(scope['path'], method=scope['method'], headers=request_headers):
+            response = self.flask_app.process_response(self.flask_app.response_class())
+        return [(k.lower().encode('latin-1'), v.encode('latin-1'))
+                for k, v in response.headers.items() if k.lower().startswith('access-control-')]
+
+    @staticmethod
+    async def _send_json(send, payload, status, headers):
+        body = json.dumps(payload).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode('ascii')),
+                *headers,
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    @staticmethod
+    async def _send_events(send, receive, events, headers):
+        """Stream SSE `events`; a client disconnect stops (cancels) their generation."""
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+                *headers,
+            ],
+        })
+
+        async def _pump():
+            try:
+                async for event in events:
+                    await send({'type': 'http.response.body', 'body': event.encode('utf-8'), 'more_body': True})
+                await send({'type': 'http.response.body', 'body': b''})
+            finally:
+                await events.aclose()
+
+        async def _disconnected():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        pump = asyncio.ensure_future(_pump())
+        watch = asyncio.ensure_future(_disconnected())
+        await asyncio.wait({pump, watch}, return_when=asyncio.FIRST_COMPLETED)
+        watch.cancel()
+        if not pump.done():
+            pump.cancel()
+        try:
+            await pump
+        except asyncio.CancelledError:
+            pass
+
+
+def create_asgi_app():
+    from app import create_app
+    return InterviewASGI(create_app())
+
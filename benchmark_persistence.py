@@ -0,0 +1,81 @@
+"""Compare the per-row ORM write of completed interviews with interview_store's bulk insert.
+
+Usage:
+    DATABASE_URL=postgresql://... python benchmark_persistence.py [--interviews 200] [--results 10]
+
+Both paths write the same rows; the tables are emptied of benchmark rows afterwards.
+Defaults to an in-memory SQLite database when DATABASE_URL is not set.
+"""
+import os
+import time
+import argparse
+import statistics
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+os.environ.setdefault('REDIS_URL', 'redis://localhost:6379')  # the app starts without Redis if it is down
+
+from app import create_app
+from extensions import db
+from database_models import Interview, Result
+import interview_store
+
+BENCH_TOPIC = '__benchmark__'
+
+
+def _transcript(results):
+    return [
+        {'question': f'Question {i}?', 'answer': f'Answer {i} ' * 20, 'llm_answer': f'Ideal {i} ' * 40, 'score': 0.5}
+        for i in range(results)
+    ]
+
+
+def save_orm(session, name, email, topic, average_score, questions_and_answers):
+    """The previous completion path: one ORM object per result, flushed then committed."""
+    interview = Interview(candidate_name=name, candidate_email=email, topic=topic, average_score=average_score)
+    session.add(interview)
+    session.flush()
+    for qa in questions_and_answers:
+        session.add(Result(interview_id=interview.id, question=qa['question'], answer=qa.get('answer', ''),
+                           llm_answer=qa.get('llm_answer'), score=qa.get('score', 0.0)))
+    session.commit()
+    return interview.id
+
+
+def _run(save, interviews, transcript):
+    timings = []
+    for i in range(interviews):
+        start = time.perf_counter()
+        save(db.session, f'Bench {i}', f'bench{i}@example.com', BENCH_TOPIC, 0.5, transcript)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _cleanup():
+    ids = [row.id for row in db.session.query(Interview.id).filter(Interview.topic == BENCH_TOPIC)]
+    if ids:
+        db.session.query(Result).filter(Result.interview_id.in_(ids)).delete(synchronize_session=False)
+        db.session.query(Interview).filter(Interview.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--interviews', type=int, default=200)
+    parser.add_argument('--results', type=int, default=10, help='Results per interview')
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        transcript = _transcript(args.results)
+        try:
+            for label, save in (('orm', save_orm), ('bulk', interview_store.save_interview)):
+                timings = _run(save, args.interviews, transcript)
+                p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+                print(f"{label:>5}: mean {statistics.mean(timings):.2f} ms, p95 {p95:.2f} ms "
+                      f"per interview ({args.interviews} x {args.results} results)")
+        finally:
+            _cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,8 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 from app import create_app
-from database_models import Interview, Result
+from extensions import db
+from interview_queries import iter_interviews
 
 def query_database():
     """Initializes the app and queries the database within the app context."""
@@ -13,29 +14,30 @@ def query_database():
     with app.app_context():
         print("--- Querying Database ---")
         
-        # Fetch all interviews
-        interviews = Interview.query.all()
-        
-        if not interviews:
+        # Page through the interviews; each page loads its results in one query
+        count = 0
+        for interview in iter_interviews(db.session):
+            count += 1
+            print(f"Interview ID: {interview.id}")
+            print(f"  Candidate: {interview.candidate_name} ({interview.candidate_email})")
+            print(f"  Topic: {interview.topic}")
+            # None when no answer in the interview could be scored
+            average = 'n/a' if interview.average_score is None else f"{interview.average_score:.2f}"
+            print(f"  Average Score: {average}")
+            print(f"  Timestamp: {interview.timestamp}")
+            print("  Results:")
+            
+            # Print the results for each interview
+            for result in interview.results:
+                print(f"    - Q: {result.question[:60]}...")
+                print(f"      A: {result.answer[:60]}...")
+                print(f"      Score: {result.score:.2f}")
+            print("-------------------------")
+
+        if not count:
             print("No interviews found in the database.")
         else:
-            print(f"Found {len(interviews)} interview(s).\n")
-            
-            # Loop through each interview and print its details
-            for interview in interviews:
-                print(f"Interview ID: {interview.id}")
-                print(f"  Candidate: {interview.candidate_name} ({interview.candidate_email})")
-                print(f"  Topic: {interview.topic}")
-                print(f"  Average Score: {interview.average_score:.2f}")
-                print(f"  Timestamp: {interview.timestamp}")
-                print("  Results:")
-                
-                # Print the results for each interview
-                for result in interview.results:
-                    print(f"    - Q: {result.question[:60]}...")
-                    print(f"      A: {result.answer[:60]}...")
-                    print(f"      Score: {result.score:.2f}")
-                print("-------------------------")
+            print(f"Found {count} interview(s).")
 
 if __name__ == "__main__":
     query_database()
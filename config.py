@@ -6,3 +6,101 @@ load_dotenv()
 API_KEY = os.getenv('GEMINI_API_KEY')
 API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-pro-latest:generateContent?key={API_KEY}"
 REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379')
+
+# Answer scoring strategy used by InterviewSession.generate_next_question:
+#   'inline'     - score the last answer, then generate the next question (serial)
+#   'concurrent' - score the last answer on a worker thread while the next question is generated
+#   'queue'      - enqueue a scoring job in Redis for the scoring worker (see scoring_queue.py)
+SCORING_MODE = os.getenv('SCORING_MODE', 'inline').strip().lower()
+SCORING_THREADS = int(os.getenv('SCORING_THREADS', '8'))
+# How long the final /submit waits for a session's outstanding scoring jobs before scoring inline
+SCORING_WAIT_TIMEOUT_SEC = float(os.getenv('SCORING_WAIT_TIMEOUT_SEC', '20'))
+
+# Pooled HTTP client for LLM calls (see utilities.llm.get_http_session)
+LLM_POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', '10'))
+LLM_CONNECT_TIMEOUT_SEC = float(os.getenv('LLM_CONNECT_TIMEOUT_SEC', '5'))
+LLM_READ_TIMEOUT_SEC = float(os.getenv('LLM_READ_TIMEOUT_SEC', '120'))
+
+# LLM backend: 'gemini' (default) or 'fake' for offline runs and load tests
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini').strip().lower()
+LLM_FAKE_LATENCY_MS = float(os.getenv('LLM_FAKE_LATENCY_MS', '0'))
+
+# Ideal-answer cache (in-process LRU in front of Redis)
+IDEAL_ANSWER_CACHE_SIZE = int(os.getenv('IDEAL_ANSWER_CACHE_SIZE', '1024'))
+IDEAL_ANSWER_CACHE_TTL_SEC = int(os.getenv('IDEAL_ANSWER_CACHE_TTL_SEC', str(7 * 24 * 60 * 60)))
+
+# Where per-topic TF-IDF scoring models are stored (see scoring_engine.py)
+SCORING_MODEL_DIR = os.getenv('SCORING_MODEL_DIR', os.path.join('instance', 'tfidf'))
+# How often a worker checks whether a topic's model file was (re)fitted since it was loaded
+SCORING_MODEL_RECHECK_SEC = float(os.getenv('SCORING_MODEL_RECHECK_SEC', '60'))
+
+# Idle expiry for Redis session state; every load/save refreshes it
+SESSION_IDLE_TTL_SEC = int(os.getenv('SESSION_IDLE_TTL_SEC', str(3 * 60 * 60)))
+ONBOARDING_IDLE_TTL_SEC = int(os.getenv('ONBOARDING_IDLE_TTL_SEC', str(60 * 60)))
+# Upper bound on concurrent LLM connections per worker on the async serving path (asgi.py)
+LLM_ASYNC_MAX_CONNECTIONS = int(os.getenv('LLM_ASYNC_MAX_CONNECTIONS', '200'))
+
+# Follow-up prompt context: last N turns verbatim plus a compact summary of earlier
+# turns, kept within an approximate token budget (see interview_logic.ConversationContext)
+CONTEXT_WINDOW_TURNS = int(os.getenv('CONTEXT_WINDOW_TURNS', '3'))
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1200'))
+
+# Near-duplicate main questions (see utilities.dedup.QuestionIndex). Only a repeat of the session's
+# own questions is retried; the topic's recent questions just rank candidates when there are several
+QUESTION_CANDIDATES = int(os.getenv('QUESTION_CANDIDATES', '1'))  # per LLM call
+# A non-streamed first question missing from the bank is asked for in one coalesced call (see
+# utilities.llm.PromptCoalescer) of this many candidates; concurrent callers each claim a different
+# one. 1 = no coalescing
+SHARED_INITIAL_CANDIDATES = int(os.getenv('SHARED_INITIAL_CANDIDATES', '5'))
+QUESTION_DEDUP_THRESHOLD = float(os.getenv('QUESTION_DEDUP_THRESHOLD', '0.5'))
+TOPIC_QUESTION_HISTORY = int(os.getenv('TOPIC_QUESTION_HISTORY', '200'))
+
+# Precomputed main questions (see question_bank.py)
+QUESTION_BANK_TARGET = int(os.getenv('QUESTION_BANK_TARGET', '20'))  # questions kept per topic and level
+QUESTION_BANK_LOW_WATERMARK = int(os.getenv('QUESTION_BANK_LOW_WATERMARK', '5'))
+QUESTION_BANK_BATCH = int(os.getenv('QUESTION_BANK_BATCH', '10'))  # questions per LLM call when refilling
+QUESTION_BANK_TOP_TOPICS = int(os.getenv('QUESTION_BANK_TOP_TOPICS', '20'))
+# Topics are free text: demand is only counted for the most requested ones, and a
+# topic's bank is refilled once it has been requested QUESTION_BANK_MIN_DEMAND times
+QUESTION_BANK_TRACKED_TOPICS = int(os.getenv('QUESTION_BANK_TRACKED_TOPICS', '1000'))
+QUESTION_BANK_MIN_DEMAND = int(os.getenv('QUESTION_BANK_MIN_DEMAND', '3'))
+
+# Storing completed interviews:
+#   'sync'         - write to the database before the final /submit responds
+#   'write_behind' - append to a Redis stream; results_writer.py stores them in batches
+RESULTS_WRITE_MODE = os.getenv('RESULTS_WRITE_MODE', 'sync').strip().lower()
+RESULTS_WRITE_BATCH = int(os.getenv('RESULTS_WRITE_BATCH', '50'))
+RESULTS_WRITE_MAX_ATTEMPTS = int(os.getenv('RESULTS_WRITE_MAX_ATTEMPTS', '5'))
+
+# Duplicate /submit protection (see submit_guard.py): one submission per session runs at a
+# time, and a retried answer (same idempotency key) gets the stored response instead of rerunning
+SUBMIT_LOCK_TTL_SEC = int(os.getenv('SUBMIT_LOCK_TTL_SEC', '180'))  # must outlast a slow LLM round
+IDEMPOTENCY_TTL_SEC = int(os.getenv('IDEMPOTENCY_TTL_SEC', str(3 * 60 * 60)))
+
+# Identical in-flight LLM prompts share one upstream call (see utilities.llm.PromptCoalescer)
+LLM_COALESCE_LOCK_TTL_SEC = int(os.getenv('LLM_COALESCE_LOCK_TTL_SEC', '60'))  # also how long waiters wait
+LLM_COALESCE_RESULT_TTL_SEC = int(os.getenv('LLM_COALESCE_RESULT_TTL_SEC', '5'))  # for waiters of that call only
+
+# Cluster-wide Gemini quota, shared through Redis (see utilities.rate_limit.RateLimiter); 0 = no limit
+LLM_RPM = int(os.getenv('LLM_RPM', '0'))
+LLM_TPM = int(os.getenv('LLM_TPM', '0'))
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '0'))
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv('LLM_EXPECTED_OUTPUT_TOKENS', '256'))  # reserved per request
+LLM_RATE_MAX_WAIT_SEC = float(os.getenv('LLM_RATE_MAX_WAIT_SEC', '30'))  # queue wait before giving up
+
+# Tail latency of LLM calls (see utilities.latency): the read timeout follows the observed
+# p95 per model and call purpose (LLM_READ_TIMEOUT_SEC is the ceiling), a duplicate "hedged" request is sent
+# once a call runs past LLM_HEDGE_PERCENTILE (0 = never), and after LLM_BREAKER_FAILURES
+# consecutive failures calls fail fast for LLM_BREAKER_COOLDOWN_SEC (0 = no breaker)
+LLM_TIMEOUT_P95_MULTIPLIER = float(os.getenv('LLM_TIMEOUT_P95_MULTIPLIER', '2'))
+LLM_TIMEOUT_FLOOR_SEC = float(os.getenv('LLM_TIMEOUT_FLOOR_SEC', '5'))
+LLM_LATENCY_MIN_SAMPLES = int(os.getenv('LLM_LATENCY_MIN_SAMPLES', '20'))
+LLM_HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', '0'))
+LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', '5'))
+LLM_BREAKER_COOLDOWN_SEC = float(os.getenv('LLM_BREAKER_COOLDOWN_SEC', '30'))
+
+# Metrics (GET /metrics, Prometheus text format): each worker shares its counters through
+# Redis at most every METRICS_PUSH_INTERVAL_SEC, after a request or job, and they are shown per
+# worker (`worker` label); workers silent for METRICS_WORKER_TTL_SEC are dropped
+METRICS_PUSH_INTERVAL_SEC = float(os.getenv('METRICS_PUSH_INTERVAL_SEC', '10'))
+METRICS_WORKER_TTL_SEC = int(os.getenv('METRICS_WORKER_TTL_SEC', str(24 * 60 * 60)))
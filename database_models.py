@@ -11,7 +11,14 @@ class Interview(db.Model):
     candidate_email = db.Column(db.String(100), nullable=False)
     topic = db.Column(db.String(100), nullable=False)
     average_score = db.Column(db.Float, nullable=True)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    # Reporting filters by topic or candidate and pages by (timestamp, id); see interview_queries.py.
+    # Existing databases get these from migrate_indexes.py.
+    __table_args__ = (
+        db.Index('ix_interview_topic_timestamp', 'topic', 'timestamp', 'id'),
+        db.Index('ix_interview_email_timestamp', 'candidate_email', 'timestamp', 'id'),
+    )
     
     # One-to-many relationship with the Result model
     results = db.relationship('Result', backref='interview', lazy=True, cascade="all, delete-orphan")
@@ -28,7 +35,7 @@ class Result(db.Model):
     score = db.Column(db.Float, nullable=False)
     
     # Foreign key linking a result to a specific interview
-    interview_id = db.Column(db.Integer, db.ForeignKey('interview.id'), nullable=False)
+    interview_id = db.Column(db.Integer, db.ForeignKey('interview.id'), nullable=False, index=True)
 
     def __repr__(self):
         return f'<Result {self.id} for Interview {self.interview_id}>'
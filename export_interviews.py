@@ -0,0 +1,127 @@
+"""Export interviews and their results to CSV or Parquet.
+
+Writes one row per result, joined with its interview. Rows are streamed with
+`yield_per`, which uses a server-side cursor on Postgres, and written one batch
+at a time, so memory use depends on the batch size, not on the table size.
+Parquet output needs pyarrow (`pip install pyarrow`). The web app does not
+need it, so it is not in requirements.txt.
+
+Usage:
+    python export_interviews.py OUTPUT [--format csv|parquet] [--topic TOPIC]
+                                       [--since 2024-01-01] [--until 2024-02-01] [--batch-size 5000]
+"""
+import csv
+import argparse
+from datetime import datetime
+
+from sqlalchemy import select
+
+from database_models import Interview, Result
+
+COLUMNS = (
+    'interview_id', 'candidate_name', 'candidate_email', 'topic', 'average_score', 'timestamp',
+    'result_id', 'question', 'answer', 'llm_answer', 'score',
+)
+
+
+def export_query(topic=None, since=None, until=None):
+    """Result rows joined with their interview, in interview then result order.
+
+    `since` is inclusive, `until` exclusive.
+    """
+    stmt = (
+        select(
+            Interview.id.label('interview_id'), Interview.candidate_name, Interview.candidate_email,
+            Interview.topic, Interview.average_score, Interview.timestamp,
+            Result.id.label('result_id'), Result.question, Result.answer, Result.llm_answer, Result.score,
+        )
+        .join(Result, Result.interview_id == Interview.id)
+        .order_by(Interview.timestamp, Interview.id, Result.id)
+    )
+    if topic is not None:
+        stmt = stmt.where(Interview.topic == topic)
+    if since is not None:
+        stmt = stmt.where(Interview.timestamp >= since)
+    if until is not None:
+        stmt = stmt.where(Interview.timestamp < until)
+    return stmt
+
+
+def iter_batches(session, batch_size=5000, **filters):
+    """Yield lists of up to `batch_size` row tuples (in COLUMNS order)."""
+    result = session.execute(export_query(**filters).execution_options(yield_per=batch_size))
+    try:
+        for partition in result.partitions():
+            yield [tuple(row) for row in partition]
+    finally:
+        result.close()
+
+
+def write_csv(batches, path):
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for batch in batches:
+            writer.writerows(batch)
+            rows += len(batch)
+    return rows
+
+
+def _parquet_schema(pa):
+    return pa.schema([
+        ('interview_id', pa.int64()), ('candidate_name', pa.string()), ('candidate_email', pa.string()),
+        ('topic', pa.string()), ('average_score', pa.float64()), ('timestamp', pa.timestamp('us')),
+        ('result_id', pa.int64()), ('question', pa.string()), ('answer', pa.string()),
+        ('llm_answer', pa.string()), ('score', pa.float64()),
+    ])
+
+
+def write_parquet(batches, path):
+    """Write each batch as a Parquet row group."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow") from None
+
+    schema = _parquet_schema(pa)
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_batch(pa.record_batch([pa.array(col, type=field.type)
+                                                for col, field in zip(columns, schema)], schema=schema))
+            rows += len(batch)
+    return rows
+
+
+WRITERS = {'csv': write_csv, 'parquet': write_parquet}
+
+
+def export(session, path, fmt='csv', batch_size=5000, **filters):
+    """Stream the matching rows to `path`. Returns the number of rows written."""
+    return WRITERS[fmt](iter_batches(session, batch_size=batch_size, **filters), path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export interviews and results to CSV or Parquet.")
+    parser.add_argument('output', help='File to write')
+    parser.add_argument('--format', choices=sorted(WRITERS), default='csv')
+    parser.add_argument('--topic', help='Only export interviews on this topic')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='Interviews at or after this date/time')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='Interviews before this date/time')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Rows fetched and written per batch')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    from extensions import db
+    app = create_app()
+    with app.app_context():
+        rows = export(db.session, args.output, fmt=args.format, batch_size=args.batch_size,
+                      topic=args.topic, since=args.since, until=args.until)
+    print(f"Exported {rows} result rows to {args.output}.")
+
+
+if __name__ == '__main__':
+    main()
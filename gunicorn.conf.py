@@ -0,0 +1,12 @@
+# Gunicorn reads this file automatically from the working directory.
+import os
+
+# With GUNICORN_PRELOAD=1 the app (and the scoring stack) is imported once in the
+# master and shared copy-on-write by the forked workers.
+preload_app = os.getenv('GUNICORN_PRELOAD', '0') == '1'
+
+
+def on_starting(server):
+    if preload_app:
+        import scorecard
+        scorecard.preload_scoring_backend()
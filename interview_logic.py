@@ -1,11 +1,213 @@
 # This file will hold the InterviewSession class.
+import re
+import zlib
 import uuid
 import json
-from scorecard import generate_llm_answer, calculate_similarity
-from utilities.llm import call_gemini_api
+import base64
+import queue
+import asyncio
+import threading
+import redis
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    SCORING_MODE, SCORING_THREADS, SESSION_IDLE_TTL_SEC, CONTEXT_WINDOW_TURNS, CONTEXT_TOKEN_BUDGET,
+    QUESTION_CANDIDATES, QUESTION_DEDUP_THRESHOLD, TOPIC_QUESTION_HISTORY, SHARED_INITIAL_CANDIDATES,
+    LLM_COALESCE_LOCK_TTL_SEC,
+)
+from scorecard import generate_llm_answer, agenerate_llm_answer, calculate_similarity, is_llm_error
+from utilities.llm import get_llm_client, llm_purpose, prompt_coalescer
+from utilities.metrics import llm_call_seconds, session_store_seconds, prompt_bytes, answer_score
 from utilities.constants import DIFFICULTY_LEVELS
+from utilities.dedup import QuestionIndex
+from question_bank import question_bank
+
+# Recent main questions per topic, shared through Redis once routes.init_app attaches it
+question_index = QuestionIndex(max_per_topic=TOPIC_QUESTION_HISTORY, threshold=QUESTION_DEDUP_THRESHOLD)
+
+# Shared pool for scoring answers off the request thread ('concurrent' scoring mode)
+_scoring_executor = ThreadPoolExecutor(max_workers=SCORING_THREADS, thread_name_prefix='scoring')
+
+
+def score_answer(question, answer, topic):
+    """Generate the ideal answer for `question` and score `answer` against it.
+
+    Returns a tuple of (llm_answer, score). When the ideal answer is an
+    "Error: ..." string the score is None: the turn is unscored, not 0.
+    """
+    llm_answer = generate_llm_answer(question, topic)
+    if is_llm_error(llm_answer):
+        return llm_answer, None
+    score = calculate_similarity(answer, llm_answer, topic)
+    return llm_answer, score
+
+
+async def ascore_answer(question, answer, topic):
+    """Async variant of score_answer; the CPU-bound similarity runs on a thread."""
+    llm_answer = await agenerate_llm_answer(question, topic)
+    if is_llm_error(llm_answer):
+        return llm_answer, None
+    score = await asyncio.to_thread(calculate_similarity, answer, llm_answer, topic)
+    return llm_answer, score
+
+
+_CANDIDATE_MARKER = re.compile(r'^\s*(?:\d+[.)]|[-*\u2022])\s*')
+
+
+def _parse_candidates(text):
+    """Split a multi-candidate LLM response into questions, dropping numbering and bullets.
+
+    A question wrapped over several lines stays whole: when the response is
+    numbered or bulleted a candidate starts only at a marked line, otherwise
+    at the line after one that ends a sentence.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    marked = any(_CANDIDATE_MARKER.match(line) for line in lines)
+    candidates = []
+    for line in lines:
+        if marked:
+            starts = _CANDIDATE_MARKER.match(line) is not None
+        else:
+            starts = not candidates or candidates[-1][-1:] in ('?', '.', '!')
+        body = _CANDIDATE_MARKER.sub('', line).strip()
+        if starts or not candidates:
+            candidates.append(body)
+        else:
+            candidates[-1] = f"{candidates[-1]} {body}".strip()
+    return [candidate for candidate in candidates if candidate]
+
+
+def _main_question_wording(count):
+    """(what to ask for, output format) of a main-question prompt requesting `count` questions."""
+    if count > 1:
+        return (f"{count} different open-ended interview questions",
+                "Return one question per line, each on a single line, with no numbering or other text.")
+    return "a single, open-ended interview question", "Return ONLY the question text, with no extra text or explanation."
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting prompts (~4 characters per token for English)."""
+    return (len(text) + 3) // 4
+
+
+def _clip(text, max_chars):
+    text = ' '.join((text or '').split())
+    return text if len(text) <= max_chars else text[:max(max_chars - 3, 0)].rstrip() + '...'
+
+
+class ConversationContext:
+    """Conversation history for follow-up prompts with a bounded size.
+
+    The last `window_turns` Q&A turns are rendered verbatim; older turns are
+    folded, one at a time as they leave the window, into a rolling summary of
+    one short line each. The summary is persisted with the session, so each
+    turn only folds the turn that just aged out instead of rebuilding the
+    history. Rendered context stays within `token_budget` (estimated tokens):
+    verbatim answers are clipped first to fit, then the oldest summary lines
+    are dropped.
+    """
+    __slots__ = ('summary', 'summarized', 'window_turns', 'token_budget')
+
+    SUMMARY_QUESTION_CHARS = 100
+    SUMMARY_ANSWER_CHARS = 80
+    HEADER_CHARS = 100  # section headers and separators
+
+    def __init__(self, summary=None, summarized=0, window_turns=None, token_budget=None):
+        self.summary = list(summary or [])
+        self.summarized = summarized  # number of leading turns already folded into `summary`
+        self.window_turns = CONTEXT_WINDOW_TURNS if window_turns is None else window_turns
+        self.token_budget = CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+
+    def fold(self, turns):
+        """Fold turns that have left the verbatim window into the summary."""
+        cutoff = max(len(turns) - self.window_turns, 0)
+        for qa in turns[self.summarized:cutoff]:
+            self.summary.append(
+                f"- {_clip(qa['question'], self.SUMMARY_QUESTION_CHARS)} "
+                f"=> {_clip(qa.get('answer'), self.SUMMARY_ANSWER_CHARS) or '(no answer)'}"
+            )
+        self.summarized = max(self.summarized, cutoff)
+
+    def render(self, turns):
+        """Return the history text for `turns` within the token budget."""
+        self.fold(turns)
+        window = turns[self.summarized:]
+        budget_chars = self.token_budget * 4 - self.HEADER_CHARS
+        # Verbatim turns may use most of the budget, but leave the summary a share
+        verbatim_chars = budget_chars * 3 // 4 if self.summary else budget_chars
+
+        verbatim = [f"Q: {qa['question']}\nA: {qa['answer']}\n" for qa in window]
+        if window and sum(len(block) for block in verbatim) > verbatim_chars:
+            # Clip answers evenly; questions are short and carry the thread of the interview
+            per_turn = verbatim_chars // len(window)
+            verbatim = [
+                f"Q: {qa['question']}\nA: {_clip(qa['answer'], max(per_turn - len(qa['question']) - 8, 0))}\n"
+                for qa in window
+            ]
+        remaining = budget_chars - sum(len(block) for block in verbatim)
+
+        kept = []
+        for line in reversed(self.summary):
+            if len(line) + 1 > remaining:
+                break
+            kept.append(line)
+            remaining -= len(line) + 1
+        kept.reverse()
+
+        parts = []
+        if self.summary:
+            omitted = len(self.summary) - len(kept)
+            header = "Earlier in the interview"
+            if omitted:
+                header += f" ({omitted} older exchanges omitted)"
+            parts.append(header + ":\n" + "".join(line + "\n" for line in kept))
+        if verbatim:
+            parts.append("Most recent exchanges:\n" + "\n".join(verbatim))
+        return "\n".join(parts)
+
+
+# Stored Q&A turns are compact JSON arrays in _TURN_FIELDS order; long ones are
+# zlib-compressed and base64-encoded behind a 'z' prefix (the Redis client decodes
+# replies as text, so raw bytes cannot be stored).
+_TURN_FIELDS = ('question', 'answer', 'score', 'llm_answer')
+TURN_COMPRESS_MIN_CHARS = 512
+
+
+def _compact_json(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def encode_turn(turn):
+    payload = _compact_json([turn.get('question', ''), turn.get('answer', ''),
+                             turn.get('score', 0.0), turn.get('llm_answer', '')])
+    if len(payload) >= TURN_COMPRESS_MIN_CHARS:
+        packed = 'z' + base64.b64encode(zlib.compress(payload.encode('utf-8'))).decode('ascii')
+        if len(packed) < len(payload):
+            return packed
+    return payload
+
+
+def decode_turn(raw):
+    if raw.startswith('z'):
+        raw = zlib.decompress(base64.b64decode(raw[1:])).decode('utf-8')
+    return dict(zip(_TURN_FIELDS, json.loads(raw)))
+
+
+class StreamCancelled(Exception):
+    """Raised in a streamed question's generation thread once its consumer has gone away."""
+
+
+class SessionConflict(Exception):
+    """Raised by InterviewSession.save when another request saved the session after it was loaded."""
+
 
 class InterviewSession:
+    __slots__ = (
+        'session_id', 'topic', 'name', 'email', 'questions_and_answers', 'question_count',
+        'current_question', 'difficulty_levels', 'level_index', 'phase', 'initial_questions',
+        'context', 'last_prompt_bytes', '_persisted_scalars', '_persisted_turns',
+        '_persisted_initials', '_dirty_turns', '_legacy_storage', '_token_sink', '_llm_purpose', '_coalesce',
+    )
+
     def __init__(self, topic, name, email, session_id=None):
         self.session_id = session_id if session_id else str(uuid.uuid4())
         self.topic = topic
@@ -14,27 +216,24 @@ class InterviewSession:
         self.questions_and_answers = []
         self.question_count = 0  # total questions asked
         self.current_question = None
-        # Difficulty management
+        # Difficulty management (own copy of the default; only a customized list is persisted)
         self.difficulty_levels = list(DIFFICULTY_LEVELS)
         self.level_index = 0  # 0..4
         self.phase = 'main'   # 'main' or 'followup' for each level
         # Track unique initial questions to avoid repetition
         self.initial_questions = []
-
-    def to_dict(self):
-        return {
-            'session_id': self.session_id,
-            'topic': self.topic,
-            'name': self.name,
-            'email': self.email,
-            'questions_and_answers': json.dumps(self.questions_and_answers),
-            'question_count': self.question_count,
-            'current_question': self.current_question or '',  # Convert None to empty string
-            'level_index': self.level_index,
-            'phase': self.phase,
-            'difficulty_levels': json.dumps(self.difficulty_levels),
-            'initial_questions': json.dumps(self.initial_questions),
-        }
+        # Windowed/summarized history for follow-up prompts
+        self.context = ConversationContext()
+        # Size of the most recent question prompt, for monitoring prompt growth
+        self.last_prompt_bytes = 0
+        # Nothing persisted yet: the first save writes everything
+        self._mark_persisted({}, turns=0, initials=0)
+        # Set while stream_question() runs; receives LLM text fragments as they arrive
+        self._token_sink = None
+        # What the next LLM call is for (the label of its latency metric); set by the *_steps generators
+        self._llm_purpose = 'initial'
+        # Whether the next LLM call may be shared with concurrent identical prompts
+        self._coalesce = False
 
     @classmethod
     def from_dict(cls, data):
@@ -49,76 +248,273 @@ class InterviewSession:
             session.level_index = 0
         session.phase = data.get('phase', 'main') or 'main'
         try:
-            session.difficulty_levels = json.loads(data.get('difficulty_levels', '[]')) or [
-                'very easy', 'easy', 'medium', 'hard', 'very hard'
-            ]
+            # Empty means the default levels, which are not stored per session
+            session.difficulty_levels = json.loads(data.get('difficulty_levels') or '[]') or list(DIFFICULTY_LEVELS)
         except json.JSONDecodeError:
-            session.difficulty_levels = ['very easy', 'easy', 'medium', 'hard', 'very hard']
+            session.difficulty_levels = list(DIFFICULTY_LEVELS)
         try:
             session.initial_questions = json.loads(data.get('initial_questions', '[]'))
         except json.JSONDecodeError:
             session.initial_questions = []
+        try:
+            session.context = ConversationContext(
+                json.loads(data.get('context_summary', '[]')),
+                int(data.get('context_summarized', 0)),
+            )
+        except (TypeError, ValueError):
+            session.context = ConversationContext()  # rebuilt from the turns on the next fold
         return session
 
+    # --- Redis persistence ---
+    # Layout (STORAGE_FORMAT '3'):
+    #   session:<id>           hash of scalar fields (only changed fields are rewritten)
+    #   session:<id>:turns     list with one encoded Q&A turn per element (see encode_turn;
+    #                          appended/LSET per turn)
+    #   session:<id>:initials  list of initial questions (append-only)
+    # Hashes written before the turn lists (no 'format' field) keep everything in the main
+    # hash as JSON strings; they are still readable and are migrated on their next save.
+    # load() and save() are each a single pipelined round trip that also refreshes the
+    # idle expiry (SESSION_IDLE_TTL_SEC) of all three keys, so abandoned sessions age out.
+    # The hash's 'version' field is bumped by every save; saving a loaded session first checks
+    # (under WATCH) that the version is still the one it loaded, so a concurrent request's
+    # save is never overwritten (SessionConflict instead).
+    STORAGE_FORMAT = '3'
+    _LIST_FIELDS = ('questions_and_answers', 'initial_questions')
+
+    @staticmethod
+    def _keys(session_id):
+        base = f"session:{session_id}"
+        return base, f"{base}:turns", f"{base}:initials"
+
+    def _scalar_fields(self):
+        """Scalar state as it is stored in the session hash (all values as strings)."""
+        return {
+            'format': self.STORAGE_FORMAT,
+            'session_id': self.session_id,
+            'topic': self.topic,
+            'name': self.name,
+            'email': self.email,
+            'question_count': str(self.question_count),
+            'current_question': self.current_question or '',  # Convert None to empty string
+            'level_index': str(self.level_index),
+            'phase': self.phase,
+            'difficulty_levels': (
+                '' if tuple(self.difficulty_levels) == DIFFICULTY_LEVELS else _compact_json(self.difficulty_levels)
+            ),
+            'context_summary': _compact_json(self.context.summary),
+            'context_summarized': str(self.context.summarized),
+        }
+
+    def _mark_persisted(self, scalars, turns=None, initials=None):
+        # Snapshot of what Redis holds, used to compute the next incremental write
+        self._persisted_scalars = scalars
+        self._persisted_turns = len(self.questions_and_answers) if turns is None else turns
+        self._persisted_initials = len(self.initial_questions) if initials is None else initials
+        self._dirty_turns = set()
+        self._legacy_storage = False
+
+    def update_turn(self, index, **fields):
+        """Update fields of an existing Q&A turn and mark it for the next save."""
+        self.questions_and_answers[index].update(fields)
+        self._dirty_turns.add(index % len(self.questions_and_answers))
+
     def save(self, r):
-        if r:
-            r.hset(f"session:{self.session_id}", mapping=self.to_dict())
+        """Write only what changed since the last load/save: changed scalar fields,
+        new or updated Q&A turns and new initial questions."""
+        if not r:
+            return
+        with session_store_seconds.time(op='save'):
+            self._save(r)
+
+    def _save(self, r):
+        key, turns_key, initials_key = self._keys(self.session_id)
+
+        scalars = self._scalar_fields()
+        changed = {k: v for k, v in scalars.items() if self._persisted_scalars.get(k) != v}
+        new_turns = self.questions_and_answers[self._persisted_turns:]
+        updated_turns = sorted(i for i in self._dirty_turns if i < self._persisted_turns)
+        new_initials = self.initial_questions[self._persisted_initials:]
+
+        if not (changed or updated_turns or new_turns or new_initials or self._legacy_storage):
+            return  # load() already refreshed the expiry
+
+        version = self._persisted_scalars.get('version')
+        scalars['version'] = changed['version'] = str(int(version or 0) + 1)
+
+        pipe = r.pipeline()  # MULTI/EXEC: the write is applied atomically
+        try:
+            if self._persisted_scalars:
+                # Loaded or saved before: make sure nobody else saved since
+                pipe.watch(key)
+                if pipe.hget(key, 'version') != version:
+                    raise SessionConflict(self.session_id)
+                pipe.multi()
+            if self._legacy_storage:
+                pipe.hdel(key, *self._LIST_FIELDS)
+            pipe.hset(key, mapping=changed)
+            for index in updated_turns:
+                pipe.lset(turns_key, index, encode_turn(self.questions_and_answers[index]))
+            if new_turns:
+                pipe.rpush(turns_key, *[encode_turn(turn) for turn in new_turns])
+            if new_initials:
+                pipe.rpush(initials_key, *new_initials)
+            for k in (key, turns_key, initials_key):
+                pipe.expire(k, SESSION_IDLE_TTL_SEC)
+            pipe.execute()
+        except redis.exceptions.WatchError:
+            raise SessionConflict(self.session_id) from None
+        finally:
+            pipe.reset()
+        self._mark_persisted(scalars)
 
     @classmethod
     def load(cls, r, session_id):
         if r:
-            data = r.hgetall(f"session:{session_id}")
+            keys = cls._keys(session_id)
+            key, turns_key, initials_key = keys
+            pipe = r.pipeline()
+            pipe.hgetall(key)
+            pipe.lrange(turns_key, 0, -1)
+            pipe.lrange(initials_key, 0, -1)
+            for k in keys:
+                pipe.expire(k, SESSION_IDLE_TTL_SEC)
+            with session_store_seconds.time(op='load'):
+                data, turns, initials = pipe.execute()[:3]
             if data:
-                return cls.from_dict(data)
+                session = cls.from_dict(data)
+                if 'format' not in data:
+                    # Pre-turn-list hash: everything is in `data`; rewrite it all on the next save
+                    session._legacy_storage = True
+                    return session
+                session.questions_and_answers = [decode_turn(turn) for turn in turns]
+                session.initial_questions = initials
+                session._mark_persisted(data)
+                return session
         return None
 
+    @classmethod
+    def delete(cls, r, session_id):
+        if r:
+            r.delete(*cls._keys(session_id))
+
+    # --- Question generation ---
+    # The *_steps generators hold the interview state machine without doing any I/O:
+    # they yield prompts and receive the LLM's text back. `_run_steps` drives them with
+    # blocking calls and `_arun_steps` with async calls, so both serving paths share one copy.
+
     def generate_initial_question(self):
+        return self._run_steps(self._initial_question_steps())
+
+    async def agenerate_initial_question(self):
+        """Async variant of generate_initial_question (see asgi.py)."""
+        return await self._arun_steps(self._initial_question_steps())
+
+    def _initial_question_steps(self):
         # Start at level 0 (very easy), main question
         self.level_index = 0
         self.phase = 'main'
         self.question_count = 1
         difficulty = self.difficulty_levels[self.level_index]
-        prompt = (
-            f"Your task is to generate a single, open-ended interview question about the topic: {self.topic}. Ask {difficulty} technical question on the topic ."
-            f"Return only the question itself, with no extra text or explanation"
-        )
-        question = self._call_gemini_api(prompt)
+
+        def prompt(count):
+            request, output = _main_question_wording(count)
+            return (
+                f"Your task is to generate {request} about the topic: {self.topic}. "
+                f"Ask {difficulty} technical questions on the topic. {output}"
+            )
+        self._llm_purpose = 'initial'
+        question = yield from self._unique_main_question_steps(prompt)
         self.current_question = question
-        # Record unique initial
-        self.initial_questions.append(question)
         # Initialize the Q&A entry with placeholders for the score and LLM answer
         self.questions_and_answers.append({"question": question, "answer": "", "score": 0.0, "llm_answer": ""})
         return question
 
-    def generate_next_question(self, last_answer):
+    def generate_next_question(self, last_answer, scoring_mode=None):
+        """Record the candidate's answer, score it and generate the next question.
+
+        `scoring_mode` overrides config.SCORING_MODE:
+        - 'inline': score first, then generate the next question.
+        - 'concurrent': score on a worker thread while the next question is
+          generated; the score is written back before this method returns.
+        - 'queue': only record the answer; the caller enqueues a scoring job
+          (see scoring_queue.py) and the worker scores it out of band.
+        """
+        mode = scoring_mode or SCORING_MODE
+        scoring_future = None
+
         # --- Scoring Logic Start ---
-        if self.questions_and_answers:
-            # Get the question the candidate just answered
-            last_question = self.questions_and_answers[-1]['question']
-            
-            # Update the candidate's answer
-            self.questions_and_answers[-1]['answer'] = last_answer
-            
-            # Generate the ideal LLM answer for scoring
-            llm_answer = generate_llm_answer(last_question, self.topic)
-            self.questions_and_answers[-1]['llm_answer'] = llm_answer
-            
-            # Calculate and store the similarity score
-            score = calculate_similarity(last_answer, llm_answer)
-            self.questions_and_answers[-1]['score'] = score
-            print(f"[SCORE] For Q: '{last_question[:50]}...', Score: {score:.2f}")
+        last_index = self._record_answer(last_answer)
+        if last_index is not None:
+            last_question = self.questions_and_answers[last_index]['question']
+            if mode == 'concurrent':
+                # The next question does not depend on the score, so overlap the two LLM calls
+                scoring_future = _scoring_executor.submit(score_answer, last_question, last_answer, self.topic)
+            elif mode != 'queue':
+                llm_answer, score = score_answer(last_question, last_answer, self.topic)
+                self._record_score(last_index, llm_answer, score)
         # --- Scoring Logic End ---
 
+        try:
+            question = self._run_steps(self._followup_or_main_steps(last_answer))
+        finally:
+            if scoring_future is not None:
+                llm_answer, score = scoring_future.result()
+                self._record_score(last_index, llm_answer, score)
+
+        return self._append_question(question)
+
+    async def agenerate_next_question(self, last_answer, scoring_mode=None):
+        """Async variant of generate_next_question with the same scoring modes.
+
+        In 'concurrent' mode scoring and question generation are awaited together
+        on the event loop instead of using the scoring thread pool.
+        """
+        mode = scoring_mode or SCORING_MODE
+        scoring_task = None
+
+        last_index = self._record_answer(last_answer)
+        if last_index is not None and mode != 'queue':
+            last_question = self.questions_and_answers[last_index]['question']
+            scoring_task = asyncio.ensure_future(ascore_answer(last_question, last_answer, self.topic))
+            if mode != 'concurrent':
+                self._record_score(last_index, *await scoring_task)
+                scoring_task = None
+
+        try:
+            question = await self._arun_steps(self._followup_or_main_steps(last_answer))
+        finally:
+            if scoring_task is not None:
+                self._record_score(last_index, *await scoring_task)
+
+        return self._append_question(question)
+
+    def _record_answer(self, last_answer):
+        """Store the candidate's answer on the open turn; returns its index (None if no turn yet)."""
+        if not self.questions_and_answers:
+            return None
+        last_index = len(self.questions_and_answers) - 1
+        self.update_turn(last_index, answer=last_answer)
+        return last_index
+
+    def _append_question(self, question):
+        self.current_question = question
+        self.questions_and_answers.append({"question": question, "answer": "", "score": 0.0, "llm_answer": ""})
+        return question
+
+    def _record_score(self, index, llm_answer, score):
+        self.update_turn(index, llm_answer=llm_answer, score=score)
+        if score is not None:
+            answer_score.observe(score)
+
+    def _followup_or_main_steps(self, last_answer):
+        """Advance the level/phase state machine, yielding each prompt for the next question."""
         self.question_count += 1
-        
-        # Build conversation history for context
-        conversation_history = ""
-        for qa in self.questions_and_answers:
-            conversation_history += f"Q: {qa['question']}\nA: {qa['answer']}\n\n"
 
         # Determine next prompt based on phase
         difficulty = self.difficulty_levels[self.level_index]
         if self.phase == 'main':
+            # Recent turns verbatim plus a rolling summary of earlier ones (bounded size)
+            conversation_history = self.context.render(self.questions_and_answers)
             # Next should be a follow-up at the same difficulty
             prompt = (
                 "You are an expert interviewer. Based on the conversation history and the candidate's last answer, "
@@ -126,43 +522,219 @@ class InterviewSession:
                 f"Internally target difficulty: {difficulty}. Do NOT mention or allude to difficulty. "
                 "Be concise and focused on the last answer. Return ONLY the question text.\n\n"
                 f"Conversation History:\n{conversation_history}\n"
-                f"Candidate's Last Answer: \"{last_answer}\""
+                f"Candidate's Last Answer: \"{_clip(last_answer, self.context.token_budget * 2)}\""
             )
             # Switch to follow-up phase (we are generating the follow-up now)
             self.phase = 'followup'
-            question = self._call_gemini_api(prompt)
+            self._llm_purpose = 'follow_up'
+            question = yield prompt
         else:
             # We just asked follow-up previously; advance difficulty level and ask a new main question
             if self.level_index < len(self.difficulty_levels) - 1:
                 self.level_index += 1
             difficulty = self.difficulty_levels[self.level_index]
-            base_prompt = (
-                f"You are an expert interviewer. Craft a single, open-ended QUESTION on the topic '{self.topic}'. "
-                f"It must be technical and distinct from any previous initial questions. "
-                f"Internally target difficulty: {difficulty}. Do NOT mention or allude to difficulty levels. "
-                f"Keep language natural and conversational. Return ONLY the question text."
-            )
+
+            def base_prompt(count):
+                request, output = _main_question_wording(count)
+                return (
+                    f"You are an expert interviewer. Craft {request} on the topic '{self.topic}'. "
+                    f"Each must be technical and distinct from any previous initial questions. "
+                    f"Internally target difficulty: {difficulty}. Do NOT mention or allude to difficulty levels. "
+                    f"Keep language natural and conversational. {output}"
+                )
             # Ensure phase reflects the new initial BEFORE calling LLM so stubbed tests see 'main'
             self.phase = 'main'
-            # Try to ensure uniqueness from prior initials
-            question = self._call_gemini_api(base_prompt)
+            self._llm_purpose = 'next_main'
+            question = yield from self._unique_main_question_steps(base_prompt)
+
+        return question
+
+    def _unique_main_question_steps(self, base_prompt):
+        """Yield prompts for a main question that does not repeat this session's, and record it.
+
+        `base_prompt(count)` builds the prompt asking for `count` questions. A
+        precomputed question from the question bank is used when available. On a
+        miss, with QUESTION_CANDIDATES > 1 a single call asks for several candidates
+        and one is picked locally, preferring one that is also distinct from the
+        topic's recent questions; otherwise a near-duplicate of the session's own
+        questions is retried with an avoid list. The topic-wide history never
+        costs a retry: on a popular topic most new questions resemble one of its
+        recent questions. Streamed questions always use one candidate per call,
+        since every token goes straight to the browser.
+
+        A non-streamed first question asks for SHARED_INITIAL_CANDIDATES
+        candidates in a coalesced call: candidates starting the same topic at once
+        share that call, and each claims a different question from it (asking for
+        its own when all are taken).
+        """
+        banked = question_bank.pop(self.topic, self.level_index, avoid=self.initial_questions)
+        wanted = 1 if self._token_sink is not None else QUESTION_CANDIDATES
+        shared = self._llm_purpose == 'initial' and self._token_sink is None and SHARED_INITIAL_CANDIDATES > 1
+        if banked is not None:
+            question = banked  # precomputed: no LLM call at all
+        elif shared or wanted > 1:
+            self._coalesce = shared
+            text = yield base_prompt(max(wanted, SHARED_INITIAL_CANDIDATES) if shared else wanted)
+            self._coalesce = False
+            if text.startswith("Error:"):
+                return text
+            candidates = _parse_candidates(text) or [text.strip()]
+            fresh = [c for c in candidates
+                     if not question_index.find_similar(self.topic, c, self.initial_questions, include_recent=False)]
+            # Prefer candidates distinct from the topic's recent questions too
+            ranked = sorted(fresh, key=lambda c: question_index.find_similar(self.topic, c) is not None)
+            if not shared:
+                # all similar: take the first rather than pay another round trip
+                question = ranked[0] if ranked else candidates[0]
+            else:
+                question = next((c for c in ranked if question_index.claim(self.topic, c, LLM_COALESCE_LOCK_TTL_SEC)),
+                                None)
+                if question is None:
+                    # More concurrent callers than candidates: this one asks for its own
+                    question = yield base_prompt(1)
+                    if question.startswith("Error:"):
+                        return question
+        else:
+            question = yield base_prompt(1)
             retries = 2
-            while retries >= 0 and question in self.initial_questions:
-                avoid_list = " | ".join(self.initial_questions[-5:])  # include last few initials
+            rejected = []
+            while retries >= 0 and question_index.find_similar(
+                    self.topic, question, self.initial_questions, include_recent=False):
+                # Name the rejected questions too, so the retry is not steered back to them
+                rejected.append(question)
+                avoid_list = " | ".join(self.initial_questions[-5:] + rejected)  # include last few initials
                 prompt = (
-                    base_prompt +
+                    base_prompt(1) +
                     f" Ensure it is not similar to any of these: {avoid_list}."
                 )
-                question = self._call_gemini_api(prompt)
+                question = yield prompt
                 retries -= 1
-            # Record unique initial (even if retries exhausted, record to move on)
-            self.initial_questions.append(question)
-            self.phase = 'main'
-
-        self.current_question = question
-        self.questions_and_answers.append({"question": question, "answer": "", "score": 0.0, "llm_answer": ""})
+            if question.startswith("Error:"):
+                return question
+        # Record unique initial (even if no distinct question was found, record to move on)
+        self.initial_questions.append(question)
+        question_index.add(self.topic, question)
         return question
 
+    def _run_steps(self, steps):
+        """Drive a *_steps generator with blocking LLM calls; returns its result."""
+        try:
+            prompt = next(steps)
+            while True:
+                self._measure_prompt(prompt)
+                with llm_call_seconds.time(purpose=self._llm_purpose), llm_purpose(self._llm_purpose):
+                    text = self._call_gemini_api(prompt)
+                prompt = steps.send(text)
+        except StopIteration as done:
+            return done.value
+
+    async def _arun_steps(self, steps):
+        """Drive a *_steps generator with async LLM calls; returns its result."""
+        try:
+            prompt = next(steps)
+            while True:
+                self._measure_prompt(prompt)
+                with llm_call_seconds.time(purpose=self._llm_purpose), llm_purpose(self._llm_purpose):
+                    text = await self._acall_gemini_api(prompt)
+                prompt = steps.send(text)
+        except StopIteration as done:
+            return done.value
+
+    def _measure_prompt(self, prompt):
+        self.last_prompt_bytes = len(prompt.encode('utf-8'))
+        prompt_bytes.observe(self.last_prompt_bytes, purpose=self._llm_purpose)
+
+    def stream_question(self, produce):
+        """Run `produce` (e.g. `self.generate_initial_question`) and stream its LLM output.
+
+        Yields `(event, data)` tuples:
+        - ('reset', None) before each LLM attempt (a retried question replaces the partial text),
+        - ('token', fragment) for every text fragment,
+        - ('done', question) with the final question once `produce` returns.
+        Exceptions raised by `produce` are re-raised to the consumer. If the consumer
+        closes the generator early (client disconnected), `produce` is stopped with
+        StreamCancelled at its next LLM fragment, so no further calls are made.
+        """
+        events = queue.Queue()
+        outcome = {}
+        cancelled = threading.Event()
+
+        def _sink(item):
+            if cancelled.is_set():
+                raise StreamCancelled(self.session_id)
+            events.put(item)
+
+        def _run():
+            self._token_sink = _sink
+            try:
+                outcome['question'] = produce()
+            except BaseException as e:
+                outcome['error'] = e
+            finally:
+                self._token_sink = None
+                events.put(StopIteration)
+
+        threading.Thread(target=_run, name=f"stream-{self.session_id[:8]}", daemon=True).start()
+        try:
+            while True:
+                item = events.get()
+                if item is StopIteration:
+                    break
+                yield ('reset', None) if item is None else ('token', item)
+        finally:
+            cancelled.set()
+        if 'error' in outcome:
+            raise outcome['error']
+        yield 'done', outcome['question']
+
+    async def astream_question(self, produce):
+        """Async variant of `stream_question` for the async serving path (see asgi.py).
+
+        `produce` is a coroutine function (e.g. `self.agenerate_initial_question`);
+        it runs as a task on the same event loop and is cancelled if the consumer
+        stops early (e.g. the client disconnected).
+        """
+        events = asyncio.Queue()
+        self._token_sink = events.put_nowait
+        task = asyncio.ensure_future(produce())
+        task.add_done_callback(lambda _: events.put_nowait(StopIteration))
+        try:
+            while True:
+                item = await events.get()
+                if item is StopIteration:
+                    break
+                yield ('reset', None) if item is None else ('token', item)
+            yield 'done', task.result()
+        finally:
+            self._token_sink = None
+            task.cancel()
+
     def _call_gemini_api(self, prompt, retries=3, backoff_factor=2):
-        # Delegate to utilities.llm for a single integration point
-        return call_gemini_api(prompt, retries=retries, backoff_factor=backoff_factor)
\ No newline at end of file
+        # Delegate to utilities.llm for a single integration point. Question prompts are only
+        # coalesced when the steps ask for it: candidates of the same topic must get different questions
+        client = get_llm_client()
+        sink = self._token_sink
+        if self._coalesce:
+            return prompt_coalescer.generate(client, prompt, retries=retries, backoff_factor=backoff_factor)
+        if sink is None:
+            return client.generate(prompt, retries=retries, backoff_factor=backoff_factor)
+        sink(None)  # new attempt: discard anything streamed for a previous one
+        fragments = []
+        for fragment in client.stream(prompt, retries=retries, backoff_factor=backoff_factor):
+            fragments.append(fragment)
+            sink(fragment)
+        return ''.join(fragments).strip()
+
+    async def _acall_gemini_api(self, prompt, retries=3, backoff_factor=2):
+        client = get_llm_client()
+        sink = self._token_sink
+        if self._coalesce:
+            return await prompt_coalescer.agenerate(client, prompt, retries=retries, backoff_factor=backoff_factor)
+        if sink is None:
+            return await client.agenerate(prompt, retries=retries, backoff_factor=backoff_factor)
+        sink(None)
+        fragments = []
+        async for fragment in client.astream(prompt, retries=retries, backoff_factor=backoff_factor):
+            fragments.append(fragment)
+            sink(fragment)
+        return ''.join(fragments).strip()
\ No newline at end of file
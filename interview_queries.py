@@ -0,0 +1,87 @@
+"""Paginated interview queries for reporting.
+
+Pages are keyset-based: each page continues after the (timestamp, id) of the
+previous page's last row instead of using OFFSET, so fetching page N costs the
+same as fetching page 1 and rows inserted meanwhile do not shift pages. The
+filters and the ordering match the indexes on Interview (topic or
+candidate_email, then timestamp, id). Results are eager-loaded with one extra
+query per page instead of one query per interview.
+
+Rows without a timestamp (written before it had a default) sort first, by id.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, selectinload
+
+from database_models import Interview
+
+
+def encode_cursor(interview):
+    """Opaque cursor pointing just after `interview`."""
+    timestamp = interview.timestamp.isoformat() if interview.timestamp is not None else ''
+    return f"{timestamp}|{interview.id}"
+
+
+def decode_cursor(cursor):
+    """(timestamp or None, id) of the row a cursor points after."""
+    timestamp, interview_id = cursor.rsplit('|', 1)
+    return (datetime.fromisoformat(timestamp) if timestamp else None), int(interview_id)
+
+
+def interviews_query(session, topic=None, email=None, since=None, until=None, with_results=True):
+    """Interviews matching the filters, oldest first. `since` is inclusive, `until` exclusive."""
+    query = session.query(Interview)
+    if topic is not None:
+        query = query.filter(Interview.topic == topic)
+    if email is not None:
+        query = query.filter(Interview.candidate_email == email)
+    if since is not None:
+        query = query.filter(Interview.timestamp >= since)
+    if until is not None:
+        query = query.filter(Interview.timestamp < until)
+    if with_results:
+        query = query.options(selectinload(Interview.results))
+    return query.order_by(Interview.timestamp.asc().nulls_first(), Interview.id)
+
+
+def fetch_page(session, after=None, page_size=100, **filters):
+    """Return (interviews, next_cursor); next_cursor is None on the last page.
+
+    `filters` are the keyword arguments of `interviews_query`.
+    """
+    query = interviews_query(session, **filters)
+    if after:
+        timestamp, interview_id = decode_cursor(after)
+        if timestamp is None:
+            # Still among the NULL timestamps, which come first
+            query = query.filter(or_(
+                Interview.timestamp.isnot(None),
+                and_(Interview.timestamp.is_(None), Interview.id > interview_id),
+            ))
+        else:
+            query = query.filter(or_(
+                Interview.timestamp > timestamp,
+                and_(Interview.timestamp == timestamp, Interview.id > interview_id),
+            ))
+    rows = query.limit(page_size + 1).all()
+    if len(rows) > page_size:
+        return rows[:page_size], encode_cursor(rows[page_size - 1])
+    return rows, None
+
+
+def iter_interviews(session, page_size=100, **filters):
+    """Yield every matching interview (results loaded), one page in memory at a time.
+
+    Pages are read through a private session on `session`'s engine, so the
+    caller's session (and any objects or changes it holds) is left alone;
+    yielded interviews are detached once the next page is fetched.
+    """
+    with Session(bind=session.get_bind(Interview)) as own:
+        cursor = None
+        while True:
+            page, cursor = fetch_page(own, after=cursor, page_size=page_size, **filters)
+            yield from page
+            if cursor is None:
+                return
+            own.expunge_all()  # drop the finished page from the identity map
@@ -0,0 +1,107 @@
+"""Database persistence for completed interviews.
+
+An interview and all of its results are written with two statements in one
+transaction: an INSERT ... RETURNING for the Interview row and a single
+executemany INSERT for its Result rows (SQLAlchemy batches these into
+multi-row VALUES on Postgres). This replaces one ORM object per answer plus a
+unit-of-work flush. See benchmark_persistence.py for a comparison of the two.
+`save_interviews` writes a batch of interviews the same way (used by the
+write-behind worker in results_writer.py).
+"""
+from sqlalchemy import insert
+
+from database_models import Interview, Result
+from scorecard import is_llm_error
+from utilities.metrics import db_commit_seconds
+
+
+def result_rows(interview_id, questions_and_answers):
+    """Result column values for each Q&A turn, including the ideal answer it was scored against.
+
+    A turn left unscored because its ideal answer failed ("Error: ..." text,
+    score None) is stored with a NULL llm_answer and a score of 0.0.
+    """
+    rows = []
+    for qa in questions_and_answers:
+        llm_answer, score = qa.get('llm_answer'), qa.get('score', 0.0)
+        rows.append({
+            'interview_id': interview_id,
+            'question': qa['question'],
+            'answer': qa.get('answer', ''),
+            'llm_answer': None if not llm_answer or is_llm_error(llm_answer) else llm_answer,
+            'score': 0.0 if score is None else score,
+        })
+    return rows
+
+
+def average_score(questions_and_answers):
+    """Mean score of the scored turns; None if no turn could be scored."""
+    scores = [qa['score'] for qa in questions_and_answers if qa.get('score') is not None]
+    return sum(scores) / len(scores) if scores else None
+
+
+def _format_score(score):
+    return 'n/a' if score is None else f"{score:.2f}"
+
+
+def save_interviews(session, interviews):
+    """Insert a batch of interviews and their results in one transaction and commit.
+
+    Each item is a dict with name, email, topic, average_score and
+    questions_and_answers. Returns the new interview ids in input order.
+    Rolls back and re-raises on failure, so either the whole batch is stored or none of it.
+    """
+    if not interviews:
+        return []
+    with db_commit_seconds.time():
+        try:
+            interview_ids = session.scalars(
+                insert(Interview).returning(Interview.id, sort_by_parameter_order=True),
+                [
+                    {
+                        'candidate_name': item['name'],
+                        'candidate_email': item['email'],
+                        'topic': item['topic'],
+                        'average_score': item['average_score'],
+                    }
+                    for item in interviews
+                ],
+            ).all()
+            rows = []
+            for interview_id, item in zip(interview_ids, interviews):
+                rows.extend(result_rows(interview_id, item['questions_and_answers']))
+            if rows:
+                session.execute(insert(Result), rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+    return interview_ids
+
+
+def save_interview(session, name, email, topic, average_score, questions_and_answers):
+    """Insert the interview and its results and commit. Returns the new interview id.
+
+    Rolls back and re-raises on failure.
+    """
+    return save_interviews(session, [{
+        'name': name,
+        'email': email,
+        'topic': topic,
+        'average_score': average_score,
+        'questions_and_answers': questions_and_answers,
+    }])[0]
+
+
+def format_transcript(name, email, topic, average_score, questions_and_answers):
+    """Human-readable scorecard of a completed interview, for server-side logging."""
+    transcript = f"\n--- FINAL SCORECARD FOR {name.upper()} ---\n"
+    transcript += f"Email: {email}\nTopic: {topic}\n"
+    transcript += f"FINAL AVERAGE SCORE: {_format_score(average_score)}\n"
+    transcript += "--------------------------------------------------\n"
+    for i, qa in enumerate(questions_and_answers):
+        transcript += f"Q{i+1}: {qa['question']}\n"
+        transcript += f"A: {qa['answer']}\n"
+        transcript += f"Score: {_format_score(qa.get('score'))}\n\n"
+    transcript += "--------------------------------------------------\n"
+    return transcript
@@ -0,0 +1,37 @@
+"""Add the reporting indexes from database_models.py to an existing database.
+
+db.create_all() only creates indexes together with new tables, so databases
+created before the indexes were declared need this once. Indexes that already
+exist are skipped, so it is safe to re-run.
+
+Usage:
+    python migrate_indexes.py
+"""
+from extensions import db
+from database_models import Interview, Result
+
+
+def migrate(engine):
+    """Create any declared index missing from the database. Returns the names created."""
+    created = []
+    for table in (Interview.__table__, Result.__table__):
+        existing = {index['name'] for index in db.inspect(engine).get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            if index.name not in existing:
+                index.create(bind=engine)
+                created.append(index.name)
+    return created
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from app import create_app
+
+    load_dotenv()
+    app = create_app()
+    with app.app_context():
+        created = migrate(db.engine)
+    if created:
+        print("Created indexes: " + ", ".join(created))
+    else:
+        print("All indexes already exist.")
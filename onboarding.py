@@ -13,6 +13,7 @@ from utilities.constants import (
     RESEND_COOLDOWN_SEC as _RESEND_COOLDOWN_SEC,
     MAX_CODE_ATTEMPTS as _MAX_CODE_ATTEMPTS,
 )
+from config import ONBOARDING_IDLE_TTL_SEC
 from utilities.email import send_verification_email
 from utilities.validators import looks_like_email
 
@@ -71,11 +72,20 @@ class OnboardingSession:
     def save(self):
         if not self.r:
             return
-        self.r.hset(self.redis_key, mapping=self.state.to_dict())
+        # One round trip that also refreshes the idle expiry
+        pipe = self.r.pipeline()
+        pipe.hset(self.redis_key, mapping=self.state.to_dict())
+        pipe.expire(self.redis_key, ONBOARDING_IDLE_TTL_SEC)
+        pipe.execute()
 
     @classmethod
     def load(cls, r, session_id: str):
-        data = r.hgetall(f"onboarding:{session_id}") if r else None
+        data = None
+        if r:
+            pipe = r.pipeline()
+            pipe.hgetall(f"onboarding:{session_id}")
+            pipe.expire(f"onboarding:{session_id}", ONBOARDING_IDLE_TTL_SEC)
+            data = pipe.execute()[0]
         if not data:
             return None
         sess = cls(r, session_id=session_id)
@@ -0,0 +1,201 @@
+"""Precomputed main questions per topic and difficulty level.
+
+Main questions (the first question of an interview and each new level's
+question) do not depend on the candidate's answers, so they can be generated
+ahead of time. The bank keeps a Redis list of ready questions for every
+(topic, level) pair. `InterviewSession` pops from it and generates live only
+on a miss. Demand per topic is counted in a sorted set (capped at
+QUESTION_BANK_TRACKED_TOPICS). When a list of a tracked topic requested at
+least QUESTION_BANK_MIN_DEMAND times drops below QUESTION_BANK_LOW_WATERMARK,
+a refill request is recorded, and the refill worker tops the list up in bulk:
+one LLM call per QUESTION_BANK_BATCH questions. Topics are free text, so
+one-off topics are never refilled. The worker also keeps the most popular
+topics filled ahead of time. Refills skip questions that
+are near-duplicates of the topic's recently asked ones (the same history
+`pop` checks), so banked questions are not discarded on the way out.
+
+Run the refill worker with:
+    python question_bank.py worker
+Fill a topic by hand with:
+    python question_bank.py fill --topic "Python"
+"""
+import json
+import time
+import hashlib
+import argparse
+
+import redis
+
+from config import (
+    REDIS_URL, QUESTION_BANK_TARGET, QUESTION_BANK_LOW_WATERMARK, QUESTION_BANK_BATCH,
+    QUESTION_BANK_TOP_TOPICS, QUESTION_BANK_TRACKED_TOPICS, QUESTION_BANK_MIN_DEMAND,
+)
+from utilities.cache import normalize_text
+from utilities.constants import DIFFICULTY_LEVELS
+
+TOPICS_KEY = 'question_bank:topics'
+REFILL_KEY = 'question_bank:refill'
+
+
+def bank_key(topic, level_index):
+    digest = hashlib.sha256(normalize_text(topic).encode('utf-8')).hexdigest()[:16]
+    return f"question_bank:{digest}:{level_index}"
+
+
+class QuestionBank:
+    """Pops precomputed questions and records refill requests.
+
+    Redis failures are treated as misses so interviews never depend on the bank.
+    """
+
+    def __init__(self, r=None, low_watermark=QUESTION_BANK_LOW_WATERMARK,
+                 tracked_topics=QUESTION_BANK_TRACKED_TOPICS, min_demand=QUESTION_BANK_MIN_DEMAND):
+        self.r = r
+        self.low_watermark = low_watermark
+        self.tracked_topics = tracked_topics
+        self.min_demand = min_demand
+
+    def attach(self, r):
+        """Use `r` as the bank's Redis (None disables the bank)."""
+        self.r = r
+
+    def pop(self, topic, level_index, avoid=()):
+        """Return a banked question for (topic, level), or None on a miss.
+
+        Questions matching `avoid` (e.g. the session's earlier questions) are
+        discarded, up to three pops.
+        """
+        if self.r is None:
+            return None
+        from interview_logic import question_index  # imported late: interview_logic imports this module
+        key = bank_key(topic, level_index)
+        demand = None
+        try:
+            for attempt in range(3):
+                pipe = self.r.pipeline()
+                pipe.lpop(key)
+                pipe.llen(key)
+                if attempt == 0:
+                    pipe.zincrby(TOPICS_KEY, 1, normalize_text(topic))  # demand, for prefill_popular
+                    pipe.zremrangebyrank(TOPICS_KEY, 0, -self.tracked_topics - 1)  # keep the top N only
+                    pipe.zscore(TOPICS_KEY, normalize_text(topic))  # None once dropped from the top N
+                    question, remaining, _, _, demand = pipe.execute()
+                else:
+                    question, remaining = pipe.execute()
+                # One-off topics are never refilled: their banked questions would not be served
+                if remaining < self.low_watermark and demand is not None and demand >= self.min_demand:
+                    self.r.sadd(REFILL_KEY, json.dumps([normalize_text(topic), level_index]))
+                if question is None:
+                    return None
+                if not question_index.find_similar(topic, question, extra=avoid):
+                    return question
+        except redis.exceptions.RedisError as e:
+            print(f"[Question Bank] Redis error, generating live: {e}")
+        return None
+
+
+question_bank = QuestionBank()
+
+
+def _bulk_prompt(topic, difficulty, count, avoid):
+    prompt = (
+        f"You are an expert interviewer. Write {count} different single, open-ended technical interview "
+        f"QUESTIONS on the topic '{topic}'. Internally target difficulty: {difficulty}. Do NOT mention or "
+        f"allude to difficulty levels. Keep language natural and conversational. "
+        f"Return one question per line, with no numbering or other text."
+    )
+    if avoid:
+        prompt += f" Do not repeat or closely paraphrase any of these: {' | '.join(avoid[-10:])}."
+    return prompt
+
+
+def refill(r, topic, level_index, target=QUESTION_BANK_TARGET, batch=QUESTION_BANK_BATCH, client=None):
+    """Top up the (topic, level) list to `target` questions. Returns the number added."""
+    # Imported late: interview_logic imports this module
+    from interview_logic import _parse_candidates, question_index
+    from utilities.llm import get_llm_client
+
+    client = client or get_llm_client()
+    key = bank_key(topic, level_index)
+    difficulty = DIFFICULTY_LEVELS[min(level_index, len(DIFFICULTY_LEVELS) - 1)]
+    banked = r.lrange(key, 0, -1)
+
+    added = 0
+    for _ in range(max(1, target // max(batch, 1)) + 1):  # bounded: a bad LLM day must not spin forever
+        missing = target - r.llen(key)
+        if missing <= 0:
+            break
+        avoid = banked[-5:] + question_index.recent(topic)[:5]
+        text = client.generate(_bulk_prompt(topic, difficulty, min(batch, missing), avoid))
+        if text.startswith("Error:"):
+            print(f"[Question Bank] Refill of '{topic}' level {level_index} failed: {text}")
+            break
+        fresh = []
+        for question in _parse_candidates(text)[:missing]:
+            # Same check as pop(): the topic's recent questions plus what is already banked
+            if not question_index.find_similar(topic, question, extra=banked):
+                banked.append(question)
+                fresh.append(question)
+        if not fresh:
+            break
+        r.rpush(key, *fresh)
+        added += len(fresh)
+    return added
+
+
+def process_refill_requests(r, client=None):
+    """Refill every (topic, level) that dropped below the low watermark. Returns lists refilled."""
+    refilled = 0
+    while True:
+        raw = r.spop(REFILL_KEY)
+        if raw is None:
+            return refilled
+        topic, level_index = json.loads(raw)
+        refill(r, topic, level_index, client=client)
+        refilled += 1
+
+
+def prefill_popular(r, top_n=QUESTION_BANK_TOP_TOPICS, client=None):
+    """Fill every level of the `top_n` most requested topics."""
+    topics = r.zrevrange(TOPICS_KEY, 0, top_n - 1)
+    for topic in topics:
+        for level_index in range(len(DIFFICULTY_LEVELS)):
+            refill(r, topic, level_index, client=client)
+    return topics
+
+
+def run_worker(r, interval=5, prefill_every=600):
+    print("Question bank worker started; waiting for refill requests...")
+    last_prefill = 0.0
+    while True:
+        if time.monotonic() - last_prefill >= prefill_every:
+            prefill_popular(r)
+            last_prefill = time.monotonic()
+        if not process_refill_requests(r):
+            time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate interview questions per topic and difficulty level.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    fill_cmd = sub.add_parser('fill', help='Fill every level of one topic')
+    fill_cmd.add_argument('--topic', required=True)
+    fill_cmd.add_argument('--target', type=int, default=QUESTION_BANK_TARGET)
+    sub.add_parser('worker', help='Serve refill requests and keep popular topics filled')
+    args = parser.parse_args(argv)
+
+    conn = redis.from_url(REDIS_URL, decode_responses=True)
+    from interview_logic import question_index
+    from utilities.llm import rate_limiter
+    rate_limiter.attach(conn)  # refills draw on the same Gemini quota as live interviews
+    question_index.attach(conn)  # and are checked against the questions interviews recently asked
+    if args.command == 'worker':
+        run_worker(conn)
+        return
+    for level_index, difficulty in enumerate(DIFFICULTY_LEVELS):
+        added = refill(conn, args.topic, level_index, target=args.target)
+        print(f"'{args.topic}' level {level_index} ({difficulty}): added {added} questions.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Rescore stored interview results with the current scoring method.
+
+Walks the Interview table in primary-key order, scores each chunk's results
+with `scorecard.score_batch` (one vectorized pass per topic, giving the same
+scores as the live `calculate_similarity`), writes the new scores with a bulk
+UPDATE and refreshes each interview's average score.
+Results without a stored ideal answer (llm_answer) keep their score, as do
+results whose stored ideal answer is an "Error: ..." string. In an interview
+whose other results have an ideal answer, such a result was never really
+scored and is left out of the average; interviews stored before ideal answers
+were kept average all their results.
+
+Usage:
+    python rescore_results.py [--chunk-size 500] [--topic TOPIC] [--dry-run]
+"""
+import argparse
+from collections import defaultdict
+
+from sqlalchemy import update
+
+from database_models import Interview, Result
+from scorecard import score_batch, is_llm_error
+from utilities.cache import normalize_text
+
+
+def _has_ideal_answer(row):
+    return bool(row.llm_answer) and not is_llm_error(row.llm_answer)
+
+
+def rescore_chunk(session, interviews):
+    """Rescore the results of `interviews` (a list of (id, topic) tuples).
+
+    Returns (results_rescored, results_skipped).
+    """
+    topics = dict(interviews)
+    results = (
+        session.query(Result.id, Result.interview_id, Result.answer, Result.llm_answer, Result.score)
+        .filter(Result.interview_id.in_(topics))
+        .all()
+    )
+
+    by_topic = defaultdict(list)
+    for row in results:
+        if _has_ideal_answer(row):
+            by_topic[topics[row.interview_id]].append(row)
+
+    new_scores = {}
+    for topic, rows in by_topic.items():
+        scores = score_batch([(row.answer, row.llm_answer) for row in rows], topic=topic)
+        new_scores.update((row.id, score) for row, score in zip(rows, scores))
+
+    if new_scores:
+        session.execute(update(Result), [{'id': rid, 'score': score} for rid, score in new_scores.items()])
+
+    with_ideal = {row.interview_id for row in results if _has_ideal_answer(row)}
+    totals = defaultdict(list)
+    for row in results:
+        if _has_ideal_answer(row) or row.interview_id not in with_ideal:
+            totals[row.interview_id].append(new_scores.get(row.id, row.score))
+    if totals:
+        session.execute(update(Interview), [
+            {'id': iid, 'average_score': sum(scores) / len(scores)} for iid, scores in totals.items()
+        ])
+    return len(new_scores), len(results) - len(new_scores)
+
+
+def rescore_all(session, chunk_size=500, topic=None, dry_run=False):
+    """Rescore every interview in chunks of `chunk_size`, committing after each chunk."""
+    wanted = normalize_text(topic) if topic else None
+    last_id = 0
+    rescored = skipped = 0
+    while True:
+        chunk = (
+            session.query(Interview.id, Interview.topic)
+            .filter(Interview.id > last_id)
+            .order_by(Interview.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+        interviews = [(row.id, row.topic) for row in chunk if not wanted or normalize_text(row.topic) == wanted]
+        if interviews:
+            done, missing = rescore_chunk(session, interviews)
+            rescored += done
+            skipped += missing
+        if dry_run:
+            session.rollback()
+        else:
+            session.commit()
+        print(f"Processed interviews up to id {last_id}: {rescored} rescored, {skipped} skipped so far.")
+    return rescored, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rescore stored interview results in chunks.")
+    parser.add_argument('--chunk-size', type=int, default=500, help='Interviews per chunk/transaction')
+    parser.add_argument('--topic', help='Only rescore interviews on this topic')
+    parser.add_argument('--dry-run', action='store_true', help='Compute scores but roll back every chunk')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    from extensions import db
+    app = create_app()
+    with app.app_context():
+        rescored, skipped = rescore_all(db.session, chunk_size=args.chunk_size, topic=args.topic, dry_run=args.dry_run)
+    print(f"Done: {rescored} results rescored, {skipped} without a usable stored ideal answer skipped.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Write-behind persistence of completed interviews.
+
+With RESULTS_WRITE_MODE='write_behind' the final /submit appends the completed
+interview to a Redis stream and responds right away; this worker (`python
+results_writer.py`, see Procfile) reads the stream through a consumer group and
+stores entries in batches with `interview_store.save_interviews`.
+
+An entry is acknowledged and removed only after its transaction commits. A
+failed batch is retried entry by entry so one bad interview cannot block the
+others; failed entries stay pending and are reclaimed after RETRY_IDLE_MS. After
+RESULTS_WRITE_MAX_ATTEMPTS failures an entry is moved to the dead-letter list
+DEAD_LETTER_KEY, together with the last error, for inspection or replay.
+Entries that come back without fields (deleted while pending) are dead-lettered
+at once.
+"""
+import os
+import json
+import socket
+
+import redis
+
+from config import REDIS_URL, RESULTS_WRITE_BATCH, RESULTS_WRITE_MAX_ATTEMPTS
+import interview_store
+
+STREAM_KEY = 'interviews:completed'
+GROUP = 'results-writer'
+ATTEMPTS_KEY = 'interviews:completed:attempts'
+DEAD_LETTER_KEY = 'interviews:completed:dead'
+# A pending entry is retried once it has been idle (unacknowledged) this long
+RETRY_IDLE_MS = 30 * 1000
+
+
+def publish_completed(r, name, email, topic, average_score, questions_and_answers):
+    """Append a completed interview to the stream. Returns the entry id."""
+    payload = json.dumps({
+        'name': name,
+        'email': email,
+        'topic': topic,
+        'average_score': average_score,
+        'questions_and_answers': questions_and_answers,
+    }, separators=(',', ':'))
+    return r.xadd(STREAM_KEY, {'payload': payload})
+
+
+def ensure_group(r):
+    try:
+        r.xgroup_create(STREAM_KEY, GROUP, id='0', mkstream=True)
+    except redis.exceptions.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def _finish(r, entry_ids):
+    pipe = r.pipeline()
+    pipe.xack(STREAM_KEY, GROUP, *entry_ids)
+    pipe.xdel(STREAM_KEY, *entry_ids)
+    pipe.hdel(ATTEMPTS_KEY, *entry_ids)
+    pipe.execute()
+
+
+def _dead_letter(r, entry_id, raw_payload, error):
+    r.lpush(DEAD_LETTER_KEY, json.dumps({'id': entry_id, 'payload': raw_payload, 'error': str(error)}))
+    _finish(r, [entry_id])
+
+
+def _record_failure(r, entry_id, raw_payload, error):
+    """Count a failed attempt; dead-letter the entry once it has used up its attempts."""
+    attempts = r.hincrby(ATTEMPTS_KEY, entry_id, 1)
+    if attempts < RESULTS_WRITE_MAX_ATTEMPTS:
+        print(f"[Results Writer] Entry {entry_id} failed (attempt {attempts}): {error}")
+        return False
+    print(f"[Results Writer] Entry {entry_id} failed {attempts} times; moving it to {DEAD_LETTER_KEY}: {error}")
+    _dead_letter(r, entry_id, raw_payload, error)
+    return True
+
+
+def _store(r, db_session, entries):
+    """Persist `entries` ([(id, fields)]); returns the number stored."""
+    if not entries:
+        return 0
+    decoded = []
+    for entry_id, fields in entries:
+        if not isinstance(fields, dict):
+            # XAUTOCLAIM returns None fields for an entry deleted from the stream while still
+            # pending; there is nothing left to store, so retrying cannot help
+            print(f"[Results Writer] Entry {entry_id} has no fields; moving it to {DEAD_LETTER_KEY}")
+            _dead_letter(r, entry_id, '', f"Entry has no fields: {fields!r}")
+            continue
+        try:
+            item = json.loads(fields['payload'])
+            if not isinstance(item, dict):
+                raise ValueError(f"Payload is not an object: {fields['payload'][:80]!r}")
+            decoded.append((entry_id, fields['payload'], item))
+        except (KeyError, TypeError, ValueError) as e:
+            _record_failure(r, entry_id, fields.get('payload', ''), e)
+
+    try:
+        interview_store.save_interviews(db_session, [item for _, _, item in decoded])
+    except Exception as e:
+        if len(decoded) <= 1:
+            for entry_id, raw, _ in decoded:
+                _record_failure(r, entry_id, raw, e)
+            return 0
+        # Isolate the failing interview(s): store the rest one at a time
+        stored = 0
+        for entry_id, raw, item in decoded:
+            try:
+                interview_store.save_interviews(db_session, [item])
+            except Exception as single_error:
+                _record_failure(r, entry_id, raw, single_error)
+            else:
+                _finish(r, [entry_id])
+                stored += 1
+        return stored
+
+    if decoded:
+        _finish(r, [entry_id for entry_id, _, _ in decoded])
+    for _, _, item in decoded:
+        print(interview_store.format_transcript(
+            item['name'], item['email'], item['topic'], item['average_score'], item['questions_and_answers']))
+    return len(decoded)
+
+
+def process_batch(r, db_session, consumer, count=RESULTS_WRITE_BATCH, block_ms=5000):
+    """Store up to `count` entries: reclaimed stale ones first, then new ones.
+
+    Returns the number of interviews stored.
+    """
+    _, entries, *_ = r.xautoclaim(STREAM_KEY, GROUP, consumer, min_idle_time=RETRY_IDLE_MS,
+                                  start_id='0-0', count=count)
+    stored = _store(r, db_session, entries)
+    if entries:
+        return stored
+    response = r.xreadgroup(GROUP, consumer, {STREAM_KEY: '>'}, count=count, block=block_ms)
+    for _, new_entries in response or []:
+        stored += _store(r, db_session, new_entries)
+    return stored
+
+
+def run_worker(r, db_session):
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    ensure_group(r)
+    print(f"Results writer {consumer} started; waiting for completed interviews...")
+    while True:
+        process_batch(r, db_session, consumer)
+
+
+if __name__ == '__main__':
+    from app import create_app
+    from extensions import db
+
+    conn = redis.from_url(REDIS_URL, decode_responses=True)
+    app = create_app()
+    with app.app_context():
+        run_worker(conn, db.session)
@@ -1,8 +1,18 @@
-from flask import Blueprint, request, jsonify, render_template, send_from_directory, current_app
-from interview_logic import InterviewSession
-from scorecard import generate_llm_answer, calculate_similarity
-from database_models import Interview, Result
+import json
+import math
+import redis
+from flask import Blueprint, Response, request, jsonify, render_template, send_from_directory, current_app, stream_with_context
+from config import SCORING_MODE, SCORING_WAIT_TIMEOUT_SEC, RESULTS_WRITE_MODE
+from interview_logic import InterviewSession, SessionConflict, score_answer, question_index
+from scorecard import ideal_answer_cache
+import scoring_queue
+import interview_store
+import results_writer
+import submit_guard
+from question_bank import question_bank
 from onboarding import OnboardingSession
+from utilities.llm import prompt_coalescer, rate_limiter, llm_breaker, LLM_UNAVAILABLE_ERROR
+from utilities.metrics import metrics
 
 # Create a Flask Blueprint to organize routes
 main_bp = Blueprint('main', __name__)
@@ -16,6 +26,17 @@ def init_app(app, redis_conn, db_conn):
     r = redis_conn
     db = db_conn
     """Initializes the routes and registers the blueprint with the Flask app."""
+    # Share cached ideal answers across workers through Redis
+    ideal_answer_cache.attach(redis_conn)
+    # Near-duplicate checks for new questions see every worker's recent questions
+    question_index.attach(redis_conn)
+    question_bank.attach(redis_conn)
+    # Identical in-flight LLM prompts from different workers share one call
+    prompt_coalescer.attach(redis_conn)
+    # Every worker draws on one Gemini quota and pauses together on a 429
+    rate_limiter.attach(redis_conn)
+    # /metrics reports every worker's series
+    metrics.attach(redis_conn)
 
     # Register the blueprint with the main Flask app only once
     if 'main' not in app.blueprints:
@@ -37,6 +58,16 @@ def favicon():
     """Serves the favicon icon."""
     return send_from_directory(current_app.root_path, 'static/favicon.ico', mimetype='image/vnd.microsoft.icon')
 
+@main_bp.route('/metrics')
+def metrics_endpoint():
+    """Stage latency histograms, LLM counters and client state in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@main_bp.teardown_app_request
+def push_metrics(exc):
+    """Share this worker's metrics once a request is done, not while serving it."""
+    metrics.push_if_due()
+
 # === API Endpoints for Interview Flow ===
 @main_bp.route('/start-interview', methods=['POST'])
 def start_interview():
@@ -46,127 +77,377 @@ def start_interview():
     Creates a new InterviewSession, generates the first question, saves it to Redis,
     and returns the session_id and initial question to the client.
     """
-    data = request.get_json()
+    session, error = new_session(request.get_json())
+    if error:
+        payload, status = error
+        return jsonify(payload), status
+
+    # Generate the first question and persist the new session to Redis in one write
+    payload, status = started(session, session.generate_initial_question())
+    return jsonify(payload), status
+
+@main_bp.route('/start-interview/stream', methods=['POST'])
+def start_interview_stream():
+    """Streaming variant of /start-interview.
+
+    Same payload; responds with server-sent events (see `_stream_question_events`)
+    whose final 'done' event carries the session_id and the full question.
+    """
+    session, error = new_session(request.get_json())
+    if error:
+        payload, status = error
+        return jsonify(payload), status
+
+    return _sse_response(_stream_question_events(
+        session, session.generate_initial_question,
+        finish=lambda question: started(session, question),
+    ))
+
+def new_session(data):
+    """Framework-neutral validation of a /start-interview payload (also used by asgi.py).
+
+    Returns (session, None) or (None, (error_payload, status)).
+    """
+    data = data or {}
     topic = data.get('topic')
     name = data.get('name')
     email = data.get('email')
 
     if not all([topic, name, email]):
-        return jsonify({'error': 'Topic, name, and email are required.'}), 400
-
+        return None, ({'error': 'Topic, name, and email are required.'}, 400)
     # Create a new session with all candidate details
-    session = InterviewSession(topic, name, email)
+    return InterviewSession(topic, name, email), None
+
+def started(session, question):
+    """Saves a new session with its first question; returns (payload, status) for the client."""
+    if question == LLM_UNAVAILABLE_ERROR:
+        return unavailable_response()
     session.save(r)
-    
-    # Generate the first question and update the session state in Redis
-    initial_question = session.generate_initial_question()
-    session.save(r) 
-    
-    if initial_question.startswith("Error:"):
-        return jsonify({'error': initial_question}), 500
-    
+    if question.startswith("Error:"):
+        return {'error': question}, 500
     # Return the new session ID so the client can continue the conversation
-    return jsonify({'session_id': session.session_id, 'question': initial_question})
+    return {'session_id': session.session_id, 'question': question}, 200
 
 @main_bp.route('/submit', methods=['POST'])
 def submit():
     """
     Handles answer submission from the client.
-    - Expects 'session_id' and 'answer' in the JSON payload.
-    - Loads the session from Redis.
+    - Expects 'session_id' and 'answer' in the JSON payload, plus an optional
+      'idempotency_key' that the client reuses when it retries the same answer.
+    - Loads the session from Redis (one submission per session at a time; a retry
+      gets the first submission's response, see submit_guard.py).
     - If the interview is not over, generates the next question.
     - If the interview is over (10 questions answered), it calculates the final score,
       logs the transcript, cleans up the session, and notifies the client.
     """
-    data = request.get_json()
+    data = request.get_json() or {}
+    current_session, answer, token, response = begin_submission(data)
+    if response:
+        payload, status = response
+        return jsonify(payload), status
+
+    payload, status = None, 500
+    try:
+        payload, status = answer_submission(current_session, answer)
+    finally:
+        end_submission(data, token, payload, status)
+    return jsonify(payload), status
+
+def answer_submission(current_session, answer):
+    """Records the answer and produces the next question, or completes the interview.
+
+    Returns (payload, status).
+    """
+    try:
+        # Check if the interview is over (after the 10th question is answered: 5 levels × 2 questions each)
+        if current_session.question_count >= 10:
+            return complete_interview(current_session, answer), 200
+
+        # If the interview is not over, generate the next question
+        answered_index = len(current_session.questions_and_answers) - 1
+        next_question = current_session.generate_next_question(answer, scoring_mode=SCORING_MODE)
+        return answered(current_session, answered_index, answer, next_question)
+    except SessionConflict:
+        return submit_guard.CONFLICT_RESPONSE
+
+def answered(current_session, answered_index, answer, question):
+    """Saves the answered turn with the next question; returns (payload, status) for the client.
+
+    Raises SessionConflict if the session was saved by another request meanwhile.
+    """
+    if question == LLM_UNAVAILABLE_ERROR:
+        return unavailable_response()  # nothing saved: the same answer can be sent again
+    persist_answered(current_session, answered_index, answer)
+    if question.startswith("Error:"):
+        return {'error': question, 'finished': True}, 500
+    # Return the next question to the client
+    return {'question': question, 'finished': False}, 200
+
+@main_bp.route('/submit/stream', methods=['POST'])
+def submit_stream():
+    """Streaming variant of /submit.
+
+    Same payload and validation errors; responds with server-sent events whose
+    'token' events carry the next question as Gemini produces it. When the
+    interview is complete a single 'done' event is sent. A retried submission
+    gets the first one's response as plain JSON.
+    """
+    data = request.get_json() or {}
+    current_session, answer, token, response = begin_submission(data)
+    if response:
+        payload, status = response
+        return jsonify(payload), status
+    end = ending_submission(data, token)
+
+    def events():
+        outcome = []
+        try:
+            if current_session.question_count >= 10:
+                payload = complete_interview(current_session, answer)
+                outcome.append((payload, 200))
+                yield _sse_event('done', payload)
+                return
+
+            answered_index = len(current_session.questions_and_answers) - 1
+            try:
+                yield from _stream_question_events(
+                    current_session,
+                    lambda: current_session.generate_next_question(answer, scoring_mode=SCORING_MODE),
+                    finish=lambda question: answered(current_session, answered_index, answer, question),
+                    on_result=lambda payload, status: outcome.append((payload, status)),
+                )
+            except SessionConflict:
+                payload, status = submit_guard.CONFLICT_RESPONSE
+                outcome.append((payload, status))
+                yield _sse_event('error', payload)
+        finally:
+            end(*(outcome[-1] if outcome else (None, 500)))
+
+    response = _sse_response(events())
+    # Also when the client leaves before the generator has run (its finally never does then)
+    response.call_on_close(end)
+    return response
+
+def unavailable_response():
+    """503 (payload, status) while the LLM circuit breaker is open.
+
+    Unlike other LLM errors this does not end the interview: the session is not
+    saved, and the client may resend the same request after `retry_after` seconds.
+    """
+    return {
+        'error': LLM_UNAVAILABLE_ERROR[len('Error: '):],
+        'finished': False,
+        'retry_after': max(1, math.ceil(llm_breaker.retry_after())),
+    }, 503
+
+def begin_submission(data):
+    """Validates an answer submission, takes its session's submit lock and loads the session.
+
+    Returns (session, answer, lock_token, None), or (None, None, None, (payload, status))
+    for an invalid submission or a duplicate (the stored response of the first one).
+    The caller must pass the lock token to `end_submission`.
+    """
+    error = submit_guard.validate_key(data.get('idempotency_key'))
+    if error:
+        return None, None, None, error
+
+    session_id = data.get('session_id')
+    token = None
+    if r and session_id and data.get('answer'):
+        token, response = submit_guard.claim(r, session_id, data.get('idempotency_key'))
+        if token is None:
+            return None, None, None, response
+
+    current_session, answer, error = validate_submission(data)
+    if error:
+        end_submission(data, token, *error)
+        return None, None, None, error
+    return current_session, answer, token, None
+
+def end_submission(data, token, payload, status):
+    """Stores the response for the submission's idempotency key and releases the session lock.
+
+    `payload` is None when handling failed with an exception; then nothing is stored.
+    """
+    if token is None:
+        return
+    if payload is None:
+        submit_guard.release(r, data['session_id'], token)
+    else:
+        submit_guard.finish(r, data['session_id'], token, data.get('idempotency_key'), payload, status)
+
+def ending_submission(data, token):
+    """`end_submission` for a streamed answer, safe to call more than once: only the first call counts.
+
+    The event generator calls it with the outcome; the response's close hook
+    calls it without one, which releases the lock if the stream never ran.
+    """
+    ended = []
+
+    def end(payload=None, status=500):
+        if not ended:
+            ended.append(True)
+            end_submission(data, token, payload, status)
+    return end
+
+def validate_submission(data):
+    """Framework-neutral validation of an answer submission (also used by asgi.py).
+
+    Returns (session, answer, None) or (None, None, (error_payload, status)).
+    """
+    data = data or {}
     session_id = data.get('session_id')
     answer = data.get('answer')
 
     # Fail fast if Redis is not available
     if not r:
-        return jsonify({'error': 'Database connection not available.', 'finished': True}), 500
+        return None, None, ({'error': 'Database connection not available.', 'finished': True}, 500)
 
     if not session_id or not answer:
-        return jsonify({'error': 'Session ID and answer are required.'}), 400
+        return None, None, ({'error': 'Session ID and answer are required.'}, 400)
 
     current_session = InterviewSession.load(r, session_id)
     if not current_session:
-        return jsonify({'error': 'Session expired or not found.', 'finished': True}), 404
-
-    # Check if the interview is over (after the 10th question is answered: 5 levels × 2 questions each)
-    if current_session.question_count >= 10:
-        # --- Final Scoring Logic ---
-        last_question = current_session.questions_and_answers[-1]['question']
-        llm_answer = generate_llm_answer(last_question, current_session.topic)
-        score = calculate_similarity(answer, llm_answer)
-        
-        # Update the last record with the final answer, llm_answer, and score
-        current_session.questions_and_answers[-1]['answer'] = answer
+        return None, None, ({'error': 'Session expired or not found.', 'finished': True}, 404)
+    return current_session, answer, None
+
+def persist_answered(current_session, answered_index, answer):
+    """Saves the session after a new question and queues scoring of the answer if configured."""
+    current_session.save(r) # Save the updated state to Redis
+
+    if SCORING_MODE == 'queue' and answered_index >= 0:
+        # Hand the answer to the scoring worker instead of scoring on the request path
+        answered = current_session.questions_and_answers[answered_index]
+        scoring_queue.enqueue_scoring_job(r, current_session.session_id, answered_index, answered['question'], answer, current_session.topic)
+
+def complete_interview(current_session, answer):
+    """Scores the final answer, logs and stores the interview, and cleans up the session.
+
+    Returns the JSON payload for the client.
+    """
+    session_id = current_session.session_id
+    # --- Final Scoring Logic ---
+    last_question = current_session.questions_and_answers[-1]['question']
+    current_session.questions_and_answers[-1]['answer'] = answer
+
+    if SCORING_MODE == 'queue':
+        # Score the last answer like the others, then wait for this session's outstanding jobs
+        last_index = len(current_session.questions_and_answers) - 1
+        scoring_queue.enqueue_scoring_job(r, session_id, last_index, last_question, answer, current_session.topic)
+        if not scoring_queue.wait_for_session_jobs(r, session_id, SCORING_WAIT_TIMEOUT_SEC):
+            print(f"[Scoring] Timed out waiting for scoring jobs of session {session_id}; scoring the rest inline.")
+        scored = scoring_queue.apply_scores(r, current_session)
+        for i, qa in enumerate(current_session.questions_and_answers):
+            if i not in scored:
+                qa['llm_answer'], qa['score'] = score_answer(qa['question'], qa.get('answer', ''), current_session.topic)
+        scoring_queue.clear_session(r, session_id)
+    else:
+        llm_answer, score = score_answer(last_question, answer, current_session.topic)
+
+        # Update the last record with the final llm_answer and score
         current_session.questions_and_answers[-1]['llm_answer'] = llm_answer
         current_session.questions_and_answers[-1]['score'] = score
-        # --- End Final Scoring ---
+    # --- End Final Scoring ---
 
-        # Calculate average score
-        total_score = sum(qa['score'] for qa in current_session.questions_and_answers)
-        average_score = total_score / len(current_session.questions_and_answers) if current_session.questions_and_answers else 0.0
+    # Average over the scored turns; one whose ideal answer failed has a None score
+    average_score = interview_store.average_score(current_session.questions_and_answers)
 
-        # Build a detailed transcript for server-side logging
-        transcript = f"\n--- FINAL SCORECARD FOR {current_session.name.upper()} ---\n"
-        transcript += f"Email: {current_session.email}\nTopic: {current_session.topic}\n"
-        transcript += f"FINAL AVERAGE SCORE: {average_score:.2f}\n"
-        transcript += "--------------------------------------------------\n"
-        for i, qa in enumerate(current_session.questions_and_answers):
-            transcript += f"Q{i+1}: {qa['question']}\n"
-            transcript += f"A: {qa['answer']}\n"
-            transcript += f"Score: {qa['score']:.2f}\n\n"
-        transcript += "--------------------------------------------------\n"
-        print(transcript)
-        
-        # --- Database Logging ---
-        # Create a new Interview record and associated Result records
+    if RESULTS_WRITE_MODE == 'write_behind' and r is not None:
+        # Hand the interview to the results writer; it stores and logs it in batches
         try:
-            new_interview = Interview(
-                candidate_name=current_session.name,
-                candidate_email=current_session.email,
+            results_writer.publish_completed(
+                r,
+                name=current_session.name,
+                email=current_session.email,
                 topic=current_session.topic,
-                average_score=average_score
+                average_score=average_score,
+                questions_and_answers=current_session.questions_and_answers,
             )
-            db.session.add(new_interview)
-            db.session.flush()  # Use flush to get the ID for the new_interview
-
-            for qa in current_session.questions_and_answers:
-                new_result = Result(
-                    interview_id=new_interview.id,
-                    question=qa['question'],
-                    answer=qa.get('answer', ''),
-                    score=qa.get('score', 0.0)
-                )
-                db.session.add(new_result)
-            
-            db.session.commit()
-            print(f"Successfully saved interview for {current_session.name} to the database.")
-        except Exception as e:
-            db.session.rollback()
-            print(f"Database error: {e}")
-            # Optionally, return an error to the user
-            # return jsonify({'error': 'Could not save interview results.', 'finished': True}), 500
-        # --- End Database Logging ---
-
-        # Clean up the session from Redis
-        r.delete(f"session:{session_id}")
-        
-        # Signal to the client that the interview is finished, without displaying the score
-        return jsonify({'question': 'Thank you for your time! The interview is now complete.', 'finished': True})
-
-    # If the interview is not over, generate the next question
-    next_question = current_session.generate_next_question(answer)
-    current_session.save(r) # Save the updated state to Redis
+        except redis.exceptions.RedisError as e:
+            print(f"[Results Writer] Could not queue interview {session_id}, storing it now: {e}")
+        else:
+            InterviewSession.delete(r, session_id)
+            return {'question': 'Thank you for your time! The interview is now complete.', 'finished': True}
+
+    # Build a detailed transcript for server-side logging
+    print(interview_store.format_transcript(
+        current_session.name, current_session.email, current_session.topic,
+        average_score, current_session.questions_and_answers,
+    ))
+
+    # --- Database Logging ---
+    # Store the Interview record and all of its Result records in one bulk write
+    try:
+        interview_store.save_interview(
+            db.session,
+            name=current_session.name,
+            email=current_session.email,
+            topic=current_session.topic,
+            average_score=average_score,
+            questions_and_answers=current_session.questions_and_answers,
+        )
+        print(f"Successfully saved interview for {current_session.name} to the database.")
+    except Exception as e:
+        print(f"Database error: {e}")
+        # Optionally, return an error to the user
+        # return jsonify({'error': 'Could not save interview results.', 'finished': True}), 500
+    # --- End Database Logging ---
 
-    if next_question.startswith("Error:"):
-        return jsonify({'error': next_question, 'finished': True}), 500
+    # Clean up the session from Redis
+    InterviewSession.delete(r, session_id)
     
-    # Return the next question to the client
-    return jsonify({'question': next_question, 'finished': False})
+    # Signal to the client that the interview is finished, without displaying the score
+    return {'question': 'Thank you for your time! The interview is now complete.', 'finished': True}
+
+def _sse_event(event, payload):
+    """Formats one server-sent event; the payload is JSON so multi-line text stays intact."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def _sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        # Disable proxy buffering so tokens reach the browser as they are produced
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+def _stream_question_events(session, produce, finish, on_result=None):
+    """Turns `session.stream_question(produce)` into SSE events.
+
+    Events: 'token' ({text}), 'reset' (discard streamed text; a retry follows),
+    then 'done' or 'error' with the payload of `finish(question)`, which saves the
+    session and returns (payload, status) as the non-streaming endpoint would.
+    `on_result(payload, status)` receives that final payload and status code.
+    """
+    try:
+        for kind, data in session.stream_question(produce):
+            if kind == 'done':
+                break
+            yield progress_event(kind, data)
+    except Exception as e:
+        # The response has started: report the failure as an event rather than cutting the stream
+        print(f"[Stream] Question generation failed for session {session.session_id}: {e}")
+        payload, status = stream_failed_response()
+    else:
+        payload, status = finish(data)
+    if on_result:
+        on_result(payload, status)
+    yield result_event(payload, status)
+
+def stream_failed_response():
+    """(payload, status) when generating a streamed question raised (e.g. the LLM stream broke off).
+
+    Nothing was saved, so the interview goes on: the client may send the same request again.
+    """
+    return {'error': 'The question could not be generated. Please try again.', 'finished': False}, 502
+
+def progress_event(kind, data):
+    """SSE event for a 'token' or 'reset' item of `stream_question`/`astream_question`."""
+    return _sse_event('token', {'text': data}) if kind == 'token' else _sse_event('reset', {})
+
+def result_event(payload, status):
+    """Final SSE event of a streamed question: 'done' on success, else 'error'."""
+    return _sse_event('done' if status == 200 else 'error', payload)
 
 # Onboarding endpoints
 @main_bp.route('/onboarding/start', methods=['POST'])
@@ -1,59 +1,158 @@
-import requests
-import time
-from config import API_URL
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from config import IDEAL_ANSWER_CACHE_SIZE, IDEAL_ANSWER_CACHE_TTL_SEC
+from utilities.cache import IdealAnswerCache
+from utilities.llm import get_llm_client, llm_purpose, prompt_coalescer
+from utilities.metrics import metrics, llm_call_seconds, similarity_seconds
+from scoring_engine import get_topic_model
+from types import SimpleNamespace
 
-def generate_llm_answer(question, topic):
-    """Asks the LLM to provide an ideal answer to a given interview question."""
-    prompt = f"""You are a world-class expert in {topic}. Provide a concise, ideal answer to the following technical interview question. Focus on accuracy and clarity.
+# Ideal answers depend only on (topic, question); the Redis tier is attached by routes.init_app
+ideal_answer_cache = IdealAnswerCache(max_entries=IDEAL_ANSWER_CACHE_SIZE, ttl_sec=IDEAL_ANSWER_CACHE_TTL_SEC)
+metrics.add_collector(lambda: (
+    ('ideal_answer_cache', 'Ideal answer cache hits, misses, evictions and size.', {'stat': stat}, value)
+    for stat, value in ideal_answer_cache.stats().items()
+))
+
+# numpy/scikit-learn are imported on first use so workers that never score start fast
+_backend = None
+
+def _scoring_backend():
+    """Returns the lazily imported numeric stack used for similarity scoring."""
+    global _backend
+    if _backend is None:
+        import numpy
+        from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+        from sklearn.metrics.pairwise import cosine_similarity
+        _backend = SimpleNamespace(np=numpy, CountVectorizer=CountVectorizer, TfidfVectorizer=TfidfVectorizer,
+                                   cosine_similarity=cosine_similarity)
+    return _backend
+
+def preload_scoring_backend():
+    """Imports the scoring stack eagerly, e.g. in the gunicorn master so forked workers share it."""
+    _scoring_backend()
+
+def is_llm_error(text):
+    """True for an "Error: ..." result of an LLM call, which is never a usable ideal answer."""
+    return isinstance(text, str) and text.startswith("Error:")
+
+def _ideal_answer_prompt(question, topic):
+    return f"""You are a world-class expert in {topic}. Provide a concise, ideal answer to the following technical interview question. Focus on accuracy and clarity.
 
 Question: {question}
 
 Ideal Answer:"""
-    # This internal function reuses the Gemini API call logic
-    return _call_gemini_api(prompt)
 
-def calculate_similarity(text1, text2):
-    """Calculates the cosine similarity between two texts."""
+def generate_llm_answer(question, topic):
+    """Asks the LLM to provide an ideal answer to a given interview question.
+
+    Answers are cached per normalized (topic, question); errors are never cached.
+    """
+    cached = ideal_answer_cache.get(topic, question)
+    if cached is not None:
+        return cached
+
+    # Shares the client (retries, pooling, backend selection) with question generation;
+    # candidates answering the same question at once wait for one call
+    with llm_call_seconds.time(purpose='ideal_answer'), llm_purpose('ideal_answer'):
+        answer = prompt_coalescer.generate(get_llm_client(), _ideal_answer_prompt(question, topic))
+    if not is_llm_error(answer):
+        ideal_answer_cache.set(topic, question, answer)
+    return answer
+
+async def agenerate_llm_answer(question, topic):
+    """Async variant of generate_llm_answer for the async serving path (asgi.py)."""
+    cached = ideal_answer_cache.get(topic, question)
+    if cached is not None:
+        return cached
+
+    with llm_call_seconds.time(purpose='ideal_answer'), llm_purpose('ideal_answer'):
+        answer = await prompt_coalescer.agenerate(get_llm_client(), _ideal_answer_prompt(question, topic))
+    if not is_llm_error(answer):
+        ideal_answer_cache.set(topic, question, answer)
+    return answer
+
+def calculate_similarity(text1, text2, topic=None):
+    """Calculates the cosine similarity between two texts.
+
+    When a fitted model exists for `topic` (see scoring_engine.py) its
+    corpus-wide IDF is used; otherwise a vectorizer is fitted on the pair.
+    """
     if not text1 or not text2:
         return 0.0
 
+    with similarity_seconds.time():
+        return _similarity(text1, text2, topic)
+
+def _similarity(text1, text2, topic):
     try:
-        vectorizer = TfidfVectorizer().fit_transform([text1, text2])
+        model = get_topic_model(topic) if topic else None
+        if model is not None:
+            similarity = model.similarity(text1, text2)
+            if similarity is not None:
+                return similarity
+        backend = _scoring_backend()
+        vectorizer = backend.TfidfVectorizer().fit_transform([text1, text2])
         vectors = vectorizer.toarray()
-        similarity = cosine_similarity(vectors)
+        similarity = backend.cosine_similarity(vectors)
         # The result is a matrix, we need the value from the off-diagonal
         return similarity[0][1]
     except Exception as e:
         print(f"[Similarity Error] {e}")
         return 0.0
 
-def _call_gemini_api(prompt, retries=3, backoff_factor=2):
-    """A private helper to call the Gemini API, isolated for scoring purposes."""
-    headers = {'Content-Type': 'application/json'}
-    data = {'contents': [{'parts': [{'text': prompt}]}]}
-    
-    for i in range(retries):
-        try:
-            response = requests.post(API_URL, headers=headers, json=data, timeout=120)
-            response.raise_for_status()
-            
-            response_json = response.json()
-            if 'candidates' in response_json and len(response_json['candidates']) > 0:
-                candidate = response_json['candidates'][0]
-                if 'content' in candidate and 'parts' in candidate['content'] and len(candidate['content']['parts']) > 0:
-                    return candidate['content']['parts'][0]['text'].strip()
-            
-            return f"Error: Unexpected API response format: {response.text}"
-
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 429 and i < retries - 1:
-                wait_time = backoff_factor ** i
-                time.sleep(wait_time)
-            else:
-                return f"Error: API request failed with status {e.response.status_code}"
-        except requests.exceptions.RequestException as e:
-            return f"Error: API request failed: {e}"
-    
-    return "Error: API request failed after multiple retries."
+def score_batch(pairs, topic=None):
+    """Scores many (candidate_answer, ideal_answer) pairs in one vectorized pass.
+
+    Gives the same score as calculate_similarity(answer, ideal, topic) for
+    every pair: with the topic's fitted model, pairs it knows terms for are
+    scored with it and the rest fall back to per-pair IDF, as they would live.
+    The per-pair fallback is computed for all pairs at once (see
+    `_pair_fitted_scores`) instead of fitting a vectorizer per pair.
+
+    Returns a list of floats aligned with `pairs`; empty texts score 0.0.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return []
+    candidates = [answer or '' for answer, _ in pairs]
+    ideals = [ideal or '' for _, ideal in pairs]
+
+    backend = _scoring_backend()
+    scores = _pair_fitted_scores(backend, candidates, ideals)
+    model = get_topic_model(topic) if topic else None
+    if model is not None:
+        left = model.vectorizer.transform(candidates)
+        right = model.vectorizer.transform(ideals)
+        # Rows are L2-normalized, so the row-wise dot product is the cosine similarity
+        model_scores = backend.np.asarray(left.multiply(right).sum(axis=1)).ravel()
+        known = (left.getnnz(axis=1) > 0) & (right.getnnz(axis=1) > 0)
+        scores = backend.np.where(known, model_scores, scores)
+    return [float(score) for score in scores]
+
+def _pair_fitted_scores(backend, candidates, ideals):
+    """Row-wise cosine as if a TfidfVectorizer were fitted on each (candidate, ideal) pair alone.
+
+    Over two documents, smoothed IDF is 1 for a term in both and 1 + ln(3/2)
+    for a term in only one, so the scores follow from raw term counts taken
+    with one CountVectorizer (same tokenization) over the whole batch.
+    """
+    np = backend.np
+    try:
+        counter = backend.CountVectorizer().fit([text for text in candidates + ideals if text])
+    except ValueError:
+        # Empty vocabulary: nothing scoreable in the batch
+        return np.zeros(len(candidates))
+    left = counter.transform(candidates).astype(float)
+    right = counter.transform(ideals).astype(float)
+    shared = (left > 0).multiply(right > 0)
+    solo_idf_sq = (1.0 + np.log(1.5)) ** 2
+
+    def _row_sum(matrix):
+        return np.asarray(matrix.sum(axis=1)).ravel()
+
+    def _sq_norm(counts):
+        squares = counts.multiply(counts)
+        return solo_idf_sq * _row_sum(squares) - (solo_idf_sq - 1.0) * _row_sum(squares.multiply(shared))
+
+    dot = _row_sum(left.multiply(right))  # only shared terms contribute, with IDF 1
+    norms = np.sqrt(_sq_norm(left) * _sq_norm(right))
+    return np.divide(dot, norms, out=np.zeros_like(dot), where=norms > 0)
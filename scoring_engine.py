@@ -0,0 +1,177 @@
+"""Per-topic TF-IDF models for answer scoring.
+
+`calculate_similarity` used to fit a fresh vectorizer on the two texts being
+compared, which makes IDF meaningless and pays the sklearn fit on every call.
+Here a vectorizer is fitted once per topic on the stored interview corpus,
+persisted under SCORING_MODEL_DIR and reused: scoring a pair is then a
+transform plus a sparse dot product (rows are L2-normalized, so the dot
+product is the cosine similarity).
+
+Fit or refresh the models with:
+    python scoring_engine.py fit [--topic TOPIC] [--min-docs N]
+"""
+import os
+import time
+import pickle
+import hashlib
+import argparse
+import threading
+from collections import defaultdict
+
+from config import SCORING_MODEL_DIR, SCORING_MODEL_RECHECK_SEC
+from utilities.cache import normalize_text
+
+_models = {}  # normalized topic -> (checked_at, file mtime or None, model or None)
+_models_lock = threading.Lock()
+
+
+class TopicTfidfModel:
+    """A TF-IDF vocabulary/IDF fitted on one topic's interview corpus."""
+
+    def __init__(self, topic, vectorizer):
+        self.topic = topic
+        self.vectorizer = vectorizer
+
+    @classmethod
+    def fit(cls, topic, documents):
+        # Imported here so loading the scoring modules stays cheap (see scorecard._scoring_backend)
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        vectorizer = TfidfVectorizer(sublinear_tf=True)
+        vectorizer.fit([doc for doc in documents if doc])
+        return cls(topic, vectorizer)
+
+    def similarity(self, text1, text2):
+        """Cosine similarity of two texts, or None if either has no known terms."""
+        vectors = self.vectorizer.transform([text1, text2])
+        if vectors[0].nnz == 0 or vectors[1].nnz == 0:
+            return None
+        return float(vectors[0].multiply(vectors[1]).sum())
+
+    def save(self, model_dir=None):
+        path = model_path(self.topic, model_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            # Persist plain data only, so files written by the CLI (__main__) load in the app
+            pickle.dump({'topic': self.topic, 'vectorizer': self.vectorizer}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)  # atomic swap so running workers never read a partial file
+        return path
+
+    @classmethod
+    def load(cls, topic, model_dir=None):
+        path = model_path(topic, model_dir)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        return cls(data['topic'], data['vectorizer'])
+
+
+def model_path(topic, model_dir=None):
+    digest = hashlib.sha1(normalize_text(topic).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(model_dir or SCORING_MODEL_DIR, f"{digest}.pkl")
+
+
+def _model_mtime(topic):
+    try:
+        return os.stat(model_path(topic)).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_topic_model(topic):
+    """Return the persisted model for `topic` (None if not fitted).
+
+    Models, and misses, are cached per process. The file's mtime is checked
+    again at most every SCORING_MODEL_RECHECK_SEC, so a model fitted or
+    refreshed by the CLI is picked up by running workers without a restart.
+    """
+    key = normalize_text(topic)
+    now = time.monotonic()
+    with _models_lock:
+        cached = _models.get(key)
+        if cached is not None and now - cached[0] < SCORING_MODEL_RECHECK_SEC:
+            return cached[2]
+        mtime = _model_mtime(topic)
+        if cached is not None and cached[1] == mtime:
+            model = cached[2]
+        elif mtime is None:
+            model = None
+        else:
+            try:
+                model = TopicTfidfModel.load(topic)
+            except Exception as e:
+                print(f"[Scoring Engine] Could not load model for '{topic}': {e}")
+                model = None
+        _models[key] = (now, mtime, model)
+        return model
+
+
+def reset_models():
+    """Forget loaded models so the next lookup re-reads them from disk."""
+    with _models_lock:
+        _models.clear()
+
+
+def fit_topic_models(rows, min_docs=20, model_dir=None):
+    """Fit and persist one model per topic.
+
+    Args:
+        rows: Iterable of (topic, question, answer, llm_answer) tuples.
+        min_docs: Topics with fewer documents are skipped (IDF would be noise).
+
+    Returns:
+        Mapping of normalized topic to the number of documents it was fitted on.
+    """
+    corpora = defaultdict(list)
+    names = {}
+    for topic, question, answer, llm_answer in rows:
+        key = normalize_text(topic)
+        names.setdefault(key, topic)
+        corpora[key].extend(doc for doc in (question, answer, llm_answer) if doc)
+
+    fitted = {}
+    for key, documents in corpora.items():
+        if len(documents) < min_docs:
+            continue
+        TopicTfidfModel.fit(names[key], documents).save(model_dir)
+        fitted[key] = len(documents)
+    reset_models()
+    return fitted
+
+
+def _corpus_rows():
+    from database_models import Interview, Result
+    from extensions import db
+    query = (
+        db.session.query(Interview.topic, Result.question, Result.answer, Result.llm_answer)
+        .join(Result, Result.interview_id == Interview.id)
+    )
+    return query.yield_per(1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit per-topic TF-IDF scoring models from stored results.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    fit_cmd = sub.add_parser('fit', help='Fit models from the Result table')
+    fit_cmd.add_argument('--topic', help='Only fit this topic')
+    fit_cmd.add_argument('--min-docs', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        rows = _corpus_rows()
+        if args.topic:
+            wanted = normalize_text(args.topic)
+            rows = (row for row in rows if normalize_text(row[0]) == wanted)
+        fitted = fit_topic_models(rows, min_docs=args.min_docs)
+
+    if not fitted:
+        print("No topic had enough documents to fit a model.")
+    for topic, count in sorted(fitted.items()):
+        print(f"Fitted '{topic}' on {count} documents.")
+
+
+if __name__ == '__main__':
+    main()
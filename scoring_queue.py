@@ -0,0 +1,177 @@
+"""Redis-backed background scoring for interview answers.
+
+The web process enqueues one job per answered question (SCORING_MODE='queue');
+a separate worker (`python scoring_queue.py`, see Procfile) generates the ideal
+answer, scores the candidate's answer and stores the result in a per-session
+hash. The final /submit waits for the session's outstanding jobs and merges the
+scores into the transcript.
+
+Jobs are entries of a Redis stream read through a consumer group, as in
+results_writer.py. A job is acknowledged (and deleted) only after its score is
+stored, so one taken by a worker that dies mid-job stays pending and is
+reclaimed by another worker once it has been idle for RETRY_IDLE_MS.
+"""
+import os
+import json
+import time
+import socket
+
+import redis
+
+from config import REDIS_URL
+from interview_logic import score_answer
+from scorecard import ideal_answer_cache
+from utilities.llm import rate_limiter, prompt_coalescer
+from utilities.metrics import metrics
+
+JOBS_KEY = 'scoring:jobs'
+GROUP = 'scoring-workers'
+# A job unacknowledged this long is assumed lost with its worker (scoring takes an LLM round)
+RETRY_IDLE_MS = 5 * 60 * 1000
+# Scores and pending counters outlive an abandoned session for at most this long
+RESULT_TTL_SEC = 24 * 60 * 60
+
+
+def scores_key(session_id):
+    return f"session:{session_id}:scores"
+
+
+def pending_key(session_id):
+    return f"session:{session_id}:scoring_pending"
+
+
+def enqueue_scoring_job(r, session_id, index, question, answer, topic):
+    """Queue scoring of the answer at `questions_and_answers[index]`."""
+    job = json.dumps({
+        'session_id': session_id,
+        'index': index,
+        'question': question,
+        'answer': answer,
+        'topic': topic,
+    })
+    pipe = r.pipeline()
+    pipe.incr(pending_key(session_id))
+    pipe.expire(pending_key(session_id), RESULT_TTL_SEC)
+    pipe.xadd(JOBS_KEY, {'job': job})
+    pipe.execute()
+
+
+def ensure_group(r):
+    try:
+        r.xgroup_create(JOBS_KEY, GROUP, id='0', mkstream=True)
+    except redis.exceptions.ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+
+def process_job(r, raw_job):
+    """Score a single job and record the result for its session."""
+    job = json.loads(raw_job)
+    session_id = job['session_id']
+    try:
+        llm_answer, score = score_answer(job['question'], job['answer'], job['topic'])
+    except Exception as e:
+        # Leave the index unscored; the final /submit falls back to inline scoring
+        print(f"[Scoring Worker] Job for session {session_id} failed: {e}")
+    else:
+        result = json.dumps({'llm_answer': llm_answer, 'score': score})
+        r.hset(scores_key(session_id), str(job['index']), result)
+        r.expire(scores_key(session_id), RESULT_TTL_SEC)
+    finally:
+        pipe = r.pipeline()
+        pipe.decr(pending_key(session_id))
+        pipe.expire(pending_key(session_id), RESULT_TTL_SEC)
+        pipe.execute()
+
+
+def _consumer_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _next_entries(r, consumer, timeout):
+    _, entries, *_ = r.xautoclaim(JOBS_KEY, GROUP, consumer, min_idle_time=RETRY_IDLE_MS,
+                                  start_id='0-0', count=1)
+    if entries:
+        return entries
+    response = r.xreadgroup(GROUP, consumer, {JOBS_KEY: '>'}, count=1, block=int(timeout * 1000))
+    return [entry for _, stream_entries in response or [] for entry in stream_entries]
+
+
+def process_next_job(r, timeout=5, consumer=None):
+    """Process one job: a stale one left by a crashed worker first, else a new one,
+    blocking up to `timeout` seconds for it. Returns True if one was handled."""
+    consumer = consumer or _consumer_name()
+    try:
+        entries = _next_entries(r, consumer, timeout)
+    except redis.exceptions.ResponseError as e:
+        if 'NOGROUP' not in str(e):
+            raise
+        ensure_group(r)  # the group reads from the start of the stream, so nothing is skipped
+        entries = _next_entries(r, consumer, timeout)
+    if not entries:
+        return False
+
+    entry_id, fields = entries[0]
+    try:
+        # Fields are None for an entry deleted while pending: nothing left to score
+        if isinstance(fields, dict):
+            process_job(r, fields['job'])
+    except (KeyError, TypeError, ValueError) as e:
+        print(f"[Scoring Worker] Dropping malformed job {entry_id}: {e}")
+    pipe = r.pipeline()
+    pipe.xack(JOBS_KEY, GROUP, entry_id)
+    pipe.xdel(JOBS_KEY, entry_id)
+    pipe.execute()
+    return True
+
+
+def wait_for_session_jobs(r, session_id, timeout, poll_interval=0.1):
+    """Wait until the session has no outstanding scoring jobs. Returns False on timeout."""
+    deadline = time.monotonic() + timeout
+    while True:
+        pending = int(r.get(pending_key(session_id)) or 0)
+        if pending <= 0:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_interval)
+
+
+def apply_scores(r, session):
+    """Merge finished scores into `session.questions_and_answers`.
+
+    Returns the set of indices that received a score.
+    """
+    scored = set()
+    for index, raw in r.hgetall(scores_key(session.session_id)).items():
+        index = int(index)
+        if 0 <= index < len(session.questions_and_answers):
+            result = json.loads(raw)
+            qa = session.questions_and_answers[index]
+            qa['llm_answer'] = result['llm_answer']
+            qa['score'] = result['score']
+            scored.add(index)
+    return scored
+
+
+def clear_session(r, session_id):
+    r.delete(scores_key(session_id), pending_key(session_id))
+
+
+def run_worker(r):
+    consumer = _consumer_name()
+    ensure_group(r)
+    print(f"Scoring worker {consumer} started; waiting for jobs...")
+    while True:
+        process_next_job(r, consumer=consumer)
+        metrics.push_if_due()
+
+
+if __name__ == '__main__':
+    conn = redis.from_url(REDIS_URL, decode_responses=True)
+    ideal_answer_cache.attach(conn)
+    # Same cluster-wide Gemini quota and in-flight sharing as the web workers
+    rate_limiter.attach(conn)
+    prompt_coalescer.attach(conn)
+    metrics.attach(conn)
+    run_worker(conn)
@@ -256,19 +256,14 @@ document.addEventListener('DOMContentLoaded', () => {
     async function startInterview({ topic, name, email }) {
         showLoading(true);
         try {
-            const response = await fetch('/start-interview', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ topic, name, email })
-            });
-            const data = await response.json();
+            appendMessage('bot', `Let's begin. The topic is: <strong>${topic}</strong>`);
+            const data = await streamQuestion('/start-interview/stream', { topic, name, email });
             if (data.error) {
                 appendMessage('bot', `Error: ${data.error}`);
                 return;
             }
             sessionId = data.session_id;
-            appendMessage('bot', `Let's begin. The topic is: <strong>${topic}</strong>`);
-            appendMessage('bot', data.question);
+            pendingIdempotencyKey = null;
             answerInput.focus();
         } catch (error) {
             appendMessage('bot', 'An error occurred. Please try again.');
@@ -277,19 +272,46 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // One key per answer, reused when it is retried after a lost connection or resent, so the
+    // server replays its first response instead of scoring and generating twice.
+    let pendingIdempotencyKey = null;
+
+    function newIdempotencyKey() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    }
+
     async function submitInterviewAnswer(answer) {
         if (!sessionId) return;
-        const response = await fetch('/submit', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ session_id: sessionId, answer })
-        });
-        const data = await response.json();
-        if (data.question) {
-            appendMessage('bot', data.question);
-        } else if (data.error) {
+        // Until a final response arrives the answer may still be recorded by an earlier try,
+        // so a manual resend keeps its key
+        if (!pendingIdempotencyKey) pendingIdempotencyKey = newIdempotencyKey();
+        const payload = { session_id: sessionId, answer, idempotency_key: pendingIdempotencyKey };
+        let data;
+        let interruptions = 0;
+        for (let attempt = 0; attempt < 60; attempt++) {
+            try {
+                data = await streamQuestion('/submit/stream', payload);
+            } catch (error) {
+                data = { error: 'The connection was interrupted.', finished: true, interrupted: true };
+            }
+            if (data.in_progress) {
+                // An earlier try of this answer is still running: ask again for its stored response
+                await new Promise(resolve => setTimeout(resolve, (data.retry_after || 1) * 1000));
+                continue;
+            }
+            if (!data.interrupted || ++interruptions >= 3) break; // retry only lost connections, with the same key
+        }
+        if (!data.in_progress && !data.interrupted) pendingIdempotencyKey = null;
+        if (data.error) {
             appendMessage('bot', `Error: ${data.error}`);
         }
+        if (data.error && data.finished === false) {
+            // The answer was not recorded (AI service briefly unavailable or the question broke off): offer to resend it
+            const wait = data.retry_after ? ` in ${data.retry_after} seconds` : '';
+            appendMessage('bot', `Please send your answer again${wait}.`);
+            answerInput.value = answer;
+        }
         if (data.finished) {
             answerInput.disabled = true;
             sendButton.disabled = true;
@@ -297,6 +319,75 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // POSTs to a streaming endpoint and renders the question as tokens arrive.
+    // Resolves with the payload of the final 'done' or 'error' event
+    // (validation errors come back as plain JSON and are returned as-is).
+    async function streamQuestion(url, payload) {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+            body: JSON.stringify(payload)
+        });
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('text/event-stream') || !response.body) {
+            // Validation errors, and the stored response when a submission is repeated
+            const data = await response.json();
+            if (data.question) appendMessage('bot', data.question);
+            return data;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let bubble = null;
+        let text = '';
+        let result = { error: 'The connection was interrupted.', finished: true, interrupted: true };
+
+        const handleEvent = (event, data) => {
+            if (event === 'token') {
+                if (!bubble) {
+                    bubble = appendMessage('bot', '');
+                    loader.style.display = 'none'; // first token: the question is on its way
+                }
+                text += data.text;
+                bubble.textContent = text;
+                chatWindow.scrollTop = chatWindow.scrollHeight;
+            } else if (event === 'reset') {
+                text = '';
+                if (bubble) bubble.textContent = '';
+            } else if (event === 'done' || event === 'error') {
+                result = data;
+            }
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                let dataLines = [];
+                rawEvent.split('\n').forEach((line) => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+                });
+                if (dataLines.length) handleEvent(event, JSON.parse(dataLines.join('\n')));
+            }
+        }
+
+        if (result.question) {
+            // The final text is authoritative (e.g. after a retried question)
+            if (bubble) bubble.textContent = result.question;
+            else appendMessage('bot', result.question);
+        } else if (bubble && result.error) {
+            bubble.remove();
+        }
+        return result;
+    }
+
     function appendMessage(sender, text) {
         const messageElement = document.createElement('div');
         const senderClass = sender === 'bot' ? 'question' : 'response';
@@ -304,6 +395,7 @@ document.addEventListener('DOMContentLoaded', () => {
         messageElement.innerHTML = text;
         chatWindow.appendChild(messageElement);
         chatWindow.scrollTop = chatWindow.scrollHeight;
+        return messageElement;
     }
 
     function showLoading(isLoading) {
@@ -0,0 +1,108 @@
+"""Duplicate protection for answer submissions (/submit and /submit/stream).
+
+A browser retry or double click used to run the whole scoring and question
+pipeline again and overwrite the first result. Two guards prevent that:
+
+- Per-session lock: only one submission of a session runs at a time
+  (SET NX with a TTL of SUBMIT_LOCK_TTL_SEC). A submission arriving meanwhile
+  gets a 409 at once (BUSY_RESPONSE, with `retry_after`) instead of holding a
+  worker while it waits; the client retries it with the same key and then
+  gets the stored response.
+- Idempotency key: the client sends a fresh `idempotency_key` with every
+  answer and reuses it on retries. The response is stored under that key for
+  IDEMPOTENCY_TTL_SEC, so a retry gets the stored response without any LLM
+  work. This also works after the interview is complete and its session is gone.
+
+InterviewSession.save also checks the session version, in case a lock expired
+while its holder was still working.
+"""
+import json
+import uuid
+
+import redis
+
+from config import SUBMIT_LOCK_TTL_SEC, IDEMPOTENCY_TTL_SEC
+
+BUSY_RETRY_AFTER_SEC = 1
+MAX_KEY_LENGTH = 128
+
+BUSY_RESPONSE = ({'error': 'Your previous answer is still being processed. Please wait a moment.',
+                  'finished': False, 'in_progress': True, 'retry_after': BUSY_RETRY_AFTER_SEC}, 409)
+CONFLICT_RESPONSE = ({'error': 'This interview was updated by another request. Please try again.'}, 409)
+
+
+def _lock_key(session_id):
+    return f"submit:lock:{session_id}"
+
+
+def _response_key(session_id, idempotency_key):
+    return f"submit:response:{session_id}:{idempotency_key}"
+
+
+def validate_key(idempotency_key):
+    """Return an error response if the client sent an unusable key, else None (no key is fine)."""
+    if idempotency_key is None:
+        return None
+    if not isinstance(idempotency_key, str) or not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+        return {'error': 'idempotency_key must be a non-empty string.'}, 400
+    return None
+
+
+def stored_response(r, session_id, idempotency_key):
+    """The (payload, status) stored for this key, or None."""
+    if not idempotency_key:
+        return None
+    raw = r.get(_response_key(session_id, idempotency_key))
+    if raw is None:
+        return None
+    payload, status = json.loads(raw)
+    return payload, status
+
+
+def claim(r, session_id, idempotency_key=None):
+    """Take the session's submit lock.
+
+    Returns (token, None) when the lock is held; the caller then calls `finish`
+    (or `release`) with the token. Returns (None, (payload, status)) when the key
+    already has a stored response (a duplicate), or BUSY_RESPONSE when another
+    submission of the session is still running.
+    """
+    response = stored_response(r, session_id, idempotency_key)
+    if response is not None:
+        return None, response
+    token = uuid.uuid4().hex
+    if not r.set(_lock_key(session_id), token, nx=True, ex=SUBMIT_LOCK_TTL_SEC):
+        return None, BUSY_RESPONSE
+    # The previous holder may have stored this key's response just before releasing
+    response = stored_response(r, session_id, idempotency_key)
+    if response is None:
+        return token, None
+    release(r, session_id, token)
+    return None, response
+
+
+def release(r, session_id, token):
+    """Drop the lock if `token` still holds it (it may have expired and been taken over)."""
+    key = _lock_key(session_id)
+    pipe = r.pipeline()
+    try:
+        pipe.watch(key)
+        if pipe.get(key) == token:
+            pipe.multi()
+            pipe.delete(key)
+            pipe.execute()
+    except redis.exceptions.WatchError:
+        pass
+    finally:
+        pipe.reset()
+
+
+def finish(r, session_id, token, idempotency_key, payload, status):
+    """Store the response for the key and release the lock.
+
+    Conflicts, 502s (a streamed question broke off) and 503s (LLM temporarily
+    unavailable) are not stored: nothing was saved, so a retry should run.
+    """
+    if idempotency_key and status not in (502, 503) and (payload, status) != CONFLICT_RESPONSE:
+        r.set(_response_key(session_id, idempotency_key), json.dumps([payload, status]), ex=IDEMPOTENCY_TTL_SEC)
+    release(r, session_id, token)
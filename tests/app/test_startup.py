@@ -0,0 +1,37 @@
+import json
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, os.pardir))
+
+# Optional ceiling in seconds for create_app() in a fresh interpreter (e.g. 3.0); wall-clock
+# time depends on the machine, so the budget is only checked when this is set
+STARTUP_BUDGET_SEC = os.getenv('STARTUP_BUDGET_SEC')
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+app.create_app()
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'heavy': [m for m in ('sklearn', 'scipy', 'numpy') if m in sys.modules]}))
+"""
+
+
+def test_create_app_does_not_import_scoring_stack():
+    env = dict(os.environ, DATABASE_URL='sqlite:///:memory:', REDIS_URL='redis://127.0.0.1:1/0')
+    out = subprocess.run(
+        [sys.executable, '-c', _PROBE], cwd=PROJECT_ROOT, env=env,
+        capture_output=True, text=True, timeout=60, check=True,
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    assert result['heavy'] == []
+    if STARTUP_BUDGET_SEC:
+        assert result['elapsed'] < float(STARTUP_BUDGET_SEC), f"create_app() took {result['elapsed']:.2f}s"
+
+
+def test_preload_imports_scoring_stack():
+    import scorecard
+    scorecard.preload_scoring_backend()
+    assert 'sklearn.feature_extraction.text' in sys.modules
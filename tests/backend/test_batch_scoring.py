@@ -0,0 +1,79 @@
+import pytest
+
+import scorecard
+
+
+def test_score_batch_matches_pairwise_cosine():
+    pairs = [
+        ('a decorator wraps a function', 'decorator wraps function calls'),
+        ('threads share memory', 'processes do not share memory'),
+        ('', 'anything'),
+        ('same text here', 'same text here'),
+    ]
+    scores = scorecard.score_batch(pairs)
+    assert len(scores) == 4
+    assert scores[0] > 0
+    assert scores[2] == 0.0
+    assert scores[3] == pytest.approx(1.0)
+    assert all(0.0 <= s <= 1.0 + 1e-9 for s in scores)
+    assert scorecard.score_batch([]) == []
+    assert scorecard.score_batch([('', '')]) == [0.0]
+
+
+def test_rescore_all_updates_scores_and_averages(app):
+    from extensions import db
+    from database_models import Interview, Result
+    import rescore_results
+
+    with app.app_context():
+        interview = Interview(candidate_name='R', candidate_email='r@x.com', topic='rescore-topic', average_score=0.0)
+        legacy = Interview(candidate_name='L', candidate_email='l@x.com', topic='rescore-topic', average_score=0.3)
+        db.session.add_all([interview, legacy])
+        db.session.flush()
+        db.session.add_all([
+            Result(interview_id=interview.id, question='q1', answer='same words', llm_answer='same words', score=0.0),
+            # Stored without an ideal answer next to one with: its ideal answer failed, so it was not scored
+            Result(interview_id=interview.id, question='q2', answer='unscored', llm_answer=None, score=0.0),
+            # Stored before failed ideal answers were dropped: its score is kept, not recomputed
+            Result(interview_id=interview.id, question='q5', answer='Error: Request failed',
+                   llm_answer='Error: Request failed', score=0.9),
+            Result(interview_id=legacy.id, question='q3', answer='legacy row', llm_answer=None, score=0.4),
+            Result(interview_id=legacy.id, question='q4', answer='legacy row', llm_answer=None, score=0.2),
+        ])
+        db.session.commit()
+
+        rescored, skipped = rescore_results.rescore_all(db.session, chunk_size=1, topic='Rescore-Topic')
+        assert (rescored, skipped) == (1, 4)
+
+        db.session.expire_all()
+        results = {r.question: r.score for r in Result.query.filter(Result.interview_id.in_([interview.id, legacy.id]))}
+        assert results['q1'] == pytest.approx(1.0)
+        assert results['q2'] == 0.0 and results['q3'] == 0.4 and results['q5'] == 0.9
+        assert db.session.get(Interview, interview.id).average_score == pytest.approx(1.0)
+        assert db.session.get(Interview, legacy.id).average_score == pytest.approx(0.3)
+
+
+def test_score_batch_matches_calculate_similarity(tmp_path, monkeypatch):
+    """Rescoring must reproduce what the live path stores, with or without a topic model."""
+    import scoring_engine
+    monkeypatch.setattr(scoring_engine, 'SCORING_MODEL_DIR', str(tmp_path))
+    corpus = [
+        ('python', 'What is a decorator?', 'A decorator wraps a function to extend it.', 'Decorators wrap functions.'),
+        ('python', 'What is a generator?', 'A generator yields values lazily.', 'Generators produce values on demand.'),
+    ]
+    scoring_engine.fit_topic_models(corpus * 3, min_docs=5)
+
+    pairs = [
+        ('a decorator wraps a function', 'decorators wrap functions to extend them'),
+        ('threads share memory, threads share state', 'processes do not share memory'),
+        ('zzz qqq', 'completely unknown vocabulary here'),  # no terms known to the model
+        ('A generator yields values lazily.', 'Generators produce values on demand.'),
+        ('', 'anything'),
+        ('x', 'y'),
+    ]
+    try:
+        for topic in ('python', 'no-model-topic', None):
+            expected = [scorecard.calculate_similarity(a, b, topic) for a, b in pairs]
+            assert scorecard.score_batch(pairs, topic=topic) == pytest.approx(expected)
+    finally:
+        scoring_engine.reset_models()
@@ -0,0 +1,57 @@
+import csv
+import importlib.util
+from datetime import datetime
+
+import pytest
+
+
+def _seed(db, prefix='export'):
+    from database_models import Interview, Result
+
+    for i, topic in enumerate([f'{prefix}-a', f'{prefix}-a', f'{prefix}-b']):
+        interview = Interview(candidate_name=f'E{i}', candidate_email=f'e{i}@x.com', topic=topic,
+                              average_score=0.5, timestamp=datetime(2024, 3, 1 + i))
+        interview.results = [Result(question=f'q{i}-{j}', answer=f'a{i}-{j}', score=0.5) for j in range(3)]
+        db.session.add(interview)
+    db.session.commit()
+
+
+def test_csv_export_streams_filtered_rows_in_batches(app, tmp_path):
+    from extensions import db
+    import export_interviews
+
+    with app.app_context():
+        _seed(db)
+        batches = list(export_interviews.iter_batches(db.session, batch_size=4, topic='export-a'))
+        assert [len(b) for b in batches] == [4, 2]
+
+        path = tmp_path / 'out.csv'
+        rows = export_interviews.export(db.session, str(path), batch_size=4, topic='export-a',
+                                        until=datetime(2024, 3, 2))
+    assert rows == 3
+    with open(path, newline='', encoding='utf-8') as f:
+        records = list(csv.DictReader(f))
+    assert list(records[0]) == list(export_interviews.COLUMNS)
+    assert [r['question'] for r in records] == ['q0-0', 'q0-1', 'q0-2']
+
+
+@pytest.mark.skipif(importlib.util.find_spec('pyarrow') is not None, reason='pyarrow is installed')
+def test_parquet_export_without_pyarrow_fails_clearly(tmp_path):
+    import export_interviews
+
+    with pytest.raises(RuntimeError, match='pyarrow'):
+        export_interviews.write_parquet(iter([]), str(tmp_path / 'out.parquet'))
+
+
+def test_parquet_export_round_trips(app, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    from extensions import db
+    import export_interviews
+
+    with app.app_context():
+        _seed(db, prefix='parquet')
+        path = tmp_path / 'out.parquet'
+        rows = export_interviews.export(db.session, str(path), fmt='parquet', batch_size=2, topic='parquet-b')
+    table = pq.read_table(path)
+    assert rows == table.num_rows == 3
+    assert table.column('question').to_pylist() == ['q2-0', 'q2-1', 'q2-2']
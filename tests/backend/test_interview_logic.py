@@ -31,21 +31,15 @@ def test_interview_sequence_levels_and_followups(stub_gemini):
     assert s.phase in ('main', 'followup')
 
 
-def test_interview_persistence_roundtrip(stub_gemini, monkeypatch):
-    # Fake redis as simple dict
-    store = {}
-
-    class R:
-        def hset(self, key, mapping):
-            store[key] = mapping
-        def hgetall(self, key):
-            return store.get(key, {})
+def test_interview_persistence_roundtrip(stub_gemini):
+    import fakeredis
+    r = fakeredis.FakeRedis(decode_responses=True)
 
     s1 = InterviewSession(topic='ml', name='Bob', email='b@example.com')
     s1.generate_initial_question()
-    s1.save(R())
+    s1.save(r)
 
-    loaded = InterviewSession.load(R(), s1.session_id)
+    loaded = InterviewSession.load(r, s1.session_id)
     assert loaded is not None
     assert loaded.topic == 'ml'
     assert loaded.level_index == 0
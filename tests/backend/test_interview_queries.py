@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+
+def _seed(db, topic, count, start):
+    from database_models import Interview, Result
+
+    for i in range(count):
+        interview = Interview(candidate_name=f'C{i}', candidate_email=f'c{i % 2}@q.com', topic=topic,
+                              average_score=0.5, timestamp=start + timedelta(minutes=i // 2))  # ties on timestamp
+        interview.results = [Result(question=f'q{i}-{j}', answer='a', score=0.5) for j in range(2)]
+        db.session.add(interview)
+    db.session.commit()
+
+
+def test_keyset_pages_cover_every_row_once_with_results_loaded(app):
+    from extensions import db
+    import interview_queries
+
+    start = datetime(2024, 1, 1)
+    with app.app_context():
+        _seed(db, 'queries-topic', 7, start)
+        seen, cursor, pages = [], None, 0
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            while True:
+                page, cursor = interview_queries.fetch_page(db.session, after=cursor, page_size=3,
+                                                            topic='queries-topic')
+                pages += 1
+                seen.extend((i.id, len(i.results)) for i in page)
+                if cursor is None:
+                    break
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert pages == 3
+        assert len({interview_id for interview_id, _ in seen}) == 7
+        assert all(result_count == 2 for _, result_count in seen)
+        assert len(statements) == pages * 2  # one query for interviews and one for their results, per page
+
+        by_email = list(interview_queries.iter_interviews(db.session, page_size=2, topic='queries-topic',
+                                                          email='c1@q.com'))
+        assert len(by_email) == 3
+        in_range = list(interview_queries.iter_interviews(db.session, topic='queries-topic',
+                                                          since=start + timedelta(minutes=1),
+                                                          until=start + timedelta(minutes=3)))
+        assert len(in_range) == 4
+
+
+def test_migrate_indexes_creates_missing_indexes(app):
+    from extensions import db
+    import migrate_indexes
+
+    with app.app_context():
+        db.session.execute(db.text('DROP INDEX ix_interview_topic_timestamp'))
+        db.session.commit()
+        assert migrate_indexes.migrate(db.engine) == ['ix_interview_topic_timestamp']
+        assert migrate_indexes.migrate(db.engine) == []
+
+
+def test_pages_include_rows_without_timestamp_and_leave_the_callers_session_alone(app):
+    from extensions import db
+    from database_models import Interview
+    import interview_queries
+
+    with app.app_context():
+        _seed(db, 'null-ts-topic', 3, datetime(2024, 2, 1))
+        for i in range(3):
+            db.session.add(Interview(candidate_name=f'N{i}', candidate_email='n@q.com', topic='null-ts-topic',
+                                     average_score=0.1))
+        db.session.commit()
+        db.session.execute(db.text("UPDATE interview SET timestamp = NULL WHERE candidate_name LIKE 'N%'"))
+        db.session.commit()
+
+        pending = Interview.query.filter_by(topic='null-ts-topic', candidate_name='C0').one()
+        pending.average_score = 0.9  # an unflushed change in the caller's session
+        names = [i.candidate_name for i in interview_queries.iter_interviews(db.session, page_size=2,
+                                                                             topic='null-ts-topic')]
+        assert names == ['N0', 'N1', 'N2', 'C0', 'C1', 'C2']
+        assert pending in db.session and pending.average_score == 0.9
+        db.session.rollback()
@@ -0,0 +1,54 @@
+import pytest
+
+
+def test_save_interview_bulk_inserts_results_with_ideal_answers(app):
+    from extensions import db
+    from database_models import Interview, Result
+    import interview_store
+
+    transcript = [
+        {'question': 'q1', 'answer': 'a1', 'llm_answer': 'ideal 1', 'score': 0.25},
+        {'question': 'q2', 'answer': 'a2', 'llm_answer': '', 'score': 0.75},
+    ]
+    with app.app_context():
+        interview_id = interview_store.save_interview(
+            db.session, name='S', email='s@x.com', topic='store-topic', average_score=0.5,
+            questions_and_answers=transcript,
+        )
+        interview = db.session.get(Interview, interview_id)
+        assert interview.candidate_name == 'S' and interview.timestamp is not None
+        rows = Result.query.filter_by(interview_id=interview_id).order_by(Result.id).all()
+        assert [(r.question, r.llm_answer, r.score) for r in rows] == [('q1', 'ideal 1', 0.25), ('q2', None, 0.75)]
+
+
+def test_save_interview_rolls_back_on_error(app):
+    from extensions import db
+    from database_models import Interview
+    import interview_store
+
+    with app.app_context():
+        with pytest.raises(Exception):
+            interview_store.save_interview(
+                db.session, name='T', email='t@x.com', topic='broken-topic', average_score=0.0,
+                questions_and_answers=[{'question': None, 'answer': 'x', 'score': 0.0}],  # question is NOT NULL
+            )
+        assert Interview.query.filter_by(topic='broken-topic').count() == 0
+
+
+def test_turns_with_a_failed_ideal_answer_are_stored_unscored(monkeypatch):
+    import interview_logic
+    import interview_store
+
+    monkeypatch.setattr(interview_logic, 'generate_llm_answer', lambda q, t: 'Error: API request failed with status 503')
+    llm_answer, score = interview_logic.score_answer('q2', 'Error: API request failed', 'store-topic')
+    assert score is None
+
+    transcript = [
+        {'question': 'q1', 'answer': 'a1', 'llm_answer': 'ideal 1', 'score': 0.6},
+        {'question': 'q2', 'answer': 'a2', 'llm_answer': llm_answer, 'score': score},
+    ]
+    assert interview_store.average_score(transcript) == 0.6
+    assert interview_store.average_score(transcript[1:]) is None
+    rows = interview_store.result_rows(1, transcript)
+    assert [(row['llm_answer'], row['score']) for row in rows] == [('ideal 1', 0.6), (None, 0.0)]
+    assert 'Score: n/a' in interview_store.format_transcript('S', 's@x.com', 't', 0.6, transcript)
@@ -0,0 +1,79 @@
+import fakeredis
+
+import question_bank
+from interview_logic import InterviewSession
+
+
+_SUBJECTS = [
+    'cache invalidation', 'leader election', 'rate limiting', 'sharding keys', 'consistent hashing',
+    'write-ahead logs', 'backpressure', 'idempotent retries', 'clock skew', 'bloom filters',
+    'load shedding', 'hot partitions', 'quorum reads', 'snapshot isolation', 'vector clocks',
+    'circuit breakers', 'connection pooling', 'tail latency', 'batch compaction', 'schema migrations',
+    'gossip protocols', 'read replicas', 'event sourcing', 'dead letter queues', 'feature flags',
+]
+
+
+class _BulkClient:
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, **kwargs):
+        self.calls += 1
+        batch = _SUBJECTS[(self.calls - 1) * 10:self.calls * 10]
+        return "\n".join(f"{i}. Explain {subject}?" for i, subject in enumerate(batch, 1))
+
+
+def test_refill_pop_and_low_watermark():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    client = _BulkClient()
+
+    assert question_bank.refill(r, 'Systems', 0, target=12, batch=10, client=client) == 12
+    assert client.calls == 2
+    assert r.llen(question_bank.bank_key('systems', 0)) == 12
+
+    bank = question_bank.QuestionBank(r, low_watermark=10)
+    first = bank.pop('systems', 0)
+    assert first == 'Explain cache invalidation?'
+    assert bank.pop('systems', 0) != first
+    assert not r.smembers(question_bank.REFILL_KEY)
+    bank.pop('systems', 0)  # 9 left: below the watermark
+    assert r.smembers(question_bank.REFILL_KEY) == {'["systems", 0]'}
+    assert r.zscore(question_bank.TOPICS_KEY, 'systems') == 3
+
+    assert question_bank.process_refill_requests(r, client=client) == 1
+    assert r.llen(question_bank.bank_key('systems', 0)) == 9 + 5  # the client ran out of distinct questions
+    assert bank.pop('systems', 4) is None
+
+
+def test_session_uses_banked_question_without_llm_call(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    r.rpush(question_bank.bank_key('graphs', 0), 'What is a breadth-first search used for?')
+    monkeypatch.setattr(question_bank.question_bank, 'r', r)
+
+    def _no_call(self, prompt, *a, **k):
+        raise AssertionError('banked question should not call the LLM')
+    monkeypatch.setattr(InterviewSession, '_call_gemini_api', _no_call)
+
+    s = InterviewSession(topic='Graphs', name='Ann', email='a@example.com')
+    assert s.generate_initial_question() == 'What is a breadth-first search used for?'
+    assert s.initial_questions == ['What is a breadth-first search used for?']
+
+
+def test_refill_skips_recently_asked_questions_and_caps_topic_demand(monkeypatch):
+    import interview_logic
+    from utilities.dedup import QuestionIndex
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(interview_logic, 'question_index', QuestionIndex())
+    interview_logic.question_index.add('infra', 'Explain leader election?')
+
+    assert question_bank.refill(r, 'infra', 0, target=10, batch=10, client=_BulkClient()) == 10
+    assert 'Explain leader election?' not in r.lrange(question_bank.bank_key('infra', 0), 0, -1)
+
+    bank = question_bank.QuestionBank(r, tracked_topics=2)
+    for topic in ('infra', 'infra', 'dbs', 'dbs', 'one-off'):
+        bank.pop(topic, 0)
+    assert r.zrevrange(question_bank.TOPICS_KEY, 0, -1) == ['infra', 'dbs']
+    # Every bank but infra's is empty, yet neither a one-off topic nor one below the demand threshold is refilled
+    assert r.smembers(question_bank.REFILL_KEY) == set()
+    bank.pop('dbs', 0)
+    assert r.smembers(question_bank.REFILL_KEY) == {'["dbs", 0]'}
@@ -0,0 +1,72 @@
+import json
+
+import fakeredis
+
+
+def _transcript(question='q1'):
+    return [{'question': question, 'answer': 'a', 'llm_answer': 'ideal', 'score': 0.5}]
+
+
+def test_write_behind_stores_batches_and_dead_letters_poison_entries(app, monkeypatch):
+    from extensions import db
+    from database_models import Interview, Result
+    import results_writer
+
+    monkeypatch.setattr(results_writer, 'RETRY_IDLE_MS', 0)
+    monkeypatch.setattr(results_writer, 'RESULTS_WRITE_MAX_ATTEMPTS', 2)
+    r = fakeredis.FakeRedis(decode_responses=True)
+    results_writer.ensure_group(r)
+    results_writer.ensure_group(r)  # idempotent
+
+    results_writer.publish_completed(r, 'W1', 'w1@x.com', 'wb-topic', 0.5, _transcript())
+    poison = results_writer.publish_completed(r, 'W2', 'w2@x.com', 'wb-topic', 0.5, _transcript(question=None))
+    results_writer.publish_completed(r, 'W3', 'w3@x.com', 'wb-topic', 0.5, _transcript())
+
+    with app.app_context():
+        assert results_writer.process_batch(r, db.session, 'c1', block_ms=None) == 2
+        names = sorted(i.candidate_name for i in Interview.query.filter_by(topic='wb-topic'))
+        assert names == ['W1', 'W3']
+        ids = [i.id for i in Interview.query.filter_by(topic='wb-topic')]
+        assert Result.query.filter(Result.interview_id.in_(ids)).count() == 2
+
+        # The failed entry stays pending, is reclaimed and dead-lettered on its second failure
+        assert r.xlen(results_writer.STREAM_KEY) == 1
+        assert results_writer.process_batch(r, db.session, 'c2', block_ms=None) == 0
+        assert r.xlen(results_writer.STREAM_KEY) == 0
+        dead = json.loads(r.lindex(results_writer.DEAD_LETTER_KEY, 0))
+        assert dead['id'] == poison and json.loads(dead['payload'])['name'] == 'W2'
+        assert not r.hgetall(results_writer.ATTEMPTS_KEY)
+
+
+def test_final_submit_in_write_behind_mode_queues_the_interview(client, stub_gemini, monkeypatch, fake_redis_server):
+    import routes
+    import results_writer
+    monkeypatch.setattr(routes, 'RESULTS_WRITE_MODE', 'write_behind')
+    monkeypatch.setattr(routes, 'score_answer', lambda q, a, t: ('ideal', 0.5))
+    monkeypatch.setattr('interview_logic.score_answer', lambda q, a, t: ('ideal', 0.5))
+    fake_redis_server.delete(results_writer.STREAM_KEY)
+
+    rv = client.post('/start-interview', json={'topic': 'wb', 'name': 'Q', 'email': 'q@x.com'})
+    sid = rv.get_json()['session_id']
+    for i in range(10):
+        rv = client.post('/submit', json={'session_id': sid, 'answer': f'ans{i}'})
+    assert rv.get_json()['finished'] is True
+
+    entries = fake_redis_server.xrange(results_writer.STREAM_KEY)
+    assert len(entries) == 1
+    payload = json.loads(entries[0][1]['payload'])
+    assert payload['name'] == 'Q' and len(payload['questions_and_answers']) == 10
+
+
+def test_entries_without_fields_are_dead_lettered(app):
+    from extensions import db
+    import results_writer
+
+    r = fakeredis.FakeRedis(decode_responses=True)
+    results_writer.ensure_group(r)
+    entry_id = results_writer.publish_completed(r, 'N', 'n@x.com', 'wb-none', 0.5, _transcript())
+    # As returned by XAUTOCLAIM for an entry deleted from the stream while pending
+    with app.app_context():
+        assert results_writer._store(r, db.session, [(entry_id, None)]) == 0
+    dead = json.loads(r.lindex(results_writer.DEAD_LETTER_KEY, 0))
+    assert dead['id'] == entry_id and 'no fields' in dead['error']
@@ -0,0 +1,67 @@
+import os
+
+import scorecard
+import scoring_engine
+
+
+def _rows():
+    docs = [
+        ('Python', 'What is a decorator?', 'A decorator wraps a function to extend it.', 'Decorators wrap functions.'),
+        ('python', 'Explain the GIL', 'The GIL serializes bytecode execution across threads.', 'A global interpreter lock.'),
+        ('Python', 'What is a generator?', 'A generator yields values lazily.', 'Generators produce values on demand.'),
+    ]
+    return docs * 3
+
+
+def test_fit_persist_and_reuse(tmp_path, monkeypatch):
+    monkeypatch.setattr(scoring_engine, 'SCORING_MODEL_DIR', str(tmp_path))
+
+    fitted = scoring_engine.fit_topic_models(_rows(), min_docs=5)
+    assert fitted == {'python': 27}
+    assert (tmp_path / scoring_engine.model_path('python', str(tmp_path)).split('/')[-1]).exists()
+
+    model = scoring_engine.get_topic_model(' PYTHON ')
+    assert model is not None
+    assert scoring_engine.get_topic_model('python') is model  # loaded once per process
+
+    same = model.similarity('a decorator wraps a function', 'a decorator wraps a function')
+    related = model.similarity('a decorator wraps a function', 'a decorator extends it')
+    unrelated = model.similarity('a decorator wraps a function', 'the gil serializes threads')
+    assert abs(same - 1.0) < 1e-9
+    assert related > unrelated
+    assert model.similarity('zzz qqq', 'a decorator') is None
+    scoring_engine.reset_models()
+
+
+def test_calculate_similarity_prefers_topic_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(scoring_engine, 'SCORING_MODEL_DIR', str(tmp_path))
+    scoring_engine.fit_topic_models(_rows(), min_docs=5)
+
+    with_model = scorecard.calculate_similarity('generators yield values', 'a generator yields values lazily', 'python')
+    expected = scoring_engine.get_topic_model('python').similarity(
+        'generators yield values', 'a generator yields values lazily')
+    assert with_model == expected
+
+    # Unknown topic falls back to the per-pair vectorizer
+    fallback = scorecard.calculate_similarity('generators yield values', 'a generator yields values lazily', 'rust')
+    assert 0.0 < fallback <= 1.0
+    scoring_engine.reset_models()
+
+
+def test_get_topic_model_picks_up_new_and_refitted_models(tmp_path, monkeypatch):
+    monkeypatch.setattr(scoring_engine, 'SCORING_MODEL_DIR', str(tmp_path))
+    scoring_engine.reset_models()
+    assert scoring_engine.get_topic_model('python') is None
+
+    # Fitted by the CLI in another process: no reset_models() here
+    scoring_engine.TopicTfidfModel.fit('python', [row[2] for row in _rows()]).save()
+    assert scoring_engine.get_topic_model('python') is None  # the miss is cached until the next check
+    monkeypatch.setattr(scoring_engine, 'SCORING_MODEL_RECHECK_SEC', 0)
+    first = scoring_engine.get_topic_model('python')
+    assert first is not None
+    assert scoring_engine.get_topic_model('python') is first  # unchanged file: not reloaded
+
+    path = scoring_engine.TopicTfidfModel.fit('python', [row[3] for row in _rows()]).save()
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert scoring_engine.get_topic_model('python') is not first
+    scoring_engine.reset_models()
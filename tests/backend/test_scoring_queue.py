@@ -0,0 +1,23 @@
+import json
+
+import fakeredis
+
+
+def test_job_of_a_crashed_worker_is_reclaimed(monkeypatch):
+    import scoring_queue
+    monkeypatch.setattr(scoring_queue, 'score_answer', lambda q, a, t: (f"ideal {q}", 0.75))
+    r = fakeredis.FakeRedis(decode_responses=True)
+    scoring_queue.ensure_group(r)
+    scoring_queue.enqueue_scoring_job(r, 's1', 0, 'What is a mutex?', 'a lock', 'os')
+
+    # A worker takes the job and dies before storing the score
+    r.xreadgroup(scoring_queue.GROUP, 'dead-worker', {scoring_queue.JOBS_KEY: '>'}, count=1)
+    assert not scoring_queue.process_next_job(r, timeout=0.01, consumer='live-worker')  # not idle long enough
+
+    monkeypatch.setattr(scoring_queue, 'RETRY_IDLE_MS', 0)
+    assert scoring_queue.process_next_job(r, timeout=0.01, consumer='live-worker')
+    assert json.loads(r.hget(scoring_queue.scores_key('s1'), '0'))['score'] == 0.75
+    assert int(r.get(scoring_queue.pending_key('s1'))) == 0
+    assert r.xlen(scoring_queue.JOBS_KEY) == 0
+    assert not r.xpending(scoring_queue.JOBS_KEY, scoring_queue.GROUP)['pending']
+
@@ -58,6 +58,16 @@ def patch_redis(monkeypatch, fake_redis_server):
     yield
 
 
+@pytest.fixture(autouse=True)
+def fresh_llm_health(monkeypatch):
+    # Offline LLM failures in one test must not open the circuit breaker (or skew timeouts) for the next
+    import utilities.llm as llm
+    from utilities.latency import CircuitBreaker, LatencyTracker
+    monkeypatch.setattr(llm, 'llm_breaker', CircuitBreaker(llm.LLM_BREAKER_FAILURES, llm.LLM_BREAKER_COOLDOWN_SEC))
+    monkeypatch.setattr(llm, 'latency_tracker', LatencyTracker(ceiling_sec=llm.LLM_READ_TIMEOUT_SEC))
+    yield
+
+
 @pytest.fixture()
 def app():
     global essential_modules_loaded
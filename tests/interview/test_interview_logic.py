@@ -31,21 +31,15 @@ def test_interview_sequence_levels_and_followups(stub_gemini):
     assert s.phase in ('main', 'followup')
 
 
-def test_interview_persistence_roundtrip(stub_gemini, monkeypatch):
-    # Fake redis as simple dict
-    store = {}
-
-    class R:
-        def hset(self, key, mapping):
-            store[key] = mapping
-        def hgetall(self, key):
-            return store.get(key, {})
+def test_interview_persistence_roundtrip(stub_gemini):
+    import fakeredis
+    r = fakeredis.FakeRedis(decode_responses=True)
 
     s1 = InterviewSession(topic='ml', name='Bob', email='b@example.com')
     s1.generate_initial_question()
-    s1.save(R())
+    s1.save(r)
 
-    loaded = InterviewSession.load(R(), s1.session_id)
+    loaded = InterviewSession.load(r, s1.session_id)
     assert loaded is not None
     assert loaded.topic == 'ml'
     assert loaded.level_index == 0
@@ -63,3 +57,367 @@ def test_scoring_fields_present_after_answers(stub_gemini):
     for qa in s.questions_and_answers:
         assert 'score' in qa
         assert 'llm_answer' in qa
+
+
+def test_concurrent_scoring_overlaps_next_question(monkeypatch):
+    import threading
+    import interview_logic
+
+    question_started = threading.Event()
+
+    def _fake_llm_answer(question, topic):
+        # Only completes if the next-question call runs while scoring is in flight
+        assert question_started.wait(timeout=5), 'scoring did not overlap question generation'
+        return 'ideal answer about joins'
+
+    def _fake_call(self, prompt, *a, **k):
+        question_started.set()
+        return f"Q[{self.level_index}-{self.phase}] {self.topic}"
+
+    monkeypatch.setattr(interview_logic, 'generate_llm_answer', _fake_llm_answer)
+    monkeypatch.setattr(InterviewSession, '_call_gemini_api', _fake_call)
+
+    s = InterviewSession(topic='sql', name='D', email='d@x.com')
+    s.generate_initial_question()
+    question_started.clear()
+    s.generate_next_question(last_answer='answer about joins', scoring_mode='concurrent')
+
+    first = s.questions_and_answers[0]
+    assert first['llm_answer'] == 'ideal answer about joins'
+    assert first['score'] > 0
+    assert len(s.questions_and_answers) == 2
+
+
+class _CountingRedis:
+    """Wraps FakeRedis and records the commands sent through pipelines."""
+
+    def __init__(self):
+        import fakeredis
+        self.inner = fakeredis.FakeRedis(decode_responses=True)
+        self.commands = []
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def pipeline(self, *a, **k):
+        pipe = self.inner.pipeline(*a, **k)
+        outer = self
+
+        class _Pipe:
+            def __getattr__(self, name):
+                attr = getattr(pipe, name)
+                if name == 'execute':
+                    return attr
+                def _record(*args, **kwargs):
+                    outer.commands.append((name, args, kwargs))
+                    return attr(*args, **kwargs)
+                return _record
+        return _Pipe()
+
+
+def test_save_writes_only_changes(stub_gemini):
+    r = _CountingRedis()
+    s = InterviewSession(topic='go', name='E', email='e@x.com')
+    s.generate_initial_question()
+    s.save(r)
+
+    loaded = InterviewSession.load(r, s.session_id)
+    r.commands.clear()
+    loaded.generate_next_question('first answer', scoring_mode='queue')
+    loaded.save(r)
+
+    names = [c[0] for c in r.commands]
+    assert names.count('rpush') == 1      # only the new turn is appended
+    assert names.count('lset') == 1       # and the answered turn updated in place
+    hset_fields = set(r.commands[names.index('hset')][2]['mapping'])
+    assert 'difficulty_levels' not in hset_fields and 'topic' not in hset_fields
+    assert {'question_count', 'current_question', 'phase'} <= hset_fields
+
+    again = InterviewSession.load(r, s.session_id)
+    assert [qa['answer'] for qa in again.questions_and_answers] == ['first answer', '']
+    r.commands.clear()
+    again.save(r)
+    assert r.commands == []  # nothing changed, nothing written
+
+
+def test_legacy_hash_is_readable_and_migrated(stub_gemini):
+    import json
+    import fakeredis
+    r = fakeredis.FakeRedis(decode_responses=True)
+    legacy = {
+        'session_id': 'legacy-1', 'topic': 'js', 'name': 'F', 'email': 'f@x.com',
+        'questions_and_answers': json.dumps([{'question': 'Q1', 'answer': '', 'score': 0.0, 'llm_answer': ''}]),
+        'question_count': 1, 'current_question': 'Q1', 'level_index': 0, 'phase': 'main',
+        'difficulty_levels': json.dumps(['introductory']), 'initial_questions': json.dumps(['Q1']),
+    }
+    r.hset('session:legacy-1', mapping=legacy)
+
+    s = InterviewSession.load(r, 'legacy-1')
+    assert s.questions_and_answers[0]['question'] == 'Q1'
+    s.save(r)
+    assert 'questions_and_answers' not in r.hgetall('session:legacy-1')
+
+    migrated = InterviewSession.load(r, 'legacy-1')
+    assert migrated.initial_questions == ['Q1']
+    assert len(migrated.questions_and_answers) == 1
+
+    InterviewSession.delete(r, 'legacy-1')
+    assert not r.keys('session:legacy-1*')
+
+
+def test_load_and_save_refresh_idle_ttl(stub_gemini):
+    import fakeredis
+    import interview_logic
+    r = fakeredis.FakeRedis(decode_responses=True)
+
+    s = InterviewSession(topic='c', name='G', email='g@x.com')
+    s.generate_initial_question()
+    s.save(r)
+    keys = InterviewSession._keys(s.session_id)
+    for key in keys:
+        assert 0 < r.ttl(key) <= interview_logic.SESSION_IDLE_TTL_SEC
+
+    for key in keys:
+        r.expire(key, 5)
+    InterviewSession.load(r, s.session_id)
+    for key in keys:
+        assert r.ttl(key) > 5
+
+
+def test_conversation_context_keeps_window_and_summarizes_older_turns():
+    from interview_logic import ConversationContext, estimate_tokens
+    turns = [{'question': f'Question {i}?', 'answer': f'answer {i} ' + 'detail ' * 200} for i in range(8)]
+    ctx = ConversationContext(window_turns=2, token_budget=300)
+
+    text = ctx.render(turns)
+    assert ctx.summarized == 6
+    assert len(ctx.summary) == 6
+    assert 'Q: Question 7?' in text and 'Q: Question 6?' in text
+    assert 'Q: Question 5?' not in text
+    assert '- Question 5? =>' in text
+    assert estimate_tokens(text) <= 300
+
+    # Folding is incremental: one new turn folds exactly one more line
+    turns.append({'question': 'Question 8?', 'answer': 'short'})
+    ctx.render(turns)
+    assert ctx.summarized == 7 and len(ctx.summary) == 7
+
+
+def test_followup_prompt_size_is_bounded(monkeypatch):
+    prompts = []
+
+    def _fake_call(self, prompt, *a, **k):
+        prompts.append((self.phase, len(prompt.encode('utf-8'))))
+        return f"Q{len(prompts)} " + "word " * 30
+
+    monkeypatch.setattr(InterviewSession, '_call_gemini_api', _fake_call)
+    monkeypatch.setattr('interview_logic.score_answer', lambda q, a, t: ('ideal', 0.5))
+    s = InterviewSession(topic='python', name='Alice', email='a@example.com')
+    s.context.token_budget = 400
+    s.generate_initial_question()
+    for i in range(9):
+        s.generate_next_question(last_answer='a long answer ' * 300, scoring_mode='inline')
+
+    followups = [size for phase, size in prompts if phase == 'followup']
+    assert len(followups) == 5
+    # Template + history budget + clipped last answer (~4 bytes/token), however long the interview
+    assert max(followups) <= 600 + 400 * 4 + 400 * 2
+    assert max(followups) - followups[0] <= 400 * 4
+    assert s.last_prompt_bytes == prompts[-1][1]
+
+
+def test_context_summary_persists(stub_gemini):
+    import fakeredis
+    r = fakeredis.FakeRedis(decode_responses=True)
+
+    s1 = InterviewSession(topic='ml', name='Bob', email='b@example.com')
+    s1.generate_initial_question()
+    for i in range(7):
+        s1.generate_next_question(last_answer=f"ans{i}", scoring_mode='queue')
+    s1.save(r)
+    assert s1.context.summarized > 0
+
+    s2 = InterviewSession.load(r, s1.session_id)
+    assert s2.context.summary == s1.context.summary
+    assert s2.context.summarized == s1.context.summarized
+
+
+def test_main_question_picks_first_distinct_candidate(monkeypatch):
+    import interview_logic
+    from utilities.dedup import QuestionIndex
+    monkeypatch.setattr(interview_logic, 'question_index', QuestionIndex())
+    monkeypatch.setattr(interview_logic, 'QUESTION_CANDIDATES', 3)
+    monkeypatch.setattr(interview_logic, 'SHARED_INITIAL_CANDIDATES', 1)
+    interview_logic.question_index.add('python', 'What is a list comprehension in Python?')
+    prompts = []
+
+    def _fake_call(self, prompt, *a, **k):
+        prompts.append(prompt)
+        return "1. What is a list comprehension in Python?\n2. How do Python generators save memory?\n3. What is a tuple?"
+
+    monkeypatch.setattr(InterviewSession, '_call_gemini_api', _fake_call)
+    s = InterviewSession(topic='python', name='Alice', email='a@example.com')
+    assert s.generate_initial_question() == 'How do Python generators save memory?'
+    assert len(prompts) == 1
+    # The multi-candidate prompt must not also ask for a single question
+    assert '3 different' in prompts[0] and 'a single, open-ended' not in prompts[0] and 'ONLY the question' not in prompts[0]
+    assert s.initial_questions == ['How do Python generators save memory?']
+    assert interview_logic.question_index.find_similar('python', 'How do Python generators save memory') is not None
+
+
+def test_parse_candidates_keeps_wrapped_questions_whole():
+    from interview_logic import _parse_candidates
+    numbered = "1. Given a list of tuples,\n   how would you sort it by the second item?\n2) What is a closure?"
+    assert _parse_candidates(numbered) == [
+        'Given a list of tuples, how would you sort it by the second item?', 'What is a closure?']
+    plain = "How does the GIL affect\nCPU-bound threads?\nWhat is a metaclass?"
+    assert _parse_candidates(plain) == ['How does the GIL affect CPU-bound threads?', 'What is a metaclass?']
+    assert _parse_candidates("- What is a set?\n\n- What is a dict?") == ['What is a set?', 'What is a dict?']
+
+
+def test_compact_turn_encoding(stub_gemini):
+    import json
+    import fakeredis
+    from interview_logic import encode_turn, decode_turn
+    r = fakeredis.FakeRedis(decode_responses=True)
+
+    short = {'question': 'Q1', 'answer': 'yes', 'score': 0.5, 'llm_answer': 'ideal'}
+    assert encode_turn(short) == '["Q1","yes",0.5,"ideal"]'
+    long_turn = dict(short, answer='a fairly repetitive answer ' * 100)
+    packed = encode_turn(long_turn)
+    assert packed.startswith('z') and len(packed) < len(json.dumps(long_turn))
+    assert decode_turn(packed) == long_turn
+
+    s = InterviewSession(topic='sql', name='H', email='h@x.com', session_id='v3')
+    s.generate_initial_question()
+    s.save(r)
+    s.generate_next_question('my answer', scoring_mode='queue')
+    s.save(r)
+
+    stored = r.hgetall('session:v3')
+    assert stored['format'] == InterviewSession.STORAGE_FORMAT
+    assert stored['difficulty_levels'] == ''  # default levels are not duplicated per session
+    assert json.loads(r.lindex('session:v3:turns', 0))[1] == 'my answer'
+
+    again = InterviewSession.load(r, 'v3')
+    assert [qa['answer'] for qa in again.questions_and_answers] == ['my answer', '']
+    assert again.difficulty_levels == s.difficulty_levels
+    assert not hasattr(again, '__dict__')
+
+
+def test_sessions_do_not_share_difficulty_levels():
+    from utilities.constants import DIFFICULTY_LEVELS
+    first = InterviewSession(topic='python', name='A', email='a@example.com')
+    second = InterviewSession(topic='python', name='B', email='b@example.com')
+    first.difficulty_levels.append('expert')
+    assert second.difficulty_levels == list(DIFFICULTY_LEVELS)
+    assert len(DIFFICULTY_LEVELS) == 5
+
+
+def test_save_rejects_stale_session(stub_gemini):
+    import fakeredis
+    from interview_logic import SessionConflict
+    r = fakeredis.FakeRedis(decode_responses=True)
+    s = InterviewSession(topic='sql', name='V', email='v@x.com')
+    s.generate_initial_question()
+    s.save(r)
+
+    first = InterviewSession.load(r, s.session_id)
+    second = InterviewSession.load(r, s.session_id)
+    first.generate_next_question('from the first request', scoring_mode='queue')
+    first.save(r)
+    second.generate_next_question('from a duplicate request', scoring_mode='queue')
+    with pytest.raises(SessionConflict):
+        second.save(r)
+    assert InterviewSession.load(r, s.session_id).questions_and_answers[0]['answer'] == 'from the first request'
+
+
+def test_stream_question_stops_generation_when_the_consumer_leaves():
+    import threading
+    import utilities.llm as llm
+
+    calls, finished = [], threading.Event()
+
+    class _Endless(llm.LLMClient):
+        name = 'endless'
+
+        def stream(self, prompt, **kwargs):
+            calls.append(prompt)
+            for i in range(1000):
+                yield f"word{i} "
+
+    session = InterviewSession('topic', 'N', 'n@example.com')
+    llm.set_llm_client(_Endless())
+    try:
+        def produce():
+            try:
+                return session.generate_initial_question()
+            finally:
+                finished.set()
+        events = session.stream_question(produce)
+        assert next(events) == ('reset', None)
+        assert next(events)[0] == 'token'
+        events.close()  # the client disconnected
+        assert finished.wait(2)
+        assert len(calls) == 1
+    finally:
+        llm.set_llm_client(None)
+
+
+def test_popular_topic_history_does_not_cost_extra_llm_calls(monkeypatch):
+    import interview_logic
+    from utilities.dedup import QuestionIndex
+    monkeypatch.setattr(interview_logic, 'question_index', QuestionIndex())
+    monkeypatch.setattr(interview_logic, 'QUESTION_CANDIDATES', 1)
+    # Other sessions have already asked this question on the topic
+    interview_logic.question_index.add('python', 'What is a list comprehension in Python?')
+    prompts = []
+
+    def _fake_call(self, prompt, *a, **k):
+        prompts.append(prompt)
+        return 'What is a list comprehension in Python?'
+
+    monkeypatch.setattr(InterviewSession, '_call_gemini_api', _fake_call)
+    s = InterviewSession(topic='python', name='Alice', email='a@example.com')
+    assert s.generate_initial_question() == 'What is a list comprehension in Python?'
+    assert len(prompts) == 1
+
+    # A repeat of the session's own question is still retried
+    s._llm_purpose = 'next_main'
+    steps = s._unique_main_question_steps(lambda count: 'Ask about python.')
+    assert next(steps) == 'Ask about python.'
+    assert 'Ensure it is not similar' in steps.send('What is a list comprehension in Python?')
+
+
+def test_concurrent_first_questions_share_one_call_but_not_questions(monkeypatch):
+    import threading
+    import interview_logic
+    import utilities.llm as llm
+    from concurrent.futures import ThreadPoolExecutor
+    from utilities.dedup import QuestionIndex
+    monkeypatch.setattr(interview_logic, 'question_index', QuestionIndex())
+    monkeypatch.setattr(interview_logic, 'prompt_coalescer', llm.PromptCoalescer())
+    monkeypatch.setattr(interview_logic, 'SHARED_INITIAL_CANDIDATES', 3)
+    release = threading.Event()
+
+    class _Client:
+        calls = 0
+
+        def generate(self, prompt, **kwargs):
+            self.calls += 1
+            if '3 different' not in prompt:
+                return 'What is an own question?'
+            release.wait(5)
+            return 'What is a tuple?\nWhat is a set?\nWhat is a dict?'
+
+    client = _Client()
+    monkeypatch.setattr(interview_logic, 'get_llm_client', lambda: client)
+    sessions = [InterviewSession(topic='python', name=f'C{i}', email='c@example.com') for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(s.generate_initial_question) for s in sessions]
+        threading.Timer(0.2, release.set).start()
+        questions = [f.result() for f in futures]
+
+    # One shared call for all four; the caller left without a candidate asks for its own
+    assert sorted(questions) == ['What is a dict?', 'What is a set?', 'What is a tuple?', 'What is an own question?']
+    assert client.calls == 2
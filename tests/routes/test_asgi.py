@@ -0,0 +1,157 @@
+import json
+import asyncio
+
+import pytest
+
+
+@pytest.fixture()
+def stub_agemini(monkeypatch):
+    from interview_logic import InterviewSession
+
+    async def _fake_call(self, prompt, *a, **k):
+        return f"Q[{self.level_index}-{self.phase}] {self.topic}"
+    monkeypatch.setattr(InterviewSession, '_acall_gemini_api', _fake_call)
+    yield
+
+
+def _call(asgi_app, method, path, payload=None):
+    """Send one HTTP request through the ASGI app; returns (status, json body)."""
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'path': path, 'raw_path': path.encode('ascii'), 'query_string': b'',
+        'root_path': '', 'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 1234),
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode('ascii'))],
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+    status = sent[0]['status']
+    raw = b''.join(m.get('body', b'') for m in sent[1:])
+    if dict(sent[0]['headers']).get(b'content-type', b'').startswith(b'text/event-stream'):
+        return status, _parse_sse(raw.decode('utf-8'))
+    return status, json.loads(raw) if raw else None
+
+
+def _parse_sse(text):
+    """[(event, data)] for a server-sent events body."""
+    events = []
+    for block in text.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_asgi_interview_flow(app, stub_agemini, monkeypatch):
+    import asgi
+    from scorecard import ideal_answer_cache
+    monkeypatch.setattr(asgi.routes, 'SCORING_MODE', 'inline')
+    monkeypatch.setattr('interview_logic.agenerate_llm_answer', _fake_ideal_answer)
+    monkeypatch.setattr('interview_logic.generate_llm_answer', lambda question, topic: f"ideal {question}")
+    ideal_answer_cache.clear()
+    asgi_app = asgi.InterviewASGI(app)
+
+    status, data = _call(asgi_app, 'POST', '/start-interview', {'topic': 'python'})
+    assert status == 400
+
+    status, data = _call(asgi_app, 'POST', '/start-interview',
+                         {'topic': 'python', 'name': 'Alice', 'email': 'a@example.com'})
+    assert status == 200
+    sid = data['session_id']
+    assert data['question'] == 'Q[0-main] python'
+
+    for i in range(9):
+        status, data = _call(asgi_app, 'POST', '/submit', {'session_id': sid, 'answer': f'ans{i}'})
+        assert status == 200
+        assert data['finished'] is False
+
+    status, data = _call(asgi_app, 'POST', '/submit', {'session_id': sid, 'answer': 'final'})
+    assert status == 200
+    assert data['finished'] is True
+
+    # The session was removed, so further submissions are rejected like in the Flask route
+    status, data = _call(asgi_app, 'POST', '/submit', {'session_id': sid, 'answer': 'late'})
+    assert status == 404
+
+
+async def _fake_ideal_answer(question, topic):
+    return f"ideal {question}"
+
+
+def test_asgi_rejects_non_object_body_and_passes_other_routes_to_flask(app):
+    import asgi
+    asgi_app = asgi.InterviewASGI(app)
+
+    status, data = _call(asgi_app, 'POST', '/submit', ['not', 'an', 'object'])
+    assert status == 400
+
+    status, data = _call(asgi_app, 'POST', '/onboarding/start')
+    assert status == 200
+    assert 'onboarding_session_id' in data
+
+
+def test_asgi_streaming_endpoints_run_natively(app, monkeypatch):
+    import asgi
+    import utilities.llm as llm
+    monkeypatch.setattr(asgi.routes, 'SCORING_MODE', 'inline')
+    # Handled on the event loop, not by the thread-based Flask streaming path
+    def _threaded(*a, **k):
+        raise AssertionError('stream_question must not be used by the ASGI handlers')
+    monkeypatch.setattr('interview_logic.InterviewSession.stream_question', _threaded)
+    asgi_app = asgi.InterviewASGI(app)
+    llm.set_llm_client(llm.FakeLLMClient(latency_ms=0))
+    try:
+        status, events = _call(asgi_app, 'POST', '/start-interview/stream',
+                               {'topic': 'go', 'name': 'G', 'email': 'g@example.com'})
+        assert status == 200
+        tokens = ''.join(data['text'] for kind, data in events if kind == 'token')
+        kind, done = events[-1]
+        assert kind == 'done' and done['question'] == tokens.strip()
+
+        status, events = _call(asgi_app, 'POST', '/submit/stream',
+                               {'session_id': done['session_id'], 'answer': 'goroutines'})
+        assert [k for k, _ in events].count('token') > 1
+        assert events[-1][0] == 'done' and events[-1][1]['finished'] is False
+
+        status, data = _call(asgi_app, 'POST', '/submit/stream', {'session_id': done['session_id']})
+        assert status == 400
+    finally:
+        llm.set_llm_client(None)
+
+
+def test_asgi_cors_headers_come_from_flask_cors(app):
+    import asgi
+    asgi_app = asgi.InterviewASGI(app)
+    scope = {'path': '/submit', 'method': 'POST', 'headers': [(b'origin', b'https://example.com')]}
+    assert (b'access-control-allow-origin', b'https://example.com') in asgi_app._cors_headers(scope)
+
+
+def test_asgi_stream_disconnect_before_first_event_releases_the_submit_lock(app, stub_agemini, fake_redis_server):
+    import asgi
+    asgi_app = asgi.InterviewASGI(app)
+    status, data = _call(asgi_app, 'POST', '/start-interview',
+                         {'topic': 'gone', 'name': 'G', 'email': 'g@example.com'})
+    sid = data['session_id']
+
+    body = json.dumps({'session_id': sid, 'answer': 'a'}).encode('utf-8')
+    scope = {'type': 'http', 'method': 'POST', 'path': '/submit/stream', 'headers': []}
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        raise OSError('client disconnected')  # as servers do once the connection is gone
+
+    with pytest.raises(OSError):
+        asyncio.run(asgi_app(scope, receive, send))
+    assert not fake_redis_server.exists(f"submit:lock:{sid}")
@@ -68,3 +68,188 @@ def test_start_interview_and_submit_to_completion(client, stub_gemini):
     payload = rv.get_json()
     assert payload['finished'] is True
     assert 'Thank you' in payload['question']
+
+
+def test_submit_with_queued_scoring(client, stub_gemini, monkeypatch, fake_redis_server):
+    import routes
+    import scoring_queue
+    from database_models import Result
+
+    def _fake_score(question, answer, topic):
+        return f"ideal for {question}", 0.5
+
+    monkeypatch.setattr(routes, 'SCORING_MODE', 'queue')
+    # Nothing outstanding after draining, so the final wait should not block
+    monkeypatch.setattr(routes, 'SCORING_WAIT_TIMEOUT_SEC', 0)
+    monkeypatch.setattr(routes, 'score_answer', _fake_score)
+    monkeypatch.setattr(scoring_queue, 'score_answer', _fake_score)
+
+    rv = client.post('/start-interview', json={'topic': 'go', 'name': 'Q', 'email': 'q@example.com'})
+    sid = rv.get_json()['session_id']
+
+    for i in range(9):
+        rv = client.post('/submit', json={'session_id': sid, 'answer': f'ans{i}'})
+        assert rv.get_json()['finished'] is False
+        # Act as the scoring worker
+        assert scoring_queue.process_next_job(fake_redis_server, timeout=1)
+
+    assert int(fake_redis_server.get(scoring_queue.pending_key(sid))) == 0
+    assert len(fake_redis_server.hgetall(scoring_queue.scores_key(sid))) == 9
+
+    rv = client.post('/submit', json={'session_id': sid, 'answer': 'final'})
+    assert rv.get_json()['finished'] is True
+    assert not fake_redis_server.exists(scoring_queue.scores_key(sid))
+    # The final job was scored inline after the (zero) wait; drop it from the shared queue
+    fake_redis_server.delete(scoring_queue.JOBS_KEY)
+
+    with client.application.app_context():
+        scores = [res.score for res in Result.query.filter(Result.question.like('%go%')).all()]
+    assert scores and all(score == 0.5 for score in scores)
+
+
+def test_onboarding_session_expires_when_idle(client, fake_redis_server):
+    import onboarding
+    rv = client.post('/onboarding/start')
+    sid = rv.get_json()['onboarding_session_id']
+    key = f"onboarding:{sid}"
+    assert 0 < fake_redis_server.ttl(key) <= onboarding.ONBOARDING_IDLE_TTL_SEC
+
+    fake_redis_server.expire(key, 5)
+    client.post('/onboarding/continue', json={'onboarding_session_id': sid, 'message': 'Jane Doe'})
+    assert fake_redis_server.ttl(key) > 5
+
+
+def _parse_sse(body):
+    import json
+    events = []
+    for raw in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in raw.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_streaming_endpoints_emit_tokens_then_done(client):
+    import utilities.llm as llm
+    llm.set_llm_client(llm.FakeLLMClient(latency_ms=0))
+    try:
+        rv = client.post('/start-interview/stream', json={'topic': 'rust', 'name': 'S', 'email': 's@example.com'})
+        assert rv.mimetype == 'text/event-stream'
+        events = _parse_sse(rv.get_data(as_text=True))
+        tokens = ''.join(data['text'] for kind, data in events if kind == 'token')
+        kind, done = events[-1]
+        assert kind == 'done'
+        assert done['question'] == tokens.strip()
+        sid = done['session_id']
+
+        rv = client.post('/submit/stream', json={'session_id': sid, 'answer': 'ownership and borrowing'})
+        events = _parse_sse(rv.get_data(as_text=True))
+        assert [k for k, _ in events].count('token') > 1
+        assert events[-1][0] == 'done' and events[-1][1]['finished'] is False
+
+        # Validation errors are plain JSON, not a stream
+        rv = client.post('/submit/stream', json={'session_id': sid})
+        assert rv.status_code == 400
+    finally:
+        llm.set_llm_client(None)
+
+
+def test_repeated_submission_replays_stored_response(client, stub_gemini, monkeypatch, fake_redis_server):
+    import interview_logic
+    import submit_guard
+    monkeypatch.setattr(interview_logic, 'score_answer', lambda q, a, t: ('ideal', 0.5))
+    calls = []
+    original = interview_logic.InterviewSession.generate_next_question
+    def counting(self, *args, **kwargs):
+        calls.append(args)
+        return original(self, *args, **kwargs)
+    monkeypatch.setattr(interview_logic.InterviewSession, 'generate_next_question', counting)
+
+    sid = client.post('/start-interview', json={'topic': 'idem', 'name': 'I', 'email': 'i@example.com'}).get_json()['session_id']
+    body = {'session_id': sid, 'answer': 'first', 'idempotency_key': 'key-1'}
+    first = client.post('/submit', json=body)
+    again = client.post('/submit', json=body)
+    assert first.status_code == again.status_code == 200
+    assert again.get_json() == first.get_json()
+    assert len(calls) == 1
+    # The streaming endpoint replays it too, as plain JSON
+    rv = client.post('/submit/stream', json=body)
+    assert rv.get_json() == first.get_json() and len(calls) == 1
+
+    # A new answer runs; one submitted while the session is locked gets a 409 right away
+    assert client.post('/submit', json={**body, 'idempotency_key': 'key-2'}).status_code == 200
+    token, _ = submit_guard.claim(fake_redis_server, sid)
+    rv = client.post('/submit', json={**body, 'idempotency_key': 'key-3'})
+    assert rv.status_code == 409
+    assert rv.get_json()['in_progress'] is True and rv.get_json()['retry_after'] >= 1
+    assert len(calls) == 2
+    submit_guard.release(fake_redis_server, sid, token)
+
+    assert client.post('/submit', json={**body, 'idempotency_key': 7}).status_code == 400
+
+
+def test_submit_while_llm_unavailable_keeps_the_session(client, stub_gemini, monkeypatch, fake_redis_server):
+    import interview_logic
+    from utilities import llm
+    monkeypatch.setattr(interview_logic, 'score_answer', lambda q, a, t: ('ideal', 0.5))
+
+    sid = client.post('/start-interview', json={'topic': 'outage', 'name': 'O', 'email': 'o@example.com'}).get_json()['session_id']
+    before = fake_redis_server.hgetall(f"session:{sid}")
+    monkeypatch.setattr(interview_logic.InterviewSession, '_call_gemini_api',
+                        lambda self, prompt, *a, **k: llm.LLM_UNAVAILABLE_ERROR)
+
+    body = {'session_id': sid, 'answer': 'my answer', 'idempotency_key': 'outage-1'}
+    rv = client.post('/submit', json=body)
+    assert rv.status_code == 503
+    data = rv.get_json()
+    assert data['finished'] is False and data['retry_after'] >= 1
+    assert fake_redis_server.hgetall(f"session:{sid}") == before
+
+    # Not stored under the key: the same answer goes through once the service is back
+    monkeypatch.setattr(interview_logic.InterviewSession, '_call_gemini_api',
+                        lambda self, prompt, *a, **k: f"Q {self.question_count}")
+    rv = client.post('/submit', json=body)
+    assert rv.status_code == 200 and rv.get_json()['finished'] is False
+
+
+def test_metrics_endpoint_reports_stage_latencies(client, stub_gemini):
+    client.post('/start-interview', json={'topic': 'metrics', 'name': 'M', 'email': 'm@example.com'})
+    rv = client.get('/metrics')
+    assert rv.status_code == 200
+    assert rv.mimetype == 'text/plain'
+    text = rv.get_data(as_text=True)
+    assert 'interview_llm_call_seconds_count{purpose="initial",worker="' in text
+    assert 'interview_session_store_seconds_count{op="save",worker="' in text
+    assert '# TYPE llm_errors_total counter' in text
+    assert 'llm_breaker_open{' in text
+
+
+def test_stream_failure_after_tokens_ends_with_an_error_event(client, fake_redis_server):
+    import utilities.llm as llm
+
+    class _Broken(llm.LLMClient):
+        name = 'broken'
+
+        def stream(self, prompt, **kwargs):
+            yield 'What is'
+            raise llm.LLMStreamError('Stream interrupted: connection reset')
+
+    llm.set_llm_client(_Broken())
+    try:
+        rv = client.post('/start-interview/stream', json={'topic': 'cut', 'name': 'C', 'email': 'c@example.com'})
+        events = _parse_sse(rv.get_data(as_text=True))
+        assert ('token', {'text': 'What is'}) in events
+        kind, payload = events[-1]
+        assert kind == 'error' and payload['finished'] is False
+    finally:
+        llm.set_llm_client(None)
+
+
+def test_stream_closed_before_it_ran_releases_the_submit_lock(client, stub_gemini, fake_redis_server):
+    import routes
+    sid = client.post('/start-interview', json={'topic': 'gone', 'name': 'G', 'email': 'g@example.com'}).get_json()['session_id']
+    with client.application.test_request_context('/submit/stream', method='POST',
+                                                 json={'session_id': sid, 'answer': 'a'}):
+        response = routes.submit_stream()
+        assert fake_redis_server.exists(f"submit:lock:{sid}")
+        response.close()  # the server closes it unread: the client went away before any event
+    assert not fake_redis_server.exists(f"submit:lock:{sid}")
@@ -0,0 +1,59 @@
+import fakeredis
+
+import scorecard
+from utilities.cache import IdealAnswerCache
+
+
+def test_key_is_normalized():
+    """
+    Case and whitespace differences map to the same content-addressed key.
+    """
+    a = IdealAnswerCache.make_key('Python', 'What is a  decorator?')
+    b = IdealAnswerCache.make_key(' python ', 'what is a decorator?')
+    assert a == b
+    assert a != IdealAnswerCache.make_key('python', 'What is a generator?')
+
+
+def test_lru_eviction_and_redis_promotion():
+    """
+    The local tier evicts least recently used entries; evicted entries are
+    still served (and counted) from Redis.
+    """
+    cache = IdealAnswerCache(max_entries=2, r=fakeredis.FakeRedis(decode_responses=True))
+    cache.set('t', 'q1', 'a1')
+    cache.set('t', 'q2', 'a2')
+    assert cache.get('t', 'q1') == 'a1'  # q1 becomes most recent
+    cache.set('t', 'q3', 'a3')           # evicts q2
+
+    assert cache.get('t', 'q2') == 'a2'
+    assert cache.get('t', 'missing') is None
+    stats = cache.stats()
+    assert stats['local_hits'] == 1
+    assert stats['redis_hits'] == 1
+    assert stats['misses'] == 1
+    assert stats['evictions'] >= 1
+    assert stats['size'] == 2
+
+
+def test_generate_llm_answer_uses_cache(monkeypatch):
+    """
+    Repeated questions for a topic hit the LLM once; errors are not cached.
+    """
+    calls = []
+
+    class _Client:
+        def generate(self, prompt, **kwargs):
+            calls.append(prompt)
+            return 'Error: upstream' if 'flaky' in prompt else 'ideal'
+
+    cache = IdealAnswerCache(max_entries=8)
+    monkeypatch.setattr(scorecard, 'ideal_answer_cache', cache)
+    monkeypatch.setattr(scorecard, 'get_llm_client', lambda: _Client())
+
+    assert scorecard.generate_llm_answer('What is GIL?', 'python') == 'ideal'
+    assert scorecard.generate_llm_answer('what is  GIL?', 'Python') == 'ideal'
+    assert len(calls) == 1
+
+    scorecard.generate_llm_answer('flaky question', 'python')
+    scorecard.generate_llm_answer('flaky question', 'python')
+    assert len(calls) == 3
@@ -0,0 +1,31 @@
+import fakeredis
+
+from utilities.dedup import QuestionIndex, estimate_similarity, minhash_signature
+
+
+def test_minhash_separates_near_duplicates_from_distinct_questions():
+    a = minhash_signature("What is the difference between a list and a tuple in Python?")
+    b = minhash_signature("what is the difference between a list and a tuple in python")
+    c = minhash_signature("What is the difference between a list and a tuple in Python, briefly?")
+    d = minhash_signature("How does the garbage collector handle reference cycles?")
+    assert estimate_similarity(a, b) == 1.0
+    assert estimate_similarity(a, c) >= 0.5
+    assert estimate_similarity(a, d) < 0.2
+
+
+def test_question_index_shares_recent_questions_through_redis():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    writer = QuestionIndex(max_per_topic=2, r=r)
+    reader = QuestionIndex(max_per_topic=2, r=r)
+
+    assert reader.find_similar('python', 'What is a decorator in Python?') is None
+    writer.add('python', 'What is a decorator in Python?')
+    writer.add('python', 'Explain how generators work.')
+    writer.add('python', 'How do context managers work?')
+
+    reader.clear()
+    assert reader.find_similar('Python ', 'Explain how generators work?') == 'Explain how generators work.'
+    # Only the newest max_per_topic questions are kept
+    assert reader.find_similar('python', 'What is a decorator in Python?') is None
+    # The session's own questions are checked too
+    assert reader.find_similar('python', 'What is a decorator?', extra=['what is a decorator']) == 'what is a decorator'
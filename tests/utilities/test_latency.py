@@ -0,0 +1,42 @@
+import time
+
+from utilities.latency import CircuitBreaker, LatencyTracker
+
+
+def test_timeout_follows_observed_latency_within_bounds():
+    tracker = LatencyTracker(min_samples=5, multiplier=2.0, floor_sec=1.0, ceiling_sec=60.0)
+    assert tracker.timeout('m') == 60.0  # no estimate yet: the ceiling
+    for seconds in [2.0, 2.2, 1.8, 2.1, 1.9, 2.0]:
+        tracker.observe('m', seconds)
+    p95 = tracker.percentile('m', 95)
+    assert 2.0 < p95 < 3.0
+    assert tracker.percentile('m', 50) < p95
+    assert tracker.timeout('m') == 2.0 * p95
+    assert tracker.percentile('other', 95) is None
+
+    fast = LatencyTracker(min_samples=1, floor_sec=1.0)
+    fast.observe('m', 0.01)
+    assert fast.timeout('m') == 1.0
+    assert tracker.snapshot()['m']['samples'] == 6
+
+
+def test_breaker_opens_fails_fast_and_closes_after_a_successful_probe():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown_sec=0.05)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == breaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN and breaker.trips == 1
+    assert not breaker.allow()
+    assert 0 < breaker.retry_after() <= 0.05
+
+    time.sleep(0.06)
+    assert breaker.allow()  # the probe
+    assert not breaker.allow()  # only one at a time
+    breaker.record_failure()  # a failed probe opens it again
+    assert breaker.state == breaker.OPEN and breaker.trips == 2
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED and breaker.allow()
+    assert breaker.retry_after() == 0.0
@@ -1,4 +1,6 @@
+import time
 import types
+import threading
 import requests
 import pytest
 
@@ -43,7 +45,7 @@ def test_call_gemini_api_success(monkeypatch):
         return _Resp(200, payload)
 
     # Stub network and sleep to keep the test fast and deterministic
-    monkeypatch.setattr(llm.requests, 'post', _post)
+    monkeypatch.setattr(llm.get_http_session(), 'post', _post)
     # Avoid sleeping if any backoff path is accidentally hit
     monkeypatch.setattr(llm.time, 'sleep', lambda s: None)
 
@@ -68,7 +70,7 @@ def test_call_gemini_api_429_then_success(monkeypatch):
             ]
         })
 
-    monkeypatch.setattr(llm.requests, 'post', _post)
+    monkeypatch.setattr(llm.get_http_session(), 'post', _post)
     monkeypatch.setattr(llm.time, 'sleep', lambda s: None)
 
     out = llm.call_gemini_api('prompt', retries=3, backoff_factor=1)
@@ -85,7 +87,7 @@ def test_call_gemini_api_malformed_payload(monkeypatch):
     def _post(url, headers=None, json=None, timeout=0):
         return _Resp(200, {'foo': 'bar'}, text='{}')
 
-    monkeypatch.setattr(llm.requests, 'post', _post)
+    monkeypatch.setattr(llm.get_http_session(), 'post', _post)
     out = llm.call_gemini_api('prompt')
     assert out.startswith('Error: Unexpected API response format:')
 
@@ -98,7 +100,7 @@ def test_call_gemini_api_http_error_non_retry(monkeypatch):
     def _post(url, headers=None, json=None, timeout=0):
         return _Resp(400, text='bad request')
 
-    monkeypatch.setattr(llm.requests, 'post', _post)
+    monkeypatch.setattr(llm.get_http_session(), 'post', _post)
     out = llm.call_gemini_api('prompt')
     assert 'status 400' in out
 
@@ -114,9 +116,390 @@ def test_call_gemini_api_network_error_retries_then_fail(monkeypatch):
         calls['n'] += 1
         raise requests.RequestException('net down')
 
-    monkeypatch.setattr(llm.requests, 'post', _post)
+    monkeypatch.setattr(llm.get_http_session(), 'post', _post)
     monkeypatch.setattr(llm.time, 'sleep', lambda s: None)
 
     out = llm.call_gemini_api('prompt', retries=2, backoff_factor=1)
     assert out.startswith('Error: Request failed:')
     assert calls['n'] == 2  # 2 attempts total with retries=2
+
+
+def test_http_session_is_pooled_and_shared():
+    """
+    Every LLM call site goes through one per-process session whose adapter
+    pools connections, and the reuse counters are always reportable.
+    """
+    session = llm.get_http_session()
+    assert llm.get_http_session() is session
+    adapter = session.get_adapter('https://generativelanguage.googleapis.com')
+    assert adapter._pool_maxsize == llm.LLM_POOL_SIZE
+
+    stats = llm.connection_stats()
+    assert set(stats) == {'requests', 'connections_opened', 'connections_reused'}
+
+
+def test_requests_use_split_timeouts(monkeypatch):
+    """
+    Requests carry separate connect/read timeouts instead of a single value.
+    """
+    seen = {}
+
+    def _post(url, headers=None, json=None, timeout=0):
+        seen['timeout'] = timeout
+        return _Resp(200, {'candidates': [{'content': {'parts': [{'text': 'ok'}]}}]})
+
+    monkeypatch.setattr(llm.get_http_session(), 'post', _post)
+    before = llm.connection_stats()['requests']
+    assert llm.call_gemini_api('prompt') == 'ok'
+    assert seen['timeout'] == (llm.LLM_CONNECT_TIMEOUT_SEC, llm.LLM_READ_TIMEOUT_SEC)
+    assert llm.connection_stats()['requests'] == before + 1
+
+
+def test_fake_backend_is_deterministic_and_offline(monkeypatch):
+    """
+    The fake backend never touches the network and answers identically for
+    identical prompts, so offline load tests are reproducible.
+    """
+    def _post(*a, **k):
+        raise AssertionError('fake backend must not issue HTTP requests')
+
+    monkeypatch.setattr(llm.get_http_session(), 'post', _post)
+    monkeypatch.setattr(llm, 'LLM_BACKEND', 'fake')
+    llm.set_llm_client(None)
+    try:
+        client = llm.get_llm_client()
+        assert isinstance(client, llm.FakeLLMClient)
+        assert llm.call_gemini_api('What is a closure?') == client.generate('What is a closure?')
+        assert client.generate('a') != client.generate('b')
+    finally:
+        llm.set_llm_client(None)
+
+
+def test_client_batch_and_async_variants():
+    """
+    generate_batch preserves prompt order and agenerate matches generate.
+    """
+    import asyncio
+
+    client = llm.FakeLLMClient(latency_ms=0)
+    prompts = ['one', 'two', 'three']
+    assert client.generate_batch(prompts) == [client.generate(p) for p in prompts]
+    assert asyncio.run(client.agenerate('one')) == client.generate('one')
+
+
+def test_gemini_stream_parses_sse_chunks(monkeypatch):
+    """
+    Streaming reads `data:` lines from streamGenerateContent and yields each
+    text fragment without stripping its whitespace.
+    """
+    import json as _json
+
+    lines = [
+        'data: ' + _json.dumps({'candidates': [{'content': {'parts': [{'text': 'What is'}]}}]}),
+        '',
+        'data: ' + _json.dumps({'candidates': [{'content': {'parts': [{'text': ' a monad?'}]}}]}),
+    ]
+
+    class _StreamResp(_Resp):
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def iter_lines(self, decode_unicode=False):
+            return iter(lines)
+
+    seen = {}
+
+    def _post(url, headers=None, json=None, timeout=0, stream=False):
+        seen['url'], seen['stream'] = url, stream
+        return _StreamResp(200)
+
+    monkeypatch.setattr(llm.get_http_session(), 'post', _post)
+    chunks = list(llm.GeminiClient(url='https://x/models/m:generateContent?key=k').stream('prompt'))
+    assert chunks == ['What is', ' a monad?']
+    assert seen['url'] == 'https://x/models/m:streamGenerateContent?key=k&alt=sse'
+    assert seen['stream'] is True
+
+
+class _SlowClient(llm.LLMClient):
+    name = 'slow'
+
+    def __init__(self, reply='shared text', delay=0.2):
+        self.reply = reply
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.reply
+
+    async def agenerate(self, prompt, **kwargs):
+        import asyncio
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.reply
+
+
+def test_coalescer_shares_one_call_between_concurrent_callers():
+    """
+    Threads and coroutines asking for the same prompt at once wait for a single
+    upstream call.
+    """
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    coalescer = llm.PromptCoalescer()
+    client = _SlowClient()
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        results = list(pool.map(lambda _: coalescer.generate(client, 'same prompt'), range(5)))
+    assert results == ['shared text'] * 5
+    assert client.calls == 1
+    assert coalescer.stats()['coalesced'] == 4
+
+    async def _burst():
+        return await asyncio.gather(*[coalescer.agenerate(client, 'async prompt') for _ in range(5)])
+    assert asyncio.run(_burst()) == ['shared text'] * 5
+    assert client.calls == 2
+
+
+def test_coalescer_shares_results_across_workers_through_redis():
+    """
+    A second worker finds the first worker's published result (or waits for its
+    in-flight call); errors are never published.
+    """
+    import fakeredis
+
+    r = fakeredis.FakeRedis(decode_responses=True)
+    worker_a, worker_b = llm.PromptCoalescer(r=r, poll_sec=0.01), llm.PromptCoalescer(r=r, poll_sec=0.01)
+    client_a, client_b = _SlowClient(reply='from a'), _SlowClient(reply='from b')
+
+    first = threading.Thread(target=worker_a.generate, args=(client_a, 'wave prompt'))
+    first.start()
+    time.sleep(0.05)  # worker A holds the lock
+    assert worker_b.generate(client_b, 'wave prompt') == 'from a'
+    first.join()
+    assert (client_a.calls, client_b.calls) == (1, 0)
+    assert worker_b.stats()['shared'] == 1
+    assert not r.keys('llm:inflight:*')
+
+    failing = _SlowClient(reply='Error: upstream down', delay=0)
+    assert worker_a.generate(failing, 'bad prompt') == 'Error: upstream down'
+    assert worker_b.generate(client_b, 'bad prompt') == 'from b'
+
+
+def test_coalescer_is_not_a_cache():
+    """
+    A caller arriving after a call has finished makes its own call, in the
+    same process and in another worker.
+    """
+    import fakeredis
+
+    class _Counting(llm.LLMClient):
+        name = 'counting'
+
+        def __init__(self):
+            self.calls = 0
+
+        def generate(self, prompt, **kwargs):
+            self.calls += 1
+            return f"question {self.calls}"
+
+    r = fakeredis.FakeRedis(decode_responses=True)
+    worker_a, worker_b = llm.PromptCoalescer(r=r), llm.PromptCoalescer(r=r)
+    client = _Counting()
+    assert worker_a.generate(client, 'same prompt') == 'question 1'
+    assert worker_a.generate(client, 'same prompt') == 'question 2'
+    assert worker_b.generate(client, 'same prompt') == 'question 3'
+
+
+def test_gemini_429_pauses_through_the_shared_rate_limiter(monkeypatch):
+    """
+    A 429 is reported to the cluster-wide limiter (which pauses every worker)
+    instead of sleeping in the request thread, and the request is retried.
+    """
+    responses = iter([_Resp(429, text='rate limited'),
+                      _Resp(200, {'candidates': [{'content': {'parts': [{'text': 'Recovered'}]}}],
+                                  'usageMetadata': {'totalTokenCount': 42}})])
+    monkeypatch.setattr(llm.get_http_session(), 'post', lambda *a, **k: next(responses))
+    pauses, released = [], []
+    monkeypatch.setattr(llm.rate_limiter, 'penalize', pauses.append)
+    monkeypatch.setattr(llm.rate_limiter, 'release', lambda lease, used=None: released.append(used))
+
+    assert llm.GeminiClient().generate('prompt', retries=3, backoff_factor=2) == 'Recovered'
+    assert pauses == [1]
+    assert released == [None, 42]
+
+
+def test_gemini_stream_429_is_counted_and_paused_like_generate(monkeypatch):
+    """
+    A 429 when opening a stream counts as rate limited and pauses through the
+    limiter once the lease is released, before the regular request fallback.
+    """
+    class _StreamResp(_Resp):
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    responses = iter([_StreamResp(429, text='rate limited'),
+                      _Resp(200, {'candidates': [{'content': {'parts': [{'text': 'Recovered'}]}}]})])
+    monkeypatch.setattr(llm.get_http_session(), 'post', lambda *a, **k: next(responses))
+    events = []
+    monkeypatch.setattr(llm.rate_limiter, 'penalize', lambda seconds: events.append(('pause', seconds)))
+    monkeypatch.setattr(llm.rate_limiter, 'release', lambda lease, used=None: events.append(('release', used)))
+    counted = lambda: llm.metrics.snapshot()['values']['llm_rate_limited_total']
+    before = sum(value for _, value in counted())
+
+    assert list(llm.GeminiClient().stream('prompt', backoff_factor=2)) == ['Recovered']
+    assert sum(value for _, value in counted()) == before + 1
+    assert events == [('release', None), ('pause', 1), ('release', None)]
+
+
+def test_gemini_breaker_fails_fast_after_upstream_errors(monkeypatch):
+    """
+    Repeated 5xx/network failures open the circuit breaker: later calls return
+    LLM_UNAVAILABLE_ERROR without a request until the cooldown has passed.
+    """
+    from utilities.latency import CircuitBreaker
+
+    calls = {'n': 0}
+
+    def _post(url, headers=None, json=None, timeout=0):
+        calls['n'] += 1
+        return _Resp(503, text='overloaded')
+
+    monkeypatch.setattr(llm.get_http_session(), 'post', _post)
+    monkeypatch.setattr(llm, 'llm_breaker', CircuitBreaker(failure_threshold=2, cooldown_sec=60))
+
+    assert 'status 503' in llm.GeminiClient().generate('prompt')
+    assert 'status 503' in llm.GeminiClient().generate('prompt')
+    assert llm.GeminiClient().generate('prompt') == llm.LLM_UNAVAILABLE_ERROR
+    assert list(llm.GeminiClient().stream('prompt')) == [llm.LLM_UNAVAILABLE_ERROR]
+    assert calls['n'] == 2
+    assert llm.tail_latency_stats()['breaker'] == 'open'
+
+
+def test_gemini_slow_request_is_hedged(monkeypatch):
+    """
+    Once the latency estimate is warm, a request slower than the hedge
+    percentile gets a duplicate and the first answer wins.
+    """
+    from utilities.latency import LatencyTracker
+
+    calls = {'n': 0}
+    lock = threading.Lock()
+
+    def _post(url, headers=None, json=None, timeout=0):
+        with lock:
+            calls['n'] += 1
+            first = calls['n'] == 1
+        time.sleep(1.0 if first else 0.01)
+        return _Resp(200, {'candidates': [{'content': {'parts': [{'text': 'slow' if first else 'hedged'}]}}]})
+
+    tracker = LatencyTracker(min_samples=1)
+    tracker.observe('m', 0.02)
+    monkeypatch.setattr(llm, 'latency_tracker', tracker)
+    monkeypatch.setattr(llm, 'LLM_HEDGE_PERCENTILE', 90)
+    monkeypatch.setattr(llm.get_http_session(), 'post', _post)
+    before = llm.tail_latency_stats()['hedge_wins']
+
+    assert llm.GeminiClient(url='https://x/models/m:generateContent').generate('prompt') == 'hedged'
+    assert calls['n'] == 2
+    assert llm.tail_latency_stats()['hedge_wins'] == before + 1
+
+
+def test_gemini_hedge_lease_covers_the_losing_primary(monkeypatch):
+    """
+    When the hedge wins, the primary request keeps running; one rate-limit
+    lease stays held until it has finished.
+    """
+    from utilities.latency import LatencyTracker
+
+    calls = {'n': 0}
+    lock = threading.Lock()
+    primary_done = threading.Event()
+
+    def _post(url, headers=None, json=None, timeout=0):
+        with lock:
+            calls['n'] += 1
+            first = calls['n'] == 1
+        if first:
+            time.sleep(0.5)
+            primary_done.set()
+        return _Resp(200, {'candidates': [{'content': {'parts': [{'text': 'slow' if first else 'hedged'}]}}]})
+
+    held = []
+
+    class _Lease:
+        def __init__(self):
+            held.append(self)
+
+        def release(self, used=None):
+            held.remove(self)
+
+    tracker = LatencyTracker(min_samples=1)
+    tracker.observe('m', 0.02)
+    monkeypatch.setattr(llm, 'latency_tracker', tracker)
+    monkeypatch.setattr(llm, 'LLM_HEDGE_PERCENTILE', 90)
+    monkeypatch.setattr(llm.get_http_session(), 'post', _post)
+    monkeypatch.setattr(llm.rate_limiter, 'acquire', lambda tokens=0: _Lease())
+
+    assert llm.GeminiClient(url='https://x/models/m:generateContent').generate('prompt') == 'hedged'
+    assert not primary_done.is_set() and len(held) == 1
+    assert primary_done.wait(5)
+    deadline = time.monotonic() + 5
+    while held and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert held == []
+
+
+def test_gemini_latency_is_tracked_per_purpose_and_only_for_successes(monkeypatch):
+    statuses = iter([400, 200])
+
+    def _post(url, headers=None, json=None, timeout=0):
+        status = next(statuses)
+        return _Resp(status, {'candidates': [{'content': {'parts': [{'text': 'ok'}]}}]}, text='bad request')
+
+    monkeypatch.setattr(llm.get_http_session(), 'post', _post)
+    client = llm.GeminiClient(url='https://x/models/m:generateContent')
+
+    assert 'status 400' in client.generate('prompt')
+    assert llm.latency_tracker.snapshot() == {}
+
+    with llm.llm_purpose('ideal_answer'):
+        assert client.generate('prompt') == 'ok'
+    assert list(llm.latency_tracker.snapshot()) == ['m/ideal_answer']
+
+
+def test_gemini_agenerate_releases_the_lease_when_cancelled(monkeypatch):
+    import asyncio
+    released = []
+
+    class _Lease:
+        def release(self, used=None):
+            released.append(used)
+
+    async def _acquire(tokens=0):
+        return _Lease()
+
+    async def _hang(url, headers, data, read_timeout=None):
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(llm.rate_limiter, 'aacquire', _acquire)
+    monkeypatch.setattr(llm, 'apost_llm_request', _hang)
+
+    async def _cancel_midway():
+        task = asyncio.ensure_future(llm.GeminiClient().agenerate('prompt'))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(_cancel_midway())
+    assert released == [None]
@@ -0,0 +1,80 @@
+import fakeredis
+import pytest
+
+from utilities.metrics import MetricsRegistry
+
+
+def test_histograms_and_counters_render_in_prometheus_format():
+    registry = MetricsRegistry()
+    stage = registry.histogram('stage_seconds', 'Stage duration.', ['purpose'], buckets=(0.1, 1))
+    errors = registry.counter('errors_total', 'Errors.', ['kind'])
+    stage.observe(0.05, purpose='initial')
+    stage.observe(0.5, purpose='initial')
+    stage.observe(3, purpose='initial')
+    errors.inc(kind='http')
+    errors.inc(2, kind='http')
+    registry.add_collector(lambda: [('breaker_open', 'Breaker state.', {}, 1)])
+
+    text = registry.render()
+    worker = f'worker="{registry.worker_id()}"'
+    assert '# TYPE stage_seconds histogram' in text
+    assert f'stage_seconds_bucket{{purpose="initial",{worker},le="0.1"}} 1' in text
+    assert f'stage_seconds_bucket{{purpose="initial",{worker},le="1"}} 2' in text
+    assert f'stage_seconds_bucket{{purpose="initial",{worker},le="+Inf"}} 3' in text
+    assert f'stage_seconds_sum{{purpose="initial",{worker}}} 3.55' in text
+    assert f'stage_seconds_count{{purpose="initial",{worker}}} 3' in text
+    assert f'errors_total{{kind="http",{worker}}} 3' in text
+    assert f'breaker_open{{{worker}}} 1' in text
+
+    with pytest.raises(ValueError):
+        errors.inc(purpose='initial')
+
+
+def test_scrape_shows_every_workers_series_through_redis():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    worker_a, worker_b = MetricsRegistry(r=r), MetricsRegistry(r=r)
+    worker_a.worker_id = lambda: 'host:1'
+    worker_b.worker_id = lambda: 'other-host:1'
+    for registry in (worker_a, worker_b):
+        registry.counter('retries_total', 'Retries.').inc()
+        with registry.histogram('save_seconds', 'Save.', buckets=(1,)).time():
+            pass
+    # Recording never talks to Redis; the push happens between requests
+    assert r.hlen('metrics:workers') == 0
+    worker_b.push_if_due()
+    worker_b.push_if_due()  # not due again yet
+    worker_b.counter('retries_total', 'Retries.').inc()
+
+    text = worker_a.render()
+    assert 'retries_total{worker="host:1"} 1' in text
+    assert 'retries_total{worker="other-host:1"} 1' in text
+    assert 'save_seconds_count{worker="other-host:1"} 1' in text
+
+    # A restarted worker reports new series instead of lowering the others' totals
+    worker_c = MetricsRegistry(r=r)
+    worker_c.worker_id = lambda: 'other-host:2'
+    worker_c.counter('retries_total', 'Retries.')
+    worker_c.push()
+    text = worker_a.render()
+    assert 'retries_total{worker="other-host:1"} 1' in text
+    assert 'retries_total{worker="other-host:2"}' not in text
+
+    # Snapshots of workers gone for longer than the TTL are dropped
+    worker_a.worker_ttl_sec = -1
+    worker_a.render()
+    assert r.hlen('metrics:workers') == 0
+
+
+def test_prompt_sizes_and_scores_are_recorded_as_histograms(monkeypatch):
+    from interview_logic import InterviewSession
+    from utilities.metrics import metrics
+
+    monkeypatch.setattr(InterviewSession, '_call_gemini_api', lambda self, prompt, *a, **k: 'What is a tuple?')
+    monkeypatch.setattr('interview_logic.score_answer', lambda q, a, t: ('ideal', 0.42))
+    s = InterviewSession(topic='metrics-topic', name='M', email='m@example.com')
+    s.generate_initial_question()
+    s.generate_next_question('an answer', scoring_mode='inline')
+
+    text = metrics.render()
+    assert 'interview_prompt_bytes_count{purpose="initial",' in text
+    assert 'interview_answer_score_bucket{worker=' in text
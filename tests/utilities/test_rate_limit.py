@@ -0,0 +1,81 @@
+import fakeredis
+
+from utilities.rate_limit import RateLimiter
+
+
+def _limiter(r=None, **kwargs):
+    kwargs.setdefault('max_wait_sec', 0.2)
+    return RateLimiter(r=r or fakeredis.FakeRedis(decode_responses=True), poll_sec=0.01, **kwargs)
+
+
+def test_requests_and_tokens_per_minute_are_enforced():
+    limiter = _limiter(rpm=2)
+    assert limiter.acquire() and limiter.acquire()
+    assert limiter.acquire() is None  # the next request slot is 30s away
+    assert limiter.stats()['timeouts'] == 1
+
+    limiter = _limiter(tpm=100)
+    lease = limiter.acquire(tokens=80)
+    assert limiter.acquire(tokens=80) is None
+    lease.release(used_tokens=10)  # the estimate was high: the difference is returned
+    assert limiter.acquire(tokens=80) is not None
+
+
+def test_concurrency_slots_are_shared_between_workers():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    worker_a, worker_b = _limiter(r, max_concurrency=1), _limiter(r, max_concurrency=1)
+    lease = worker_a.acquire()
+    assert worker_b.acquire() is None
+    lease.release()
+    assert worker_b.acquire() is not None
+    assert worker_b.queue_length() == 0
+
+
+def test_queue_skips_callers_that_went_away():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    limiter = _limiter(r, rpm=60)
+    r.zadd('llm:rate:queue', {'abandoned': 0})  # no 'waiting' heartbeat key
+    assert limiter.acquire() is not None
+    assert r.zcard('llm:rate:queue') == 0
+
+
+def test_429_pauses_every_worker():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    worker_a, worker_b = _limiter(r, rpm=600), _limiter(r, rpm=600, max_wait_sec=2)
+    worker_a.penalize(0.3)
+    lease = worker_b.acquire()
+    assert lease is not None and lease.waited >= 0.25
+    assert worker_a.stats()['penalties'] == 1
+
+
+def test_a_burst_within_capacity_is_granted_without_waiting_for_polls():
+    import time
+    import threading
+    r = fakeredis.FakeRedis(decode_responses=True)
+    limiter = RateLimiter(r=r, rpm=6000, max_concurrency=50, max_wait_sec=5, poll_sec=0.25)
+    leases = []
+
+    def _take():
+        leases.append(limiter.acquire())
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=_take) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Serving only the queue head would grant about one caller per 0.25s poll
+    assert time.monotonic() - start < 1.5
+    assert len(leases) == 20 and all(leases)
+    assert limiter.queue_length() == 0
+
+
+def test_callers_behind_the_head_wait_while_capacity_is_short():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    limiter = _limiter(r, max_concurrency=1)
+    held = limiter.acquire()
+    r.zadd('llm:rate:queue', {'ahead': 0})
+    r.set('llm:rate:waiting:ahead', 1)
+    held.release()
+    # One free slot, reserved for the caller ahead in the queue
+    assert limiter.acquire() is None
@@ -0,0 +1,93 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import redis
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so trivially different spellings share a key."""
+    return re.sub(r'\s+', ' ', (text or '')).strip().lower()
+
+
+class IdealAnswerCache:
+    """Two-tier cache for ideal answers keyed by (topic, question).
+
+    Lookups go to an in-process LRU first, then to Redis (shared by all
+    workers, entries expire after `ttl_sec`). Redis hits are promoted into the
+    LRU; when the LRU is full the least recently used entry is evicted.
+    Redis failures are treated as misses so scoring never depends on the cache.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_sec: int = 7 * 24 * 60 * 60,
+                 r=None, prefix: str = 'ideal_answer'):
+        self.max_entries = max_entries
+        self.ttl_sec = ttl_sec
+        self.r = r
+        self.prefix = prefix
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'local_hits': 0, 'redis_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def attach(self, r) -> None:
+        """Use `r` as the shared Redis tier (None disables it)."""
+        self.r = r
+
+    @staticmethod
+    def make_key(topic: str, question: str) -> str:
+        payload = f"{normalize_text(topic)}\n{normalize_text(question)}"
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, topic: str, question: str) -> Optional[str]:
+        key = self.make_key(topic, question)
+        with self._lock:
+            if key in self._local:
+                self._local.move_to_end(key)
+                self._stats['local_hits'] += 1
+                return self._local[key]
+
+        value = None
+        if self.r is not None:
+            try:
+                value = self.r.get(f"{self.prefix}:{key}")
+            except redis.exceptions.RedisError as e:
+                print(f"[Cache] Redis read failed: {e}")
+
+        with self._lock:
+            if value is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['redis_hits'] += 1
+            self._store_local(key, value)
+        return value
+
+    def set(self, topic: str, question: str, answer: str) -> None:
+        key = self.make_key(topic, question)
+        with self._lock:
+            self._store_local(key, answer)
+        if self.r is not None:
+            try:
+                self.r.set(f"{self.prefix}:{key}", answer, ex=self.ttl_sec)
+            except redis.exceptions.RedisError as e:
+                print(f"[Cache] Redis write failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, size=len(self._local))
+
+    def clear(self) -> None:
+        """Drop the in-process tier and reset counters (Redis entries expire on their own)."""
+        with self._lock:
+            self._local.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+    def _store_local(self, key: str, value: str) -> None:
+        # Caller holds self._lock
+        self._local[key] = value
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+            self._stats['evictions'] += 1
@@ -3,7 +3,7 @@ CODE_EXPIRY_SEC = 180  # 3 minutes
 RESEND_COOLDOWN_SEC = 60  # 1 minute
 MAX_CODE_ATTEMPTS = 3
 
-# Shared difficulty levels used by interview logic
-DIFFICULTY_LEVELS = [
+# Shared difficulty levels used by interview logic (a tuple: sessions copy it into their own list)
+DIFFICULTY_LEVELS = (
     'introductory', 'medium hard', 'hard', 'hard', 'very hard'
-]
+)
@@ -0,0 +1,141 @@
+import re
+import time
+import random
+import hashlib
+import threading
+from functools import lru_cache
+from typing import Iterable, Optional
+
+import redis
+
+from utilities.cache import normalize_text
+
+NUM_PERM = 64
+SHINGLE_SIZE = 3
+_MERSENNE_PRIME = (1 << 61) - 1
+# Fixed seed: signatures must be comparable across calls (they are never persisted)
+_rng = random.Random(1337)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Word n-grams of the normalized text (the whole word list if it is shorter than `size`)."""
+    words = re.findall(r'\w+', normalize_text(text))
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+@lru_cache(maxsize=4096)
+def minhash_signature(text: str) -> tuple:
+    """MinHash signature of the text's shingles; equal slots estimate Jaccard similarity."""
+    hashed = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big')
+              for s in shingles(text)]
+    if not hashed:
+        return ()
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashed) for a, b in _PERMUTATIONS)
+
+
+def estimate_similarity(sig1: tuple, sig2: tuple) -> float:
+    if not sig1 or not sig2:
+        return 0.0
+    return sum(1 for x, y in zip(sig1, sig2) if x == y) / len(sig1)
+
+
+class QuestionIndex:
+    """Recent main questions per topic for cheap near-duplicate checks.
+
+    Keeps the last `max_per_topic` questions of each topic in process and, when
+    attached, in a Redis list shared by all workers (re-read at most every
+    `refresh_sec`). Lookups compare MinHash signatures locally, so rejecting a
+    near-duplicate costs no LLM call. `claim` reserves a question for one caller,
+    so callers sharing one LLM response take different questions from it. Redis
+    failures fall back to the local copy.
+    """
+
+    def __init__(self, max_per_topic: int = 200, threshold: float = 0.5,
+                 r=None, prefix: str = 'recent_questions', refresh_sec: int = 60):
+        self.max_per_topic = max_per_topic
+        self.threshold = threshold
+        self.r = r
+        self.prefix = prefix
+        self.refresh_sec = refresh_sec
+        self._topics = {}  # key -> (loaded_at, [questions])
+        self._claims = {}  # claim key -> expiry (monotonic), when not attached to Redis
+        self._lock = threading.Lock()
+
+    def attach(self, r) -> None:
+        """Use `r` as the shared Redis tier (None disables it)."""
+        self.r = r
+        self.clear()
+
+    def _key(self, topic: str) -> str:
+        return f"{self.prefix}:{hashlib.sha256(normalize_text(topic).encode('utf-8')).hexdigest()[:16]}"
+
+    def recent(self, topic: str) -> list:
+        key = self._key(topic)
+        with self._lock:
+            cached = self._topics.get(key)
+            if cached and (self.r is None or time.monotonic() - cached[0] < self.refresh_sec):
+                return list(cached[1])
+        questions = cached[1] if cached else []
+        if self.r is not None:
+            try:
+                questions = self.r.lrange(key, 0, self.max_per_topic - 1)
+            except redis.exceptions.RedisError as e:
+                print(f"[Dedup] Redis read failed: {e}")
+        with self._lock:
+            self._topics[key] = (time.monotonic(), list(questions))
+        return list(questions)
+
+    def find_similar(self, topic: str, question: str, extra: Iterable[str] = (),
+                     include_recent: bool = True) -> Optional[str]:
+        """Return a stored (or `extra`) question that `question` nearly duplicates, else None.
+
+        With `include_recent=False` only `extra` is compared.
+        """
+        signature = minhash_signature(question)
+        wanted = normalize_text(question)
+        for other in list(extra) + (self.recent(topic) if include_recent else []):
+            if normalize_text(other) == wanted:
+                return other
+            if estimate_similarity(signature, minhash_signature(other)) >= self.threshold:
+                return other
+        return None
+
+    def claim(self, topic: str, question: str, ttl_sec: int = 60) -> bool:
+        """Reserve `question` for `ttl_sec`; False if another caller reserved it first."""
+        digest = hashlib.sha256(normalize_text(question).encode('utf-8')).hexdigest()[:16]
+        key = f"{self._key(topic)}:claimed:{digest}"
+        if self.r is not None:
+            try:
+                return bool(self.r.set(key, 1, nx=True, ex=ttl_sec))
+            except redis.exceptions.RedisError as e:
+                print(f"[Dedup] Redis claim failed, claiming locally: {e}")
+        now = time.monotonic()
+        with self._lock:
+            self._claims = {k: expiry for k, expiry in self._claims.items() if expiry > now}
+            if key in self._claims:
+                return False
+            self._claims[key] = now + ttl_sec
+            return True
+
+    def add(self, topic: str, question: str) -> None:
+        key = self._key(topic)
+        with self._lock:
+            loaded_at, questions = self._topics.get(key, (0.0, []))  # not loaded yet: read Redis on next lookup
+            self._topics[key] = (loaded_at, ([question] + questions)[:self.max_per_topic])
+        if self.r is not None:
+            try:
+                pipe = self.r.pipeline()
+                pipe.lpush(key, question)
+                pipe.ltrim(key, 0, self.max_per_topic - 1)
+                pipe.execute()
+            except redis.exceptions.RedisError as e:
+                print(f"[Dedup] Redis write failed: {e}")
+
+    def clear(self) -> None:
+        """Drop the in-process copies (Redis lists are kept)."""
+        with self._lock:
+            self._topics.clear()
+            self._claims.clear()
@@ -0,0 +1,136 @@
+import time
+import threading
+from statistics import NormalDist
+from typing import Optional
+
+
+class LatencyTracker:
+    """Exponentially weighted latency statistics per key (e.g. per model).
+
+    Keeps an EWMA of the mean and variance of observed call durations and
+    estimates percentiles from them as mean + z * stddev. `timeout()` turns the
+    p95 estimate into a request timeout: `multiplier` times p95, clamped to
+    [floor_sec, ceiling_sec]. Until `min_samples` calls have been seen the
+    ceiling is used, so a cold process never times out early.
+    """
+
+    def __init__(self, alpha: float = 0.1, min_samples: int = 20, multiplier: float = 2.0,
+                 floor_sec: float = 5.0, ceiling_sec: float = 120.0):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.multiplier = multiplier
+        self.floor_sec = floor_sec
+        self.ceiling_sec = ceiling_sec
+        self._stats = {}  # key -> [samples, mean, variance]
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, seconds: float) -> None:
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                self._stats[key] = [1, seconds, 0.0]
+                return
+            samples, mean, variance = stats
+            delta = seconds - mean
+            mean += self.alpha * delta
+            variance = (1 - self.alpha) * (variance + self.alpha * delta * delta)
+            self._stats[key] = [samples + 1, mean, variance]
+
+    def percentile(self, key: str, pct: float) -> Optional[float]:
+        """Estimated `pct`-th percentile latency in seconds, or None before `min_samples` calls."""
+        with self._lock:
+            stats = self._stats.get(key)
+        if stats is None or stats[0] < self.min_samples:
+            return None
+        _, mean, variance = stats
+        return max(0.0, mean + NormalDist().inv_cdf(pct / 100.0) * variance ** 0.5)
+
+    def timeout(self, key: str) -> float:
+        p95 = self.percentile(key, 95)
+        if p95 is None:
+            return self.ceiling_sec
+        return min(self.ceiling_sec, max(self.floor_sec, self.multiplier * p95))
+
+    def snapshot(self) -> dict:
+        """{key: {'samples', 'mean_sec', 'p95_sec', 'timeout_sec'}} for monitoring."""
+        with self._lock:
+            stats = {key: list(value) for key, value in self._stats.items()}
+        return {
+            key: {'samples': samples, 'mean_sec': mean,
+                  'p95_sec': self.percentile(key, 95), 'timeout_sec': self.timeout(key)}
+            for key, (samples, mean, _) in stats.items()
+        }
+
+
+class CircuitBreaker:
+    """Fails fast while the upstream is degraded.
+
+    Closed: calls go through. After `failure_threshold` consecutive failures
+    (timeouts, connection errors, 5xx) it opens, and `allow()` refuses calls for
+    `cooldown_sec`. Then it is half-open: one probe call is allowed, and its
+    success closes the breaker while a failure opens it again. Any answer from
+    the upstream that is not a 5xx counts as a success.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, cooldown_sec: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_sec = cooldown_sec
+        self._failures = 0
+        self._opened_at = None
+        self._probe_started = None
+        self._lock = threading.Lock()
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at < self.cooldown_sec:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self) -> bool:
+        """Whether a call may go to the upstream now."""
+        if self.failure_threshold <= 0:
+            return True
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            # One probe at a time; a probe that never reported back is replaced after a cooldown
+            if state == self.HALF_OPEN and (self._probe_started is None
+                                            or now - self._probe_started >= self.cooldown_sec):
+                self._probe_started = now
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a probe through (0 when closed)."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown_sec - (time.monotonic() - self._opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probe_started is not None or (self._opened_at is None
+                                                   and self._failures >= self.failure_threshold):
+                self.trips += 1
+                print(f"[LLM] Circuit breaker open after {self._failures} consecutive failures; "
+                      f"failing fast for {self.cooldown_sec:.0f}s.")
+                self._opened_at = time.monotonic()
+                self._probe_started = None
@@ -1,7 +1,145 @@
+import os
+import re
+import json
+import uuid
 import time
+import asyncio
+import hashlib
+import threading
+import weakref
+import contextvars
+import redis
 import requests
-from config import API_URL
-from typing import Optional
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from requests.adapters import HTTPAdapter
+from config import (
+    API_URL, LLM_BACKEND, LLM_FAKE_LATENCY_MS, LLM_POOL_SIZE, LLM_ASYNC_MAX_CONNECTIONS,
+    LLM_CONNECT_TIMEOUT_SEC, LLM_READ_TIMEOUT_SEC, LLM_COALESCE_LOCK_TTL_SEC, LLM_COALESCE_RESULT_TTL_SEC,
+    LLM_RPM, LLM_TPM, LLM_MAX_CONCURRENCY, LLM_EXPECTED_OUTPUT_TOKENS, LLM_RATE_MAX_WAIT_SEC,
+    LLM_TIMEOUT_P95_MULTIPLIER, LLM_TIMEOUT_FLOOR_SEC, LLM_LATENCY_MIN_SAMPLES, LLM_HEDGE_PERCENTILE,
+    LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN_SEC,
+)
+from typing import AsyncIterator, Iterator, List, Optional
+from utilities.latency import CircuitBreaker, LatencyTracker
+from utilities.metrics import metrics, llm_retries_total, llm_rate_limited_total, llm_errors_total
+from utilities.rate_limit import RateLimiter
+
+# (connect, read) timeouts passed to every LLM request
+LLM_TIMEOUT = (LLM_CONNECT_TIMEOUT_SEC, LLM_READ_TIMEOUT_SEC)
+
+_http_session: Optional[requests.Session] = None
+_http_session_pid: Optional[int] = None
+_http_session_lock = threading.Lock()
+_request_count = 0
+# One httpx.AsyncClient per event loop (async serving path, see asgi.py)
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_session() -> requests.Session:
+    """Return the shared, keep-alive `requests.Session` for this process.
+
+    Connections to the LLM endpoint are pooled (up to `LLM_POOL_SIZE` per host)
+    and reused across calls, so each request skips the TCP/TLS handshake once
+    the pool is warm. The session is recreated after a fork (e.g. gunicorn
+    workers) so sockets are never shared between processes.
+
+    Returns:
+        The process-wide session; safe to use from multiple threads.
+    """
+    global _http_session, _http_session_pid
+    pid = os.getpid()
+    if _http_session is None or _http_session_pid != pid:
+        with _http_session_lock:
+            if _http_session is None or _http_session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=LLM_POOL_SIZE, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _http_session, _http_session_pid = session, pid
+    return _http_session
+
+
+def post_llm_request(url: str, headers: dict, data: dict, stream: bool = False,
+                     timeout: Optional[tuple] = None) -> requests.Response:
+    """POST a JSON payload to the LLM endpoint through the pooled session.
+
+    With `stream=True` the body is not read up front, so the caller can
+    iterate it (the connection returns to the pool once it is consumed).
+    `timeout` overrides the default (connect, read) pair.
+    """
+    global _request_count
+    with _http_session_lock:
+        _request_count += 1
+    extra = {'stream': True} if stream else {}
+    return get_http_session().post(url, headers=headers, json=data, timeout=timeout or LLM_TIMEOUT, **extra)
+
+
+def get_async_http_client():
+    """Return the pooled `httpx.AsyncClient` bound to the running event loop.
+
+    Used by `LLMClient.agenerate()` so one worker can keep hundreds of LLM
+    requests in flight without a thread each. Timeouts match the sync session.
+    """
+    import httpx  # only needed by the async serving path
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(LLM_READ_TIMEOUT_SEC, connect=LLM_CONNECT_TIMEOUT_SEC),
+            limits=httpx.Limits(max_connections=LLM_ASYNC_MAX_CONNECTIONS, max_keepalive_connections=LLM_POOL_SIZE),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def apost_llm_request(url: str, headers: dict, data: dict, read_timeout: Optional[float] = None):
+    """Async counterpart of `post_llm_request()`; returns an `httpx.Response`."""
+    global _request_count
+    with _http_session_lock:
+        _request_count += 1
+    extra = {}
+    if read_timeout is not None:
+        import httpx
+        extra['timeout'] = httpx.Timeout(read_timeout, connect=LLM_CONNECT_TIMEOUT_SEC)
+    return await get_async_http_client().post(url, headers=headers, json=data, **extra)
+
+
+def astream_llm_request(url: str, headers: dict, data: dict, read_timeout: Optional[float] = None):
+    """Async streaming POST; use as `async with astream_llm_request(...) as response`."""
+    import httpx
+
+    global _request_count
+    with _http_session_lock:
+        _request_count += 1
+    extra = {}
+    if read_timeout is not None:
+        extra['timeout'] = httpx.Timeout(read_timeout, connect=LLM_CONNECT_TIMEOUT_SEC)
+    return get_async_http_client().stream('POST', url, headers=headers, json=data, **extra)
+
+
+def connection_stats() -> dict:
+    """Report how often pooled connections were reused in this process.
+
+    Returns:
+        A dict with `requests` (LLM requests issued), `connections_opened`
+        (new TCP/TLS connections) and `connections_reused`.
+    """
+    opened = 0
+    session = _http_session
+    if session is not None and _http_session_pid == os.getpid():
+        for adapter in {id(a): a for a in session.adapters.values()}.values():
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    opened += pool.num_connections
+    return {
+        'requests': _request_count,
+        'connections_opened': opened,
+        'connections_reused': max(0, _request_count - opened),
+    }
 
 
 def _build_request(prompt: str):
@@ -19,7 +157,7 @@ def _build_request(prompt: str):
         prompt: The prompt/question to send to the model.
 
     Returns:
-        A tuple of (headers, data) ready to pass to requests.post.
+        A tuple of (headers, data) ready to pass to `post_llm_request()`.
     """
     headers = {'Content-Type': 'application/json'}
     data = {'contents': [{'parts': [{'text': prompt}]}]}
@@ -58,11 +196,53 @@ def _extract_text(response_json: dict) -> Optional[str]:
     return text.strip() if isinstance(text, str) else None
 
 
+def _extract_chunk(response_json: dict) -> str:
+    """Extract the text of one streamed response chunk.
+
+    Streaming responses have the same shape as `_extract_text()` expects, but
+    each chunk carries a fragment whose surrounding whitespace is significant,
+    so nothing is stripped. Missing text yields an empty string.
+    """
+    candidates = response_json.get('candidates') or []
+    if not candidates:
+        return ''
+    parts = (candidates[0].get('content') or {}).get('parts') or []
+    return ''.join(part.get('text') or '' for part in parts if isinstance(part, dict))
+
+
+def _stream_url(url: str) -> str:
+    """Turn a `:generateContent` endpoint into its server-sent-events streaming variant."""
+    url = url.replace(':generateContent', ':streamGenerateContent', 1)
+    return url + ('&' if '?' in url else '?') + 'alt=sse'
+
+
+def _request_tokens(prompt: str) -> int:
+    """Tokens to reserve against the TPM quota: the prompt (~4 characters per token) plus a typical reply."""
+    return (len(prompt) + 3) // 4 + LLM_EXPECTED_OUTPUT_TOKENS
+
+
+def _used_tokens(response_json: dict) -> Optional[int]:
+    """Actual token usage reported by Gemini (`usageMetadata.totalTokenCount`), if present."""
+    usage = response_json.get('usageMetadata') if isinstance(response_json, dict) else None
+    total = (usage or {}).get('totalTokenCount')
+    return total if isinstance(total, int) else None
+
+
+def _retry_after(response, attempt: int, backoff_factor: int) -> float:
+    """Pause after a 429: the server's Retry-After if it sent one, else exponential backoff."""
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return max(0.0, float(headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        return max(0, backoff_factor ** attempt)
+
+
 def _backoff_sleep(attempt: int, backoff_factor: int) -> None:
     """Sleep using exponential backoff based on the attempt number.
 
     The wait time is computed as `backoff_factor ** attempt` and printed
-    for observability during local development/tests.
+    for observability during local development/tests. Callers release their
+    rate limit lease first, so a backing-off request holds no capacity.
 
     Args:
         attempt: Zero-based attempt index within the retry loop.
@@ -70,59 +250,830 @@ def _backoff_sleep(attempt: int, backoff_factor: int) -> None:
     """
     wait_time = max(0, backoff_factor ** attempt)
     if wait_time:
-        print(f"Rate limit exceeded. Retrying in {wait_time} seconds...")
+        print(f"Request failed. Retrying in {wait_time} seconds...")
         time.sleep(wait_time)
 
 
-def call_gemini_api(prompt: str, retries: int = 3, backoff_factor: int = 2) -> str:
-    """Call the LLM API with simple retry and response parsing.
+async def _abackoff_sleep(attempt: int, backoff_factor: int) -> None:
+    """Async variant of `_backoff_sleep()` that yields to the event loop while waiting."""
+    wait_time = max(0, backoff_factor ** attempt)
+    if wait_time:
+        print(f"Request failed. Retrying in {wait_time} seconds...")
+        await asyncio.sleep(wait_time)
 
-    Behavior:
-    - Builds request via `_build_request()`.
-    - Attempts up to `retries` times.
-      * On HTTP 429, sleeps with `_backoff_sleep()` then retries.
-      * On other HTTP errors, returns an error string including status code.
-      * On network errors (RequestException), retries until attempts exhausted.
-    - On 2xx, parses JSON and extracts text via `_extract_text()`.
-      * If text is missing or payload shape is unexpected, returns a descriptive error.
 
-    Args:
-        prompt: Prompt/question to send to the model.
-        retries: Max attempts (default 3). Each iteration performs one POST.
-        backoff_factor: Base for exponential backoff (default 2).
+def _count_rate_limited(retrying: bool) -> None:
+    """Count an HTTP 429, and its retry when one follows (generate, agenerate, stream and astream alike)."""
+    llm_rate_limited_total.inc()
+    if retrying:
+        llm_retries_total.inc(reason='rate_limited')
+
+
+RATE_LIMIT_TIMEOUT_ERROR = "Error: Timed out waiting for LLM rate limit capacity"
+# Returned without calling upstream while `llm_breaker` is open (routes answer 503 for it)
+LLM_UNAVAILABLE_ERROR = "Error: The AI service is temporarily unavailable. Please try again shortly."
+
+
+def _failed(kind: str, message: str) -> str:
+    """Count an "Error: ..." result of a Gemini call by `kind` and return it."""
+    llm_errors_total.inc(kind=kind)
+    return message
+
+
+def _model_name(url: str) -> str:
+    """Model id in a Gemini endpoint URL (`.../models/<model>:generateContent`), used as the latency key."""
+    match = re.search(r'models/([^:/?]+)', url)
+    return match.group(1) if match else url
+
+
+# Call purpose (initial, follow_up, ideal_answer, ...) of the LLM calls made in this context
+_llm_purpose = contextvars.ContextVar('llm_purpose', default=None)
+
+
+@contextmanager
+def llm_purpose(purpose: str):
+    """Tag the LLM calls made inside the block with `purpose`.
+
+    Short question prompts and long ideal-answer generations take very
+    different times, so latency estimates (and the adaptive timeouts and hedge
+    delays derived from them) are kept per model and purpose.
+    """
+    token = _llm_purpose.set(purpose)
+    try:
+        yield
+    finally:
+        _llm_purpose.reset(token)
+
+
+# Threads for hedged requests: the primary and its duplicate both run here while the caller waits
+_hedge_pool = ThreadPoolExecutor(max_workers=LLM_POOL_SIZE * 2, thread_name_prefix='llm-hedge')
+_hedge_stats = {'hedged': 0, 'hedge_wins': 0}
+_hedge_stats_lock = threading.Lock()
+
+
+def _count_hedge(stat: str) -> None:
+    with _hedge_stats_lock:
+        _hedge_stats[stat] += 1
+
+
+def tail_latency_stats() -> dict:
+    """Latency estimates per model and purpose, hedging counters and the circuit breaker's state."""
+    with _hedge_stats_lock:
+        hedges = dict(_hedge_stats)
+    return {'latency': latency_tracker.snapshot(), 'breaker': llm_breaker.state,
+            'breaker_trips': llm_breaker.trips, **hedges}
+
+
+class LLMStreamError(RuntimeError):
+    """Raised when a streamed response breaks off after text was already yielded."""
+
+
+class LLMClient:
+    """Interface shared by every LLM backend.
+
+    Subclasses implement `generate()`; the async and batch variants are
+    derived from it so every call site (question generation, ideal-answer
+    scoring) gets the same behavior regardless of backend.
+    """
+
+    name = 'base'
+
+    def generate(self, prompt: str, retries: int = 3, backoff_factor: int = 2) -> str:
+        """Return the model's text for `prompt`, or an "Error: ..." string."""
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """Async variant of `generate()` that does not block the event loop."""
+        return await asyncio.to_thread(self.generate, prompt, **kwargs)
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Yield the response text in fragments as it is produced.
+
+        The default implementation yields the full `generate()` result once,
+        including "Error: ..." strings, so callers handle both paths alike.
+        """
+        yield self.generate(prompt, **kwargs)
+
+    async def astream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        """Async variant of `stream()`; the default yields the full `agenerate()` result once."""
+        yield await self.agenerate(prompt, **kwargs)
+
+    def generate_batch(self, prompts: List[str], **kwargs) -> List[str]:
+        """Generate responses for several prompts concurrently, preserving order."""
+        if not prompts:
+            return []
+        with ThreadPoolExecutor(max_workers=min(len(prompts), LLM_POOL_SIZE)) as pool:
+            return list(pool.map(lambda p: self.generate(p, **kwargs), prompts))
+
+
+class GeminiClient(LLMClient):
+    """Google Gemini backend using the pooled HTTP session."""
+
+    name = 'gemini'
+
+    def __init__(self, url: str = API_URL):
+        self.url = url
+        self.model = _model_name(url)
+
+    # --- Tail latency: adaptive timeout, hedging, circuit breaker ---
+
+    def _latency_key(self) -> str:
+        """Latency statistics are kept per model and call purpose (see `llm_purpose()`)."""
+        purpose = _llm_purpose.get()
+        return f"{self.model}/{purpose}" if purpose else self.model
+
+    def _hedge_after(self) -> Optional[float]:
+        """Seconds after which a duplicate request is sent, or None (hedging off or no estimate yet)."""
+        if not LLM_HEDGE_PERCENTILE:
+            return None
+        return latency_tracker.percentile(self._latency_key(), LLM_HEDGE_PERCENTILE)
+
+    def _record(self, status: Optional[int], started: float) -> None:
+        """Feed one outcome to the breaker and latency tracker (status None: network error/timeout)."""
+        if status is None or status >= 500:
+            llm_breaker.record_failure()
+            return
+        llm_breaker.record_success()  # 4xx including 429: the upstream is answering
+        if 200 <= status < 300:  # a fast 429/400 says nothing about generation time
+            latency_tracker.observe(self._latency_key(), time.monotonic() - started)
+
+    def _send(self, headers: dict, data: dict, tokens: int) -> requests.Response:
+        """POST one attempt with the model's adaptive read timeout, hedged if it runs long."""
+        timeout = (LLM_CONNECT_TIMEOUT_SEC, latency_tracker.timeout(self._latency_key()))
+        hedge_after = self._hedge_after()
+        started = time.monotonic()
+        try:
+            if hedge_after is None:
+                resp = post_llm_request(self.url, headers, data, timeout=timeout)
+            else:
+                resp = self._send_hedged(headers, data, tokens, timeout, hedge_after)
+        except requests.RequestException:
+            self._record(None, started)
+            raise
+        self._record(resp.status_code, started)
+        return resp
+
+    def _send_hedged(self, headers, data, tokens, timeout, hedge_after) -> requests.Response:
+        """Send the request; if it has not answered after `hedge_after` seconds, send a
+        duplicate and return whichever succeeds first (the other is discarded)."""
+        primary = _hedge_pool.submit(post_llm_request, self.url, headers, data, timeout=timeout)
+        try:
+            return primary.result(timeout=hedge_after)
+        except FutureTimeout:
+            pass
+        hedge = _hedge_pool.submit(self._hedge, primary, headers, data, tokens, timeout)
+        error = None
+        for future in as_completed([primary, hedge]):
+            try:
+                resp = future.result()
+            except requests.RequestException as e:
+                error = error or e
+                continue
+            if resp is not None:
+                if future is hedge:
+                    _count_hedge('hedge_wins')
+                return resp
+        raise error
+
+    def _hedge(self, primary, headers, data, tokens, timeout) -> Optional[requests.Response]:
+        """The duplicate request; it needs its own rate-limit lease and is skipped if the primary is done.
+
+        A blocking request cannot be cancelled, so the lease is held until the
+        primary settles too: if the hedge wins, the caller releases its lease
+        while the primary is still in flight, and this one covers it.
+        """
+        lease = rate_limiter.acquire(tokens)
+        if lease is None:
+            return None
+        try:
+            if primary.done():
+                return None
+            _count_hedge('hedged')
+            return post_llm_request(self.url, headers, data, timeout=timeout)
+        finally:
+            primary.add_done_callback(lambda _: lease.release())
+
+    async def _asend(self, headers: dict, data: dict, tokens: int):
+        """Async `_send()`: the losing request of a hedged pair is cancelled."""
+        import httpx
+
+        read_timeout = latency_tracker.timeout(self._latency_key())
+        hedge_after = self._hedge_after()
+        started = time.monotonic()
+        try:
+            if hedge_after is None:
+                resp = await apost_llm_request(self.url, headers, data, read_timeout=read_timeout)
+            else:
+                resp = await self._asend_hedged(headers, data, tokens, read_timeout, hedge_after)
+        except httpx.HTTPError:
+            self._record(None, started)
+            raise
+        self._record(resp.status_code, started)
+        return resp
+
+    async def _asend_hedged(self, headers, data, tokens, read_timeout, hedge_after):
+        primary = asyncio.ensure_future(apost_llm_request(self.url, headers, data, read_timeout=read_timeout))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done:
+            return primary.result()
+        hedge = asyncio.ensure_future(self._ahedge(primary, headers, data, tokens, read_timeout))
+        pending, error = {primary, hedge}, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+                resp = task.result()
+                if resp is not None:
+                    for other in pending:
+                        other.cancel()
+                    if task is hedge:
+                        _count_hedge('hedge_wins')
+                    return resp
+        raise error
+
+    async def _ahedge(self, primary, headers, data, tokens, read_timeout):
+        lease = await rate_limiter.aacquire(tokens)
+        if lease is None:
+            return None
+        try:
+            if primary.done():
+                return None
+            _count_hedge('hedged')
+            return await apost_llm_request(self.url, headers, data, read_timeout=read_timeout)
+        finally:
+            await asyncio.to_thread(lease.release)
+
+    def generate(self, prompt: str, retries: int = 3, backoff_factor: int = 2) -> str:
+        """Call the Gemini API with simple retry and response parsing.
+
+        Behavior:
+        - Builds request via `_build_request()` and sends it through the pooled
+          session (`post_llm_request()`).
+        - Every attempt first asks `llm_breaker`; while it is open (upstream
+          failing) this returns LLM_UNAVAILABLE_ERROR without a request.
+        - Every attempt then takes capacity from the cluster-wide `rate_limiter`
+          (queueing fairly behind other workers when the quota is used up).
+        - The read timeout adapts to the model's observed latency, and with
+          LLM_HEDGE_PERCENTILE set a slow request is hedged (`_send()`).
+        - Attempts up to `retries` times.
+          * On HTTP 429, pauses all workers through `rate_limiter.penalize()` (for
+            Retry-After, or `_backoff_sleep()`-style backoff) then retries.
+          * On other HTTP errors, returns an error string including status code.
+          * On network errors (RequestException), retries after `_backoff_sleep()`
+            until attempts are exhausted.
+          * Either pause starts after the attempt's rate limit lease is released.
+        - On 2xx, parses JSON and extracts text via `_extract_text()`.
+          * If text is missing or payload shape is unexpected, returns a descriptive error.
+
+        Args:
+            prompt: Prompt/question to send to the model.
+            retries: Max attempts (default 3). Each iteration performs one POST.
+            backoff_factor: Base for exponential backoff (default 2).
+
+        Returns:
+            On success: Extracted text string.
+            On failure: Error string prefixed with "Error:" describing the issue.
+        """
+        headers, data = _build_request(prompt)
+        tokens = _request_tokens(prompt)
+
+        for attempt in range(retries):
+            if not llm_breaker.allow():
+                return _failed('unavailable', LLM_UNAVAILABLE_ERROR)
+            lease = rate_limiter.acquire(tokens)
+            if lease is None:
+                return _failed('rate_limit_timeout', RATE_LIMIT_TIMEOUT_ERROR)
+            used = None
+            try:
+                resp = self._send(headers, data, tokens)
+                resp.raise_for_status()
+
+                payload = resp.json()
+                used = _used_tokens(payload)
+                text = _extract_text(payload)
+                if text:
+                    return text
+                return _failed('format', f"Error: Unexpected API response format: {resp.text}")
+
+            except requests.exceptions.HTTPError as e:
+                status = getattr(e.response, 'status_code', None)
+                if status == 429:
+                    _count_rate_limited(retrying=attempt < retries - 1)
+                if status != 429 or attempt == retries - 1:
+                    # Non-retryable HTTP error or no attempts left
+                    error_text = getattr(e.response, 'text', '')
+                    return _failed('http', f"Error: API request failed with status {status}: {error_text}")
+                pause = _retry_after(e.response, attempt, backoff_factor)
+
+            except requests.RequestException as e:
+                # Network or other request error; only retry if attempts left
+                if attempt == retries - 1:
+                    return _failed('network', f"Error: Request failed: {str(e)}")
+                llm_retries_total.inc(reason='network')
+                pause = None
+
+            finally:
+                lease.release(used)
+
+            # Wait only after the lease is released, so the pause holds no rate limit capacity
+            if pause is None:
+                _backoff_sleep(attempt, backoff_factor)
+            else:
+                rate_limiter.penalize(pause)
+
+        # Should not reach here due to returns in loop, but kept as a safeguard
+        return "Error: Exhausted retries without a successful response"
+
+    async def agenerate(self, prompt: str, retries: int = 3, backoff_factor: int = 2) -> str:
+        """Non-blocking `generate()` over the per-loop `httpx.AsyncClient`.
+
+        Same rate limiting, tail-latency handling, retry policy and return values as `generate()`.
+        """
+        import httpx
+
+        headers, data = _build_request(prompt)
+        tokens = _request_tokens(prompt)
+
+        for attempt in range(retries):
+            if not llm_breaker.allow():
+                return _failed('unavailable', LLM_UNAVAILABLE_ERROR)
+            lease = await rate_limiter.aacquire(tokens)
+            if lease is None:
+                return _failed('rate_limit_timeout', RATE_LIMIT_TIMEOUT_ERROR)
+            resp = payload = error = None
+            try:
+                resp = await self._asend(headers, data, tokens)
+                try:
+                    payload = resp.json() if resp.is_success else None
+                except ValueError:
+                    payload = None
+            except httpx.HTTPError as e:
+                error = e
+            finally:
+                # Also when the caller is cancelled (client gone), or the slot would leak
+                await asyncio.to_thread(lease.release, _used_tokens(payload) if payload else None)
+
+            if error is not None:
+                # Network or other transport error; only retry if attempts left
+                if attempt < retries - 1:
+                    llm_retries_total.inc(reason='network')
+                    await _abackoff_sleep(attempt, backoff_factor)
+                    continue
+                return _failed('network', f"Error: Request failed: {str(error)}")
+
+            if resp.status_code == 429:
+                _count_rate_limited(retrying=attempt < retries - 1)
+            if resp.status_code == 429 and attempt < retries - 1:
+                await rate_limiter.apenalize(_retry_after(resp, attempt, backoff_factor))
+                continue
+            if not resp.is_success:
+                return _failed('http', f"Error: API request failed with status {resp.status_code}: {resp.text}")
+
+            text = _extract_text(payload) if isinstance(payload, dict) else None
+            if text:
+                return text
+            return _failed('format', f"Error: Unexpected API response format: {resp.text}")
+
+        # Should not reach here due to returns in loop, but kept as a safeguard
+        return "Error: Exhausted retries without a successful response"
+
+    def stream(self, prompt: str, retries: int = 3, backoff_factor: int = 2) -> Iterator[str]:
+        """Stream the response via `streamGenerateContent` (server-sent events).
+
+        If the stream cannot be opened, or ends without any text, this falls
+        back to `generate()` (with its retries) and yields that result once;
+        on a 429 that fallback waits out the `rate_limiter.penalize()` pause first.
+        A failure after text was yielded raises `LLMStreamError`. Streams use the
+        adaptive timeout (between chunks) and the breaker, but are not hedged.
+        """
+        headers, data = _build_request(prompt)
+        produced = False
+        if not llm_breaker.allow():
+            yield _failed('unavailable', LLM_UNAVAILABLE_ERROR)
+            return
+        lease = rate_limiter.acquire(_request_tokens(prompt))
+        if lease is None:
+            yield _failed('rate_limit_timeout', RATE_LIMIT_TIMEOUT_ERROR)
+            return
+        used = pause = None
+        try:
+            resp = post_llm_request(_stream_url(self.url), headers, data, stream=True,
+                                    timeout=(LLM_CONNECT_TIMEOUT_SEC, latency_tracker.timeout(self._latency_key())))
+            with resp:
+                if resp.status_code >= 500:
+                    llm_breaker.record_failure()
+                else:
+                    llm_breaker.record_success()
+                if resp.status_code == 429:
+                    # Counted like generate()'s 429s; the fallback request is the retry
+                    _count_rate_limited(retrying=True)
+                    pause = _retry_after(resp, 0, backoff_factor)
+                resp.raise_for_status()
+                for line in resp.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith('data:'):
+                        continue
+                    event = json.loads(line[len('data:'):])
+                    used = _used_tokens(event) or used  # the last chunk carries the totals
+                    chunk = _extract_chunk(event)
+                    if chunk:
+                        produced = True
+                        yield chunk
+        except (requests.RequestException, ValueError) as e:
+            if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+                llm_breaker.record_failure()
+            if produced:
+                raise LLMStreamError(f"Stream interrupted: {e}") from e
+            print(f"Streaming request failed ({e}); falling back to a regular request.")
+        finally:
+            lease.release(used)
+        if pause is not None:
+            rate_limiter.penalize(pause)
+        if not produced:
+            yield self.generate(prompt, retries=retries, backoff_factor=backoff_factor)
+
+    async def astream(self, prompt: str, retries: int = 3, backoff_factor: int = 2) -> AsyncIterator[str]:
+        """Async `stream()` over the per-loop `httpx.AsyncClient`, with the same fallback and errors."""
+        import httpx
+
+        headers, data = _build_request(prompt)
+        produced = False
+        if not llm_breaker.allow():
+            yield _failed('unavailable', LLM_UNAVAILABLE_ERROR)
+            return
+        lease = await rate_limiter.aacquire(_request_tokens(prompt))
+        if lease is None:
+            yield _failed('rate_limit_timeout', RATE_LIMIT_TIMEOUT_ERROR)
+            return
+        used = pause = None
+        try:
+            async with astream_llm_request(_stream_url(self.url), headers, data,
+                                           read_timeout=latency_tracker.timeout(self._latency_key())) as resp:
+                if resp.status_code >= 500:
+                    llm_breaker.record_failure()
+                else:
+                    llm_breaker.record_success()
+                if resp.status_code == 429:
+                    # Counted like generate()'s 429s; the fallback request is the retry
+                    _count_rate_limited(retrying=True)
+                    pause = _retry_after(resp, 0, backoff_factor)
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line or not line.startswith('data:'):
+                        continue
+                    event = json.loads(line[len('data:'):])
+                    used = _used_tokens(event) or used
+                    chunk = _extract_chunk(event)
+                    if chunk:
+                        produced = True
+                        yield chunk
+        except (httpx.HTTPError, ValueError) as e:
+            if isinstance(e, httpx.TransportError):
+                llm_breaker.record_failure()
+            if produced:
+                raise LLMStreamError(f"Stream interrupted: {e}") from e
+            print(f"Streaming request failed ({e}); falling back to a regular request.")
+        finally:
+            await asyncio.to_thread(lease.release, used)
+        if pause is not None:
+            await rate_limiter.apenalize(pause)
+        if not produced:
+            yield await self.agenerate(prompt, retries=retries, backoff_factor=backoff_factor)
+
+
+class FakeLLMClient(LLMClient):
+    """Offline backend for local runs and load tests (LLM_BACKEND=fake).
+
+    Responses are deterministic per prompt and reuse the prompt's own words,
+    so similarity scoring still produces non-trivial values. An artificial
+    latency (LLM_FAKE_LATENCY_MS) approximates upstream response times.
+    """
+
+    name = 'fake'
+
+    def __init__(self, latency_ms: float = LLM_FAKE_LATENCY_MS):
+        self.latency_ms = latency_ms
+
+    def generate(self, prompt: str, retries: int = 3, backoff_factor: int = 2) -> str:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        return self._respond(prompt)
+
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000.0)
+        return self._respond(prompt)
+
+    @staticmethod
+    def _respond(prompt: str) -> str:
+        digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8]
+        words = prompt.split()[-24:]
+        return f"[{digest}] Could you explain {' '.join(words)}?"
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        text = self.generate(prompt, **kwargs)
+        for i, word in enumerate(text.split(' ')):
+            yield word if i == 0 else ' ' + word
+
+    async def astream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        text = await self.agenerate(prompt, **kwargs)
+        for i, word in enumerate(text.split(' ')):
+            yield word if i == 0 else ' ' + word
+
+
+_BACKENDS = {
+    GeminiClient.name: GeminiClient,
+    FakeLLMClient.name: FakeLLMClient,
+}
+_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """Return the process-wide LLM client selected by the LLM_BACKEND env var."""
+    global _client
+    if _client is None:
+        backend = _BACKENDS.get(LLM_BACKEND)
+        if backend is None:
+            raise RuntimeError(f"Unknown LLM_BACKEND '{LLM_BACKEND}'. Expected one of: {', '.join(_BACKENDS)}")
+        _client = backend()
+    return _client
+
+
+def set_llm_client(client: Optional[LLMClient]) -> None:
+    """Override the process-wide client (None restores the configured backend)."""
+    global _client
+    _client = client
+
+
+def call_gemini_api(prompt: str, retries: int = 3, backoff_factor: int = 2) -> str:
+    """Generate text for `prompt` through the configured LLM client.
+
+    Kept as the historical entry point; see `GeminiClient.generate()` for the
+    retry and parsing behavior of the default backend.
 
     Returns:
         On success: Extracted text string.
         On failure: Error string prefixed with "Error:" describing the issue.
     """
-    headers, data = _build_request(prompt)
+    return get_llm_client().generate(prompt, retries=retries, backoff_factor=backoff_factor)
+
+
+class _InflightCall:
+    __slots__ = ('done', 'result')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class PromptCoalescer:
+    """Collapses concurrent calls with an identical prompt into one upstream LLM call.
+
+    Meant for deterministic prompts (ideal answers). Question generation only
+    coalesces a first question missing from the question bank, asking for several
+    candidates that the sharing callers claim one each (see
+    InterviewSession._unique_main_question_steps). Only callers that arrive while
+    a call is in flight share its text; it is never a cache.
+
+    Within a process the first caller of a prompt makes the call and concurrent
+    callers wait for its text. When attached to Redis, that caller also takes a
+    short lock (`<prefix>:inflight:<hash>`) holding a call token, so callers in
+    other workers wait for that call and read its text from
+    `<prefix>:result:<hash>:<token>` (kept `result_ttl_sec` for slow pollers; a
+    later caller sees no lock and makes its own call). "Error: ..." results are
+    shared only within the process. A waiter whose call fails, or is still
+    running after `lock_ttl_sec`, makes its own call. Redis failures fall back
+    to in-process coalescing.
+    """
+
+    def __init__(self, r=None, lock_ttl_sec: int = LLM_COALESCE_LOCK_TTL_SEC,
+                 result_ttl_sec: int = LLM_COALESCE_RESULT_TTL_SEC, poll_sec: float = 0.05, prefix: str = 'llm'):
+        self.r = r
+        self.lock_ttl_sec = lock_ttl_sec
+        self.result_ttl_sec = result_ttl_sec
+        self.poll_sec = poll_sec
+        self.prefix = prefix
+        self._calls = {}   # key -> _InflightCall (blocking callers)
+        self._acalls = {}  # (event loop, key) -> asyncio.Future (async callers)
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'coalesced': 0, 'shared': 0}
+
+    def attach(self, r) -> None:
+        """Use `r` to coalesce across workers (None limits coalescing to this process)."""
+        self.r = r
 
-    for attempt in range(retries):
+    def _key(self, client: LLMClient, prompt: str) -> str:
+        name = getattr(client, 'name', type(client).__name__)
+        return hashlib.sha256(f"{name}\n{prompt}".encode('utf-8')).hexdigest()
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self) -> dict:
+        """Counts of upstream `calls` made, in-process waiters `coalesced` onto them and
+        results `shared` from other workers through Redis."""
+        with self._lock:
+            return dict(self._stats)
+
+    # --- Across workers (Redis); every step is one pipelined round trip ---
+
+    def _claim(self, key: str):
+        """Returns (token, True) when this caller took the lock and makes the call,
+        (token, False) while another worker's call `token` runs, and (None, True) when
+        this caller should call without sharing (no Redis, or a Redis error)."""
+        if self.r is None:
+            return None, True
+        token = uuid.uuid4().hex
         try:
-            resp = requests.post(API_URL, headers=headers, json=data, timeout=120)
-            resp.raise_for_status()
+            pipe = self.r.pipeline()
+            pipe.set(f"{self.prefix}:inflight:{key}", token, nx=True, ex=self.lock_ttl_sec)
+            pipe.get(f"{self.prefix}:inflight:{key}")
+            locked, current = pipe.execute()
+        except redis.exceptions.RedisError as e:
+            print(f"[LLM] Coalescing lock failed, calling directly: {e}")
+            return None, True
+        return (token, True) if locked else (current, False)
 
-            payload = resp.json()
-            text = _extract_text(payload)
-            if text:
-                return text
-            return f"Error: Unexpected API response format: {resp.text}"
+    def _poll(self, key: str, token: str):
+        """Returns (text, still_running) for another worker's call `token`."""
+        try:
+            pipe = self.r.pipeline()
+            pipe.get(f"{self.prefix}:result:{key}:{token}")
+            pipe.get(f"{self.prefix}:inflight:{key}")
+            text, inflight = pipe.execute()
+        except redis.exceptions.RedisError as e:
+            print(f"[LLM] Coalescing poll failed, calling directly: {e}")
+            return None, False
+        return text, text is None and inflight == token
 
-        except requests.exceptions.HTTPError as e:
-            status = getattr(e.response, 'status_code', None)
-            if status == 429 and attempt < retries - 1:
-                _backoff_sleep(attempt, backoff_factor)
-                continue
-            # Non-retryable HTTP error or no attempts left
-            error_text = getattr(e.response, 'text', '')
-            return f"Error: API request failed with status {status}: {error_text}"
+    def _publish(self, key: str, token: Optional[str], text: Optional[str]) -> None:
+        """Hand a successful `text` to the call's waiters and drop the lock if `token` still holds it."""
+        if self.r is None or token is None:
+            return
+        lock_key = f"{self.prefix}:inflight:{key}"
+        pipe = self.r.pipeline()
+        try:
+            pipe.watch(lock_key)
+            held = pipe.get(lock_key) == token
+            pipe.multi()
+            if text and not text.startswith("Error:"):
+                pipe.set(f"{self.prefix}:result:{key}:{token}", text, ex=self.result_ttl_sec)
+            if held:
+                pipe.delete(lock_key)
+            pipe.execute()
+        except redis.exceptions.WatchError:
+            pass  # the lock expired and was taken over: it belongs to another call now
+        except redis.exceptions.RedisError as e:
+            print(f"[LLM] Coalescing publish failed: {e}")
+        finally:
+            pipe.reset()
 
-        except requests.RequestException as e:
-            # Network or other request error; only retry if attempts left
-            if attempt < retries - 1:
-                _backoff_sleep(attempt, backoff_factor)
+    def _lead(self, key: str):
+        """Wait out other workers' calls of `key`.
+
+        Returns (text, None) with another worker's text, or (None, token) when this
+        caller has to make the call; a `token` must be passed to `_publish` afterwards.
+        """
+        deadline = time.monotonic() + self.lock_ttl_sec
+        while True:
+            token, owner = self._claim(key)
+            if owner:
+                return None, token
+            if token is None:
+                continue  # the lock was released between SET and GET: claim again
+            text, running = self._poll(key, token)
+            while running and time.monotonic() < deadline:
+                time.sleep(self.poll_sec)
+                text, running = self._poll(key, token)
+            if text is not None:
+                self._count('shared')
+                return text, None
+            if time.monotonic() >= deadline:
+                return None, None
+            # that call failed: try to take it over
+
+    async def _alead(self, key: str):
+        """Async variant of `_lead()`."""
+        deadline = time.monotonic() + self.lock_ttl_sec
+        while True:
+            token, owner = await asyncio.to_thread(self._claim, key)
+            if owner:
+                return None, token
+            if token is None:
                 continue
-            return f"Error: Request failed: {str(e)}"
+            text, running = await asyncio.to_thread(self._poll, key, token)
+            while running and time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_sec)
+                text, running = await asyncio.to_thread(self._poll, key, token)
+            if text is not None:
+                self._count('shared')
+                return text, None
+            if time.monotonic() >= deadline:
+                return None, None
+
+    # --- Within the process ---
+
+    def _join(self, key: str):
+        """Returns (call, True) for the caller that should make the call, else (call, False)."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats['coalesced'] += 1
+                return call, False
+            call = self._calls[key] = _InflightCall()
+            self._stats['calls'] += 1
+            return call, True
+
+    def _leave(self, key: str, call: _InflightCall, text: Optional[str]) -> None:
+        call.result = text
+        with self._lock:
+            self._calls.pop(key, None)
+        call.done.set()
+
+    def generate(self, client: LLMClient, prompt: str, **kwargs) -> str:
+        """`client.generate(prompt, **kwargs)`, shared with concurrent identical calls."""
+        key = self._key(client, prompt)
+        call, leader = self._join(key)
+        if not leader:
+            if call.done.wait(self.lock_ttl_sec) and call.result is not None:
+                return call.result
+            return client.generate(prompt, **kwargs)
+
+        text = token = None
+        try:
+            text, token = self._lead(key)
+            if text is None:
+                text = client.generate(prompt, **kwargs)
+            return text
+        finally:
+            self._publish(key, token, text)
+            self._leave(key, call, text)
+
+    async def agenerate(self, client: LLMClient, prompt: str, **kwargs) -> str:
+        """Async variant of `generate()`; callers on the same event loop share one call."""
+        key = self._key(client, prompt)
+        loop = asyncio.get_running_loop()
+        future = self._acalls.get((loop, key))
+        if future is not None:
+            self._count('coalesced')
+            try:
+                text = await asyncio.wait_for(asyncio.shield(future), self.lock_ttl_sec)
+            except Exception:
+                text = None
+            return text if text is not None else await client.agenerate(prompt, **kwargs)
+
+        future = self._acalls[(loop, key)] = loop.create_future()
+        self._count('calls')
+        text = token = None
+        try:
+            text, token = await self._alead(key)
+            if text is None:
+                text = await client.agenerate(prompt, **kwargs)
+            return text
+        finally:
+            if token is not None:
+                await asyncio.to_thread(self._publish, key, token, text)
+            del self._acalls[(loop, key)]
+            future.set_result(text)  # None (the call raised): waiters make their own
+
+
+# Shared across workers through Redis once routes.init_app attaches it
+prompt_coalescer = PromptCoalescer()
+
+# Gemini quota shared by every worker once attached to Redis (routes.init_app and the worker scripts)
+rate_limiter = RateLimiter(rpm=LLM_RPM, tpm=LLM_TPM, max_concurrency=LLM_MAX_CONCURRENCY,
+                           max_wait_sec=LLM_RATE_MAX_WAIT_SEC)
+
+# Per-process view of upstream health; the read timeout never exceeds LLM_READ_TIMEOUT_SEC
+latency_tracker = LatencyTracker(min_samples=LLM_LATENCY_MIN_SAMPLES, multiplier=LLM_TIMEOUT_P95_MULTIPLIER,
+                                 floor_sec=LLM_TIMEOUT_FLOOR_SEC, ceiling_sec=LLM_READ_TIMEOUT_SEC)
+llm_breaker = CircuitBreaker(failure_threshold=LLM_BREAKER_FAILURES, cooldown_sec=LLM_BREAKER_COOLDOWN_SEC)
+
+
+def _llm_gauges():
+    """This worker's LLM client state for /metrics (see utilities.metrics)."""
+    for stat, value in connection_stats().items():
+        yield 'llm_http_pool', 'Pooled HTTP requests and connections.', {'stat': stat}, value
+    for stat, value in prompt_coalescer.stats().items():
+        yield 'llm_coalescer', 'Upstream calls and the callers that shared them.', {'stat': stat}, value
+    for stat, value in rate_limiter.stats().items():
+        yield 'llm_rate_limiter', 'Rate limit leases, queue waits and 429 pauses.', {'stat': stat}, value
+    yield 'llm_rate_limit_queue_length', 'Callers waiting for LLM capacity, cluster-wide.', {}, rate_limiter.queue_length()
+    health = tail_latency_stats()
+    for key, stats in health['latency'].items():
+        model, _, purpose = key.partition('/')
+        labels = {'model': model, 'purpose': purpose or 'other'}
+        yield 'llm_timeout_seconds', 'Adaptive read timeout per model and purpose.', labels, stats['timeout_sec']
+        if stats['p95_sec'] is not None:
+            yield ('llm_latency_p95_seconds', 'Estimated p95 LLM latency per model and purpose.', labels,
+                   stats['p95_sec'])
+    yield 'llm_breaker_open', 'Whether the LLM circuit breaker is failing calls fast (1) or not (0).', {}, int(
+        health['breaker'] != CircuitBreaker.CLOSED)
+    yield 'llm_breaker_trips', 'Times the LLM circuit breaker opened.', {}, health['breaker_trips']
+    yield 'llm_hedged_requests', 'Duplicate (hedged) requests sent and won.', {'stat': 'hedged'}, health['hedged']
+    yield 'llm_hedged_requests', 'Duplicate (hedged) requests sent and won.', {'stat': 'hedge_wins'}, health['hedge_wins']
+
 
-    # Should not reach here due to returns in loop, but kept as a safeguard
-    return "Error: Exhausted retries without a successful response"
+metrics.add_collector(_llm_gauges)
@@ -0,0 +1,277 @@
+import os
+import json
+import time
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import redis
+
+from config import METRICS_PUSH_INTERVAL_SEC, METRICS_WORKER_TTL_SEC
+
+# Upper bounds in seconds; spans Redis round trips (ms) up to slow LLM calls (minutes)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. retries or errors."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        self.registry._update(self, self._key(labels), lambda value: (value or 0) + amount)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (durations in seconds unless the buckets say
+    otherwise), with Prometheus cumulative buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, amount: float, **labels) -> None:
+        def _add(value):
+            # [count per bucket (not cumulative) ..., count above the last bucket, sum]
+            value = value or [0] * (len(self.buckets) + 1) + [0.0]
+            index = next((i for i, bound in enumerate(self.buckets) if amount <= bound), len(self.buckets))
+            value[index] += 1
+            value[-1] += amount
+            return value
+        self.registry._update(self, self._key(labels), _add)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the `with` block (also when it raises)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class MetricsRegistry:
+    """Counters and histograms rendered in the Prometheus text format (see /metrics).
+
+    Every worker process records locally and, once attached to Redis, publishes
+    a snapshot of its cumulative values from `push_if_due` at most every
+    `push_interval_sec`. That runs after a request or job, never while one is
+    being served, since collectors may make Redis calls of their own. A scrape
+    shows the snapshots of all workers whichever worker serves it, every series
+    with a `worker` label: each worker's counters only grow, so a restarted
+    worker starts new series instead of lowering a total, and PromQL `sum()`
+    gives cluster-wide values. Snapshots of workers gone for `worker_ttl_sec`
+    are dropped. Redis errors only cost freshness; recording never fails.
+
+    Collectors (`add_collector`) report point-in-time gauges such as breaker
+    state.
+    """
+
+    def __init__(self, r=None, prefix: str = 'metrics', push_interval_sec: float = 10,
+                 worker_ttl_sec: float = 24 * 60 * 60):
+        self.r = r
+        self.prefix = prefix
+        self.push_interval_sec = push_interval_sec
+        self.worker_ttl_sec = worker_ttl_sec
+        self._metrics = {}  # name -> metric
+        self._values = {}  # name -> {label values: value}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._last_push = 0.0
+
+    def attach(self, r) -> None:
+        """Share metrics through `r` (None: this process only)."""
+        self.r = r
+
+    @property
+    def _workers_key(self) -> str:
+        return f"{self.prefix}:workers"
+
+    @staticmethod
+    def worker_id() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    # --- Definition and recording ---
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            self._values[metric.name] = {}
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter(self, name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help, labelnames, buckets))
+
+    def add_collector(self, collect: Callable[[], Iterable[tuple]]) -> None:
+        """Register `collect()`, returning (name, help, labels dict, value) gauge samples."""
+        self._collectors.append(collect)
+
+    def _update(self, metric, key, update) -> None:
+        with self._lock:
+            values = self._values[metric.name]
+            values[key] = update(values.get(key))
+
+    # --- Sharing between workers ---
+
+    def snapshot(self) -> dict:
+        """This process's values: {'values': {name: [[label values, value], ...]}, 'gauges': [...]}."""
+        with self._lock:
+            values = {name: [[list(key), value if not isinstance(value, list) else list(value)]
+                             for key, value in series.items()]
+                      for name, series in self._values.items()}
+        gauges = []
+        for collect in self._collectors:
+            try:
+                gauges.extend([name, help, labels, value] for name, help, labels, value in collect())
+            except Exception as e:
+                print(f"[Metrics] Collector failed: {e}")
+        return {'ts': time.time(), 'values': values, 'gauges': gauges}
+
+    def push_if_due(self) -> None:
+        """Push if attached and the last push is `push_interval_sec` old; call between requests."""
+        if self.r is not None and time.monotonic() - self._last_push >= self.push_interval_sec:
+            self.push()
+
+    def push(self) -> None:
+        """Publish this worker's snapshot for other workers' scrapes."""
+        self._last_push = time.monotonic()
+        try:
+            self.r.hset(self._workers_key, self.worker_id(), json.dumps(self.snapshot()))
+        except redis.exceptions.RedisError as e:
+            print(f"[Metrics] Could not push metrics: {e}")
+
+    def _snapshots(self) -> Dict[str, dict]:
+        """Every live worker's snapshot (just this process's without Redis)."""
+        own = self.snapshot()
+        if self.r is None:
+            return {self.worker_id(): own}
+        try:
+            self._last_push = time.monotonic()
+            self.r.hset(self._workers_key, self.worker_id(), json.dumps(own))
+            raw = self.r.hgetall(self._workers_key)
+        except redis.exceptions.RedisError as e:
+            print(f"[Metrics] Could not read other workers' metrics: {e}")
+            return {self.worker_id(): own}
+        snapshots, stale = {}, []
+        for worker, payload in raw.items():
+            try:
+                snapshot = json.loads(payload)
+            except ValueError:
+                stale.append(worker)
+                continue
+            if time.time() - snapshot.get('ts', 0) > self.worker_ttl_sec:
+                stale.append(worker)
+            else:
+                snapshots[worker] = snapshot
+        if stale:
+            try:
+                self.r.hdel(self._workers_key, *stale)
+            except redis.exceptions.RedisError:
+                pass
+        return snapshots
+
+    # --- Exposition ---
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        snapshots = self._snapshots()
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for worker, snapshot in sorted(snapshots.items()):
+                for key, value in sorted(snapshot['values'].get(metric.name, [])):
+                    labels = {**dict(zip(metric.labelnames, key)), 'worker': worker}
+                    if metric.kind == 'counter':
+                        lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                        cumulative += count
+                        bucket_labels = {**labels, 'le': _format_value(bound)}
+                        lines.append(f"{metric.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                    lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                    lines.append(f"{metric.name}_count{_format_labels(labels)} {cumulative}")
+
+        gauges = {}
+        for worker, snapshot in sorted(snapshots.items()):
+            for name, help, labels, value in snapshot.get('gauges', []):
+                gauges.setdefault(name, (help, []))[1].append(({**labels, 'worker': worker}, value))
+        for name, (help, samples) in gauges.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+# Shared across workers through Redis once routes.init_app attaches it
+metrics = MetricsRegistry(push_interval_sec=METRICS_PUSH_INTERVAL_SEC, worker_ttl_sec=METRICS_WORKER_TTL_SEC)
+
+# --- Interview pipeline stages ---
+llm_call_seconds = metrics.histogram(
+    'interview_llm_call_seconds', 'LLM call duration by purpose (initial, follow_up, next_main, ideal_answer).',
+    ['purpose'])
+similarity_seconds = metrics.histogram(
+    'interview_similarity_seconds', 'Similarity scoring of an answer against its ideal answer.')
+session_store_seconds = metrics.histogram(
+    'interview_session_store_seconds', 'Redis round trip to load or save an interview session.', ['op'])
+db_commit_seconds = metrics.histogram(
+    'interview_db_commit_seconds', 'Database transaction writing completed interviews and their results.')
+prompt_bytes = metrics.histogram(
+    'interview_prompt_bytes', 'Size in bytes of question prompts sent to the LLM, by purpose.', ['purpose'],
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768))
+answer_score = metrics.histogram(
+    'interview_answer_score', 'Similarity of answers to their ideal answers (unscored answers are not counted).',
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0))
+
+# --- Upstream LLM outcomes ---
+llm_retries_total = metrics.counter(
+    'llm_retries_total', 'LLM request attempts that were retried, by reason (rate_limited, network).', ['reason'])
+llm_rate_limited_total = metrics.counter('llm_rate_limited_total', 'HTTP 429 responses from the LLM API.')
+llm_errors_total = metrics.counter(
+    'llm_errors_total', 'LLM calls that returned an "Error:" result, by kind.', ['kind'])
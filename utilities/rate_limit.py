@@ -0,0 +1,325 @@
+import time
+import uuid
+import random
+import asyncio
+import threading
+from typing import Optional
+
+import redis
+
+
+class Lease:
+    """Permission for one LLM request; release it once the response is in."""
+
+    __slots__ = ('limiter', 'lease_id', 'tokens', 'waited')
+
+    def __init__(self, limiter, lease_id: Optional[str], tokens: int, waited: float):
+        self.limiter = limiter
+        self.lease_id = lease_id
+        self.tokens = tokens
+        self.waited = waited
+
+    def release(self, used_tokens: Optional[int] = None) -> None:
+        self.limiter.release(self, used_tokens)
+
+
+class RateLimiter:
+    """Cluster-wide limiter for LLM requests, shared by all workers through Redis.
+
+    Enforces requests per minute (`rpm`) and tokens per minute (`tpm`) with token
+    buckets and caps requests in flight (`max_concurrency`); 0 disables a limit.
+    Callers wait in one FIFO queue (a sorted set by arrival time) and take
+    capacity in that order: a caller may go once there is capacity for it and
+    everyone ahead of it, so workers are served in order instead of all
+    retrying at once. A 429 from upstream pauses every worker (`penalize`)
+    rather than each sleeping on its own. Waits longer than `max_wait_sec` give
+    up (`acquire` returns None).
+
+    Without Redis the limiter only applies a 429's pause to the calling thread.
+    Redis errors let the request through, so LLM calls never depend on Redis.
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0, max_concurrency: int = 0, max_wait_sec: float = 30,
+                 lease_ttl_sec: int = 180, r=None, prefix: str = 'llm:rate', poll_sec: float = 0.25):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.max_wait_sec = max_wait_sec
+        self.lease_ttl_sec = lease_ttl_sec  # a crashed worker's slot is freed after this
+        self.r = r
+        self.prefix = prefix
+        self.poll_sec = poll_sec
+        self._lock = threading.Lock()
+        self._stats = {'acquired': 0, 'waited': 0, 'wait_sec_total': 0.0, 'wait_sec_max': 0.0,
+                       'timeouts': 0, 'penalties': 0}
+
+    def attach(self, r) -> None:
+        """Share limits through `r` (None: no cluster-wide limiting)."""
+        self.r = r
+
+    @property
+    def _bucket_key(self):
+        return f"{self.prefix}:bucket"
+
+    @property
+    def _inflight_key(self):
+        return f"{self.prefix}:inflight"
+
+    @property
+    def _queue_key(self):
+        return f"{self.prefix}:queue"
+
+    def _alive_key(self, ticket: str) -> str:
+        return f"{self.prefix}:waiting:{ticket}"
+
+    def stats(self) -> dict:
+        """Local counters: leases `acquired`, how many `waited`, total and max queue wait, `timeouts`, `penalties`."""
+        with self._lock:
+            return dict(self._stats)
+
+    def queue_length(self) -> int:
+        """Callers currently waiting, cluster-wide."""
+        if self.r is None:
+            return 0
+        try:
+            return self.r.zcard(self._queue_key)
+        except redis.exceptions.RedisError:
+            return 0
+
+    def _record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self._stats['timeouts'] += 1
+            else:
+                self._stats['acquired'] += 1
+            if waited > 0:
+                self._stats['waited'] += 1
+                self._stats['wait_sec_total'] += waited
+                self._stats['wait_sec_max'] = max(self._stats['wait_sec_max'], waited)
+        if waited >= 1:
+            print(f"[Rate Limit] Waited {waited:.1f}s for LLM capacity"
+                  f"{' and gave up' if timed_out else ''} (queue: {self.queue_length()})")
+
+    # --- Acquiring capacity ---
+
+    def _try(self, ticket: str, tokens: int):
+        """One attempt to take capacity for `ticket`. Returns (lease_id, 0.0) on success,
+        otherwise (None, seconds to wait before the next attempt).
+
+        Capacity goes out in queue order: a ticket at position `rank` may take it
+        when there is enough for it and every ticket ahead of it, so a burst is
+        granted in one pass rather than one caller per poll interval.
+        """
+        bucket, inflight, queue = self._bucket_key, self._inflight_key, self._queue_key
+        now = time.time()
+        pipe = self.r.pipeline()
+        try:
+            pipe.watch(bucket, inflight, queue)
+            state = pipe.hgetall(bucket)
+            blocked_until = float(state.get('blocked_until', 0))
+            if blocked_until > now:
+                return None, blocked_until - now
+            rank = pipe.zrank(queue, ticket)
+            if rank is None:
+                # Dropped as gone after missing its heartbeats: rejoin at the back
+                pipe.multi()
+                pipe.zadd(queue, {ticket: now})
+                pipe.set(self._alive_key(ticket), 1, ex=self._alive_ttl)
+                pipe.execute()
+                return None, 0.0
+            if rank > 0:
+                head = pipe.zrange(queue, 0, 0)
+                if head and not pipe.exists(self._alive_key(head[0])):
+                    pipe.multi()
+                    pipe.zrem(queue, head[0])  # that caller went away without leaving the queue
+                    pipe.execute()
+                    return None, 0.0
+
+            elapsed = max(0.0, now - float(state.get('ts', now)))
+            requests_left = min(self.rpm, float(state.get('requests', self.rpm)) + elapsed * self.rpm / 60)
+            tokens_left = min(self.tpm, float(state.get('tokens', self.tpm)) + elapsed * self.tpm / 60)
+            tokens = min(tokens, self.tpm)  # a huge prompt must not wait forever
+            # Requests that can start now (ticket estimates: each waiting caller counts as this one)
+            capacity = rank + 1
+            if self.rpm:
+                capacity = min(capacity, int(requests_left))
+            if self.tpm and tokens:
+                capacity = min(capacity, int(tokens_left // tokens))
+            if self.max_concurrency:
+                capacity = min(capacity, self.max_concurrency - pipe.zcount(inflight, now, '+inf'))
+
+            if rank >= capacity:
+                if rank > 0:
+                    return None, self.poll_sec
+                wait = self.poll_sec  # waiting for a concurrency slot
+                if self.rpm and requests_left < 1:
+                    wait = max(wait, (1 - requests_left) * 60 / self.rpm)
+                if self.tpm and tokens_left < tokens:
+                    wait = max(wait, (tokens - tokens_left) * 60 / self.tpm)
+                return None, wait
+
+            lease_id = uuid.uuid4().hex
+            pipe.multi()
+            pipe.hset(bucket, mapping={'ts': now, 'requests': requests_left - 1, 'tokens': tokens_left - tokens})
+            if self.max_concurrency:
+                pipe.zremrangebyscore(inflight, '-inf', now)  # leases of crashed workers
+                pipe.zadd(inflight, {lease_id: now + self.lease_ttl_sec})
+            pipe.zrem(queue, ticket)
+            pipe.delete(self._alive_key(ticket))
+            pipe.execute()
+            return lease_id, 0.0
+        except redis.exceptions.WatchError:
+            return None, 0.0  # another caller changed the state: look again
+        finally:
+            pipe.reset()
+
+    def _enqueue(self, ticket: str) -> None:
+        pipe = self.r.pipeline()
+        pipe.zadd(self._queue_key, {ticket: time.time()})
+        pipe.set(self._alive_key(ticket), 1, ex=self._alive_ttl)
+        pipe.execute()
+
+    def _touch(self, ticket: str) -> None:
+        """Show the queue this caller is still waiting (see the stale-head check in `_try`)."""
+        self.r.set(self._alive_key(ticket), 1, ex=self._alive_ttl)
+
+    @property
+    def _alive_ttl(self) -> int:
+        return max(2, int(self.poll_sec * 8))
+
+    def _leave(self, ticket: str) -> None:
+        try:
+            pipe = self.r.pipeline()
+            pipe.zrem(self._queue_key, ticket)
+            pipe.delete(self._alive_key(ticket))
+            pipe.execute()
+        except redis.exceptions.RedisError:
+            pass
+
+    def _blocked_for(self) -> float:
+        """Seconds left in a 429 pause (quota-free fast path)."""
+        blocked_until = self.r.hget(self._bucket_key, 'blocked_until')
+        if blocked_until is None:
+            return 0.0
+        remaining = float(blocked_until) - time.time()
+        # Spread the restart so workers do not all retry in the same instant
+        return remaining + random.uniform(0, 1) if remaining > 0 else 0.0
+
+    def acquire(self, tokens: int = 0) -> Optional[Lease]:
+        """Wait for capacity for one request of about `tokens` tokens.
+
+        Returns a Lease, or None if it could not be had within `max_wait_sec`.
+        """
+        if self.r is None:
+            return Lease(self, None, tokens, 0.0)
+        start = time.monotonic()
+        try:
+            if not (self.rpm or self.tpm or self.max_concurrency):
+                wait = self._blocked_for()
+                if wait > self.max_wait_sec:
+                    self._record(self.max_wait_sec, timed_out=True)
+                    return None
+                if wait:
+                    time.sleep(wait)
+                self._record(time.monotonic() - start)
+                return Lease(self, None, tokens, time.monotonic() - start)
+
+            ticket = uuid.uuid4().hex
+            self._enqueue(ticket)
+            while True:
+                lease_id, wait = self._try(ticket, tokens)
+                waited = time.monotonic() - start
+                if lease_id is not None:
+                    self._record(waited)
+                    return Lease(self, lease_id, tokens, waited)
+                if waited + wait > self.max_wait_sec:
+                    self._leave(ticket)
+                    self._record(waited, timed_out=True)
+                    return None
+                if wait:
+                    time.sleep(min(wait, self.poll_sec * 4))
+                    self._touch(ticket)
+        except redis.exceptions.RedisError as e:
+            print(f"[Rate Limit] Redis error, not limiting this request: {e}")
+            return Lease(self, None, tokens, time.monotonic() - start)
+
+    async def aacquire(self, tokens: int = 0) -> Optional[Lease]:
+        """Async variant of `acquire()`; waits without blocking the event loop."""
+        if self.r is None:
+            return Lease(self, None, tokens, 0.0)
+        start = time.monotonic()
+        try:
+            if not (self.rpm or self.tpm or self.max_concurrency):
+                wait = await asyncio.to_thread(self._blocked_for)
+                if wait > self.max_wait_sec:
+                    self._record(self.max_wait_sec, timed_out=True)
+                    return None
+                if wait:
+                    await asyncio.sleep(wait)
+                self._record(time.monotonic() - start)
+                return Lease(self, None, tokens, time.monotonic() - start)
+
+            ticket = uuid.uuid4().hex
+            await asyncio.to_thread(self._enqueue, ticket)
+            while True:
+                lease_id, wait = await asyncio.to_thread(self._try, ticket, tokens)
+                waited = time.monotonic() - start
+                if lease_id is not None:
+                    self._record(waited)
+                    return Lease(self, lease_id, tokens, waited)
+                if waited + wait > self.max_wait_sec:
+                    await asyncio.to_thread(self._leave, ticket)
+                    self._record(waited, timed_out=True)
+                    return None
+                if wait:
+                    await asyncio.sleep(min(wait, self.poll_sec * 4))
+                    await asyncio.to_thread(self._touch, ticket)
+        except redis.exceptions.RedisError as e:
+            print(f"[Rate Limit] Redis error, not limiting this request: {e}")
+            return Lease(self, None, tokens, time.monotonic() - start)
+
+    def release(self, lease: Lease, used_tokens: Optional[int] = None) -> None:
+        """Free the lease's concurrency slot and correct the token estimate with actual usage."""
+        if self.r is None or lease.lease_id is None:
+            return
+        try:
+            pipe = self.r.pipeline()
+            if self.max_concurrency:
+                pipe.zrem(self._inflight_key, lease.lease_id)
+            if self.tpm and used_tokens is not None:
+                pipe.hincrbyfloat(self._bucket_key, 'tokens', lease.tokens - used_tokens)
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            print(f"[Rate Limit] Could not release lease: {e}")
+
+    # --- Upstream throttling ---
+
+    def penalize(self, seconds: float) -> None:
+        """Upstream answered 429: pause every worker's requests for `seconds`.
+
+        Without Redis this just sleeps in the calling thread.
+        """
+        with self._lock:
+            self._stats['penalties'] += 1
+        print(f"Rate limit exceeded. Pausing LLM requests for {seconds} seconds...")
+        if self.r is None:
+            time.sleep(seconds)
+            return
+        try:
+            until = time.time() + seconds
+            current = self.r.hget(self._bucket_key, 'blocked_until')
+            if current is None or float(current) < until:
+                self.r.hset(self._bucket_key, 'blocked_until', until)
+        except redis.exceptions.RedisError as e:
+            print(f"[Rate Limit] Could not share the pause, sleeping locally: {e}")
+            time.sleep(seconds)
+
+    async def apenalize(self, seconds: float) -> None:
+        """Async variant of `penalize()`."""
+        if self.r is None:
+            with self._lock:
+                self._stats['penalties'] += 1
+            print(f"Rate limit exceeded. Pausing LLM requests for {seconds} seconds...")
+            await asyncio.sleep(seconds)
+            return
+        await asyncio.to_thread(self.penalize, seconds)